@@ -2,7 +2,7 @@
 GitLab Dashboard - Refactored Application
 Clean Flask application using modular utilities
 """
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, render_template, request, jsonify, session, Response, stream_with_context
 import os
 import logging
 import asyncio
@@ -15,6 +15,16 @@ from utils.enhanced_config import EnhancedConfigManager
 from utils.error_handler import ErrorHandler
 from utils.response_helper import ResponseHelper
 from utils.initialization import InitializationHelper
+from utils.webhook_handler import WebhookProcessor
+from utils.access_tracker import AccessTracker
+from utils.sync_events import SyncEventBroadcaster
+from utils.change_feed import ChangeFeedPoller
+from utils.pipeline_tracker import PipelineTracker
+from utils.immutable_cache import ImmutableCache
+from utils.response_cache import ResponseCache, SharedResponseStore, NegativeCache
+from utils.listing_refresher import ListingRefresher
+from utils.write_through import WriteThroughQueue
+from utils.compression import ResponseCompressor
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -26,10 +36,18 @@ app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-product
 
 # Initialize core components
 db = GitLabDatabase()
-sync_service = GitLabSyncService(db)
 config_manager = EnhancedConfigManager(db)  # Use enhanced config manager
+access_tracker = AccessTracker(db, half_life_seconds=config_manager.get_app_config()['access_half_life_hours'] * 3600)
+access_tracker.start()
+sync_events = SyncEventBroadcaster()
+sync_service = GitLabSyncService(db, access_tracker, sync_events, config_manager.get_sync_policy())
 initialization_helper = InitializationHelper(db, sync_service)
 
+def new_background_sync_service():
+    """A sync service for a background poller: its own API client and sync guard, no progress events"""
+    return GitLabSyncService(db, access_tracker, sync_policy=config_manager.get_sync_policy())
+webhook_processor = WebhookProcessor(db, config_manager.get_app_config()['webhook_secret'])
+
 # Initialize response helper with GitLab API factory
 def get_gitlab_api():
     """Factory function to get GitLab API instance"""
@@ -38,7 +56,49 @@ def get_gitlab_api():
         return GitLabAPI(config['gitlab_url'], config['access_token'])
     return None
 
-response_helper = ResponseHelper(db, get_gitlab_api)
+# Serialized group/project/pipeline/branch listings, invalidated by database data versions.
+# The shared store next to the database lets every worker process on the host reuse them.
+shared_response_store = (SharedResponseStore(f"{db.db_path}.cache",
+                                             config_manager.get_app_config()['response_cache_shared_size'])
+                         if config_manager.get_app_config()['response_cache_shared_size'] > 0 else None)
+response_cache = ResponseCache(config_manager.get_app_config()['response_cache_size'],
+                               config_manager.get_app_config()['response_cache_ttl_seconds'],
+                               shared_response_store)
+# Stale listings are served immediately and refreshed once in the background
+listing_refresher = ListingRefresher(db, new_background_sync_service(), get_gitlab_api,
+                                     config_manager.get_app_config()['freshness_seconds'],
+                                     failure_backoff_seconds=config_manager.get_app_config()[
+                                         'negative_cache_error_ttl_seconds'])
+# Listings fetched live from GitLab are saved in background batches, so the next view is local
+write_through = WriteThroughQueue()
+# Empty and failed GitLab answers are remembered briefly, so repeat views cost no API call
+negative_cache = NegativeCache(config_manager.get_app_config()['negative_cache_empty_ttl_seconds'],
+                               config_manager.get_app_config()['negative_cache_error_ttl_seconds'])
+# Brotli/gzip for JSON responses; cached listings keep their compressed bodies per data version
+response_compressor = ResponseCompressor(config_manager.get_app_config()['compression_min_bytes'])
+response_helper = ResponseHelper(db, get_gitlab_api, access_tracker, response_cache, listing_refresher,
+                                 write_through, negative_cache, response_compressor)
+
+# Commits, SHA compares and finished pipelines never change, so they are fetched once
+immutable_cache = ImmutableCache(db)
+
+# Poll GitLab's Events API for changes when webhooks cannot reach this host
+change_feed = ChangeFeedPoller(db, new_background_sync_service(), get_gitlab_api,
+                               interval=config_manager.get_app_config()['change_feed_interval_seconds'])
+if change_feed.interval > 0:
+    change_feed.start()
+
+# Keep running and pending pipelines current without resyncing their projects
+pipeline_tracker = PipelineTracker(db, get_gitlab_api, sync_events,
+                                   interval=config_manager.get_app_config()['pipeline_tracker_interval_seconds'],
+                                   cache=immutable_cache)
+if pipeline_tracker.interval > 0:
+    pipeline_tracker.start()
+
+@app.after_request
+def compress_response(response):
+    """Compress JSON responses the response helper has not already served compressed"""
+    return response_compressor.apply(response)
 
 # Routes
 @app.route('/')
@@ -96,6 +156,18 @@ def get_groups():
     """Get all groups from database with API fallback"""
     return response_helper.handle_groups_request()
 
+@app.route('/api/groups/view')
+@ErrorHandler.handle_api_error
+def get_group_views():
+    """Get subgroups, projects and counts of several groups (?ids=1,2,3) in one response"""
+    return response_helper.handle_group_views_request()
+
+@app.route('/api/groups/<int:group_id>/view')
+@ErrorHandler.handle_api_error
+def get_group_view(group_id):
+    """Get a group with its subgroups, projects and counts in one response"""
+    return response_helper.handle_group_views_request(group_id)
+
 @app.route('/api/groups/<int:group_id>/subgroups')
 @ErrorHandler.handle_api_error
 def get_subgroups(group_id):
@@ -129,7 +201,15 @@ def get_project_branches(project_id):
 @app.route('/api/projects/<int:project_id>/pipelines/<int:pipeline_id>')
 @ErrorHandler.handle_api_error
 def get_pipeline_details(project_id, pipeline_id):
-    """Get detailed information about a specific pipeline"""
+    """Get detailed information about a specific pipeline, from the cache once it has finished"""
+    access_tracker.record('project', project_id)
+    stored = db.get_pipeline(pipeline_id)
+    if stored and stored['project_id'] != project_id:
+        stored = None
+    cached = immutable_cache.get_pipeline(pipeline_id, stored['status'] if stored else None)
+    if cached is not None:
+        return ErrorHandler.create_success_response({'pipeline': cached}, source='cache')
+    
     gitlab_api = get_gitlab_api()
     if not gitlab_api:
         return ErrorHandler.create_error_response(
@@ -139,12 +219,18 @@ def get_pipeline_details(project_id, pipeline_id):
         )
     
     result = gitlab_api.get_pipeline_details(project_id, pipeline_id)
+    if result['success']:
+        immutable_cache.store_pipeline(result['pipeline'])
+        if stored:
+            # Only the listing fields reach the row; the detail payload lives in the immutable cache
+            db.update_pipelines([(project_id, result['pipeline'])])
     return ErrorHandler.create_success_response(result, source='api')
 
 @app.route('/api/projects/<int:project_id>/branches/<path:branch_name>')
 @ErrorHandler.handle_api_error
 def get_branch_details(project_id, branch_name):
-    """Get detailed information about a specific branch"""
+    """Get detailed information about a specific branch; its head moves, so it always comes from GitLab"""
+    access_tracker.record('project', project_id)
     gitlab_api = get_gitlab_api()
     if not gitlab_api:
         return ErrorHandler.create_error_response(
@@ -156,6 +242,47 @@ def get_branch_details(project_id, branch_name):
     result = gitlab_api.get_branch_details(project_id, branch_name)
     return ErrorHandler.create_success_response(result, source='api')
 
+@app.route('/api/projects/<int:project_id>/commits/<sha>')
+@ErrorHandler.handle_api_error
+def get_commit_details(project_id, sha):
+    """Get a commit; full SHAs are served from the immutable cache after the first fetch"""
+    access_tracker.record('project', project_id)
+    gitlab_api = get_gitlab_api()
+    if not gitlab_api:
+        return ErrorHandler.create_error_response(
+            'GitLab configuration not found',
+            401,
+            'configuration_error'
+        )
+    
+    result = immutable_cache.get_commit(gitlab_api, project_id, sha)
+    return ErrorHandler.create_success_response(result, source='cache' if result.pop('cached', False) else 'api')
+
+@app.route('/api/projects/<int:project_id>/compare')
+@ErrorHandler.handle_api_error
+def compare_commits(project_id):
+    """Compare two refs; compares between two full SHAs are served from the immutable cache"""
+    from_ref = request.args.get('from', '').strip()
+    to_ref = request.args.get('to', '').strip()
+    if not from_ref or not to_ref:
+        return ErrorHandler.create_error_response(
+            'Both from and to are required',
+            400,
+            'validation_error'
+        )
+    
+    access_tracker.record('project', project_id)
+    gitlab_api = get_gitlab_api()
+    if not gitlab_api:
+        return ErrorHandler.create_error_response(
+            'GitLab configuration not found',
+            401,
+            'configuration_error'
+        )
+    
+    result = immutable_cache.get_compare(gitlab_api, project_id, from_ref, to_ref)
+    return ErrorHandler.create_success_response(result, source='cache' if result.pop('cached', False) else 'api')
+
 @app.route('/api/search/projects')
 @ErrorHandler.handle_api_error
 def search_projects():
@@ -167,8 +294,7 @@ def search_projects():
 @ErrorHandler.handle_api_error
 def get_dashboard_stats():
     """Get dashboard statistics from database"""
-    stats = db.get_dashboard_stats()
-    return ErrorHandler.create_success_response(stats)
+    return response_helper.handle_dashboard_stats_request()
 
 @app.route('/api/health')
 @ErrorHandler.handle_api_error
@@ -196,7 +322,11 @@ def health_check():
 @app.route('/api/sync/full', methods=['POST'])
 @ErrorHandler.handle_api_error
 def trigger_full_sync():
-    """Trigger a full synchronization of all GitLab data"""
+    """Trigger a full synchronization of all GitLab data
+    
+    ?mode=rebuild syncs into shadow tables and swaps them in when complete, replacing
+    all synced data without the dashboard ever showing an empty or partial state.
+    """
     gitlab_api = get_gitlab_api()
     if not gitlab_api:
         return ErrorHandler.create_error_response(
@@ -205,17 +335,47 @@ def trigger_full_sync():
             'configuration_error'
         )
     
-    sync_service.set_gitlab_api(gitlab_api)
+    force = request.args.get('force', 'false').lower() == 'true'
+    mode = request.args.get('mode', 'incremental')
+    if mode not in ('incremental', 'rebuild'):
+        return ErrorHandler.create_error_response(
+            f"Unknown sync mode '{mode}', expected incremental or rebuild",
+            400,
+            'validation_error'
+        )
+    rebuild = mode == 'rebuild'
     
-    # Run sync (for demo, we'll run synchronously)
+    # Run sync (for demo, we'll run synchronously); 409 while the warm-up or another sync runs
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
-    sync_results = loop.run_until_complete(sync_service.full_sync())
-    loop.close()
+    try:
+        sync_results = loop.run_until_complete(sync_service.full_sync(force=force, rebuild=rebuild,
+                                                                      gitlab_api=gitlab_api))
+    finally:
+        loop.close()
     
     return ErrorHandler.create_success_response(
         sync_results,
-        message='Full synchronization completed'
+        message='Full rebuild completed' if rebuild else 'Full synchronization completed'
+    )
+
+@app.route('/api/sync/queue', methods=['POST'])
+@ErrorHandler.handle_api_error
+def queue_full_sync():
+    """Queue a full synchronization for sync worker processes (see sync_worker.py)"""
+    gitlab_api = get_gitlab_api()
+    if not gitlab_api:
+        return ErrorHandler.create_error_response(
+            'GitLab not configured',
+            400,
+            'configuration_error'
+        )
+    
+    plan = sync_service.plan_queued_sync(gitlab_api)
+    
+    return ErrorHandler.create_success_response(
+        plan,
+        message=f"Queued {plan['queued_tasks']} group listing tasks for sync workers"
     )
 
 @app.route('/api/sync/project/<int:project_id>', methods=['POST'])
@@ -230,25 +390,97 @@ def trigger_project_sync(project_id):
             'configuration_error'
         )
     
-    sync_service.set_gitlab_api(gitlab_api)
-    
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
-    sync_results = loop.run_until_complete(sync_service.sync_single_project(project_id))
-    loop.close()
+    try:
+        sync_results = loop.run_until_complete(sync_service.sync_single_project(project_id, gitlab_api))
+    finally:
+        loop.close()
     
     return ErrorHandler.create_success_response(
         sync_results,
         message=f'Project {project_id} synchronization completed'
     )
 
+@app.route('/api/sync/changes', methods=['POST'])
+@ErrorHandler.handle_api_error
+def poll_change_feed():
+    """Read new GitLab events and refresh the projects they touch"""
+    if not get_gitlab_api():
+        return ErrorHandler.create_error_response(
+            'GitLab not configured',
+            400,
+            'configuration_error'
+        )
+    
+    result = change_feed.poll_once()
+    return ErrorHandler.create_success_response(
+        result,
+        message=f"Processed {result.get('events', 0)} events"
+    )
+
 @app.route('/api/sync/status')
 @ErrorHandler.handle_api_error
 def get_sync_status():
     """Get synchronization status"""
     status = sync_service.get_sync_status()
+    status['webhooks'] = webhook_processor.get_status()
+    status['event_subscribers'] = sync_events.subscriber_count()
+    status['warm_up'] = initialization_helper.warm_up_status
+    status['change_feed'] = change_feed.get_status()
+    status['pipeline_tracker'] = pipeline_tracker.get_status()
+    status['immutable_cache'] = immutable_cache.get_status()
+    status['response_cache'] = response_cache.get_status()
+    status['listing_refresher'] = listing_refresher.get_status()
+    status['write_through'] = write_through.get_status()
+    status['negative_cache'] = negative_cache.get_status()
+    status['compression'] = response_compressor.get_status()
     return ErrorHandler.create_success_response(status)
 
+@app.route('/api/sync/events')
+def stream_sync_events():
+    """Stream live sync progress as Server-Sent Events"""
+    return Response(
+        stream_with_context(sync_events.stream()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+@app.route('/api/webhooks/gitlab', methods=['POST'])
+@ErrorHandler.handle_api_error
+def receive_gitlab_webhook():
+    """Receive a GitLab webhook event and queue it for batched processing"""
+    if not webhook_processor.is_configured():
+        return ErrorHandler.create_error_response(
+            'Webhook secret not configured',
+            403,
+            'configuration_error'
+        )
+    
+    if not webhook_processor.verify_token(request.headers.get('X-Gitlab-Token')):
+        return ErrorHandler.create_error_response(
+            'Invalid webhook token',
+            401,
+            'authentication_error'
+        )
+    
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return ErrorHandler.create_error_response(
+            'Webhook payload must be a JSON object',
+            400,
+            'validation_error'
+        )
+    
+    event_type = request.headers.get('X-Gitlab-Event', '')
+    if not webhook_processor.enqueue(event_type, payload):
+        return ErrorHandler.create_success_response(message=f'Event ignored: {event_type}')
+    
+    return ErrorHandler.create_success_response(message='Event queued', event_type=event_type), 202
+
 # Error handlers
 @app.errorhandler(404)
 def not_found(error):
@@ -1,18 +1,88 @@
 import sqlite3
 import json
+import hashlib
 import logging
+import math
+import os
+import threading
+import time
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterator
+
+def content_hash(data) -> str:
+    """Stable hash of an entity payload, independent of key order"""
+    encoded = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
 
 class GitLabDatabase:
     def __init__(self, db_path: str = 'gitlab_dashboard.db'):
         self.db_path = db_path
+        self._version_conn = None
+        self._version_lock = threading.Lock()
+        # Set by create_shadow on a rebuild's shadow database: when the rebuild began
+        self.rebuild_started_at = None
         self.init_database()
+    
+    @staticmethod
+    def _data_version_key(scope: str, entity_id: Optional[int] = None) -> str:
+        return scope if scope == '*' else f"{scope}:{'' if entity_id is None else entity_id}"
+    
+    def listing_status(self, scope: str, entity_id: Optional[int] = None) -> Dict:
+        """Version of one listing and when its rows were last confirmed against GitLab
         
+        Versions are stored in the data_versions table, so a write committed by any process on
+        this file is seen by every other process on its next read. refreshed_at is a Unix time,
+        None if the listing was never fetched since the data was cleared.
+        """
+        key = self._data_version_key(scope, entity_id)
+        with self._version_lock:
+            # Checked on every cached request, so one autocommit connection is kept open for it
+            if self._version_conn is None:
+                self._version_conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+            cursor = self._version_conn.execute(
+                'SELECT scope_key, version, refreshed_at FROM data_versions WHERE scope_key IN (?, ?)', ('*', key))
+            stored = {row[0]: row for row in cursor.fetchall()}
+        epoch = stored['*'][1] if '*' in stored else 0
+        own = stored.get(key)
+        return {'version': (epoch, own[1] if own else 0), 'refreshed_at': own[2] if own else None}
+    
+    def data_version(self, scope: str, entity_id: Optional[int] = None) -> tuple:
+        """Current version of one listing; it changes whenever the listing's rows change"""
+        return self.listing_status(scope, entity_id)['version']
+    
+    # Scopes whose changes also change the dashboard summary (group and project counts)
+    SUMMARY_SCOPES = ('groups', 'projects')
+    
+    def _bump_data_versions(self, cursor, scope: str, entity_ids):
+        """Bump listing versions inside the writing transaction, so they commit together with the rows"""
+        keys = {self._data_version_key(scope, entity_id) for entity_id in entity_ids}
+        if keys and scope in self.SUMMARY_SCOPES:
+            keys.add(self._data_version_key('summary'))
+        cursor.executemany('''
+            INSERT INTO data_versions (scope_key, version) VALUES (?, 1)
+            ON CONFLICT(scope_key) DO UPDATE SET version = version + 1
+        ''', [(key,) for key in keys])
+    
+    def _mark_refreshed(self, cursor, scope: str, entity_ids, refreshed_at: Optional[float] = None):
+        """Record that listings were just fetched from GitLab, whether or not their rows changed"""
+        refreshed_at = refreshed_at or time.time()
+        cursor.executemany('''
+            INSERT INTO data_versions (scope_key, version, refreshed_at) VALUES (?, 0, ?)
+            ON CONFLICT(scope_key) DO UPDATE SET refreshed_at = excluded.refreshed_at
+        ''', [(self._data_version_key(scope, entity_id), refreshed_at) for entity_id in set(entity_ids)])
+    
+    def mark_refreshed(self, scope: str, entity_id: Optional[int] = None):
+        """Record a fetch of a listing that stored nothing, e.g. a group without subgroups"""
+        with sqlite3.connect(self.db_path) as conn:
+            self._mark_refreshed(conn.cursor(), scope, [entity_id])
+            conn.commit()
+    
     def init_database(self):
         """Initialize the database with required tables"""
         with sqlite3.connect(self.db_path) as conn:
             conn.execute('PRAGMA foreign_keys = ON')
+            # WAL lets readers and several sync worker processes share the file without blocking
+            conn.execute('PRAGMA journal_mode = WAL')
             cursor = conn.cursor()
             
             # Configuration table
@@ -43,6 +113,7 @@ class GitLabDatabase:
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     last_synced TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     gitlab_data TEXT,
+                    content_hash TEXT,
                     FOREIGN KEY (parent_id) REFERENCES groups (id)
                 )
             ''')
@@ -63,10 +134,13 @@ class GitLabDatabase:
                     http_url_to_repo TEXT,
                     ssh_url_to_repo TEXT,
                     group_id INTEGER,
+                    archived BOOLEAN DEFAULT FALSE,
+                    last_activity_at TIMESTAMP,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     last_synced TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     gitlab_data TEXT,
+                    content_hash TEXT,
                     FOREIGN KEY (group_id) REFERENCES groups (id)
                 )
             ''')
@@ -89,6 +163,7 @@ class GitLabDatabase:
                     duration INTEGER,
                     last_synced TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     gitlab_data TEXT,
+                    content_hash TEXT,
                     FOREIGN KEY (project_id) REFERENCES projects (id)
                 )
             ''')
@@ -107,22 +182,44 @@ class GitLabDatabase:
                     can_push BOOLEAN DEFAULT FALSE,
                     web_url TEXT,
                     commit_id TEXT,
-                    commit_short_id TEXT,
-                    commit_title TEXT,
-                    commit_author_name TEXT,
-                    commit_author_email TEXT,
-                    commit_authored_date TIMESTAMP,
-                    commit_committer_name TEXT,
-                    commit_committer_email TEXT,
-                    commit_committed_date TIMESTAMP,
-                    commit_message TEXT,
                     last_synced TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     gitlab_data TEXT,
+                    content_hash TEXT,
                     FOREIGN KEY (project_id) REFERENCES projects (id),
                     UNIQUE(project_id, name)
                 )
             ''')
             
+            # Commits, shared by every branch and pipeline pointing at the same SHA.
+            # branches.commit_id and pipelines.sha reference commits.sha.
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS commits (
+                    sha TEXT PRIMARY KEY,
+                    short_id TEXT,
+                    title TEXT,
+                    message TEXT,
+                    author_name TEXT,
+                    author_email TEXT,
+                    authored_date TIMESTAMP,
+                    committer_name TEXT,
+                    committer_email TEXT,
+                    committed_date TIMESTAMP,
+                    web_url TEXT,
+                    source TEXT DEFAULT 'api',
+                    gitlab_data TEXT,
+                    first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_pipelines_sha
+                ON pipelines (sha)
+            ''')
+            # Lets the pipeline tracker find running pipelines without scanning the table
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_pipelines_status
+                ON pipelines (status)
+            ''')
+            
             # Sync status table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS sync_status (
@@ -136,7 +233,227 @@ class GitLabDatabase:
                 )
             ''')
             
+            # Sync work queue shared by sync worker processes
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS sync_tasks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    task_type TEXT NOT NULL,
+                    entity_id INTEGER NOT NULL,
+                    priority REAL DEFAULT 0,
+                    status TEXT DEFAULT 'pending',
+                    lease_owner TEXT,
+                    lease_expires_at REAL,
+                    attempts INTEGER DEFAULT 0,
+                    last_error TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE(task_type, entity_id)
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_sync_tasks_claim
+                ON sync_tasks (status, priority DESC, id)
+            ''')
+            
+            # GitLab responses that can never change, keyed by content address:
+            # commit:<sha>, compare:<project>:<from_sha>..<to_sha>, pipeline:<id>:<terminal status>
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS immutable_objects (
+                    cache_key TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Resume points for incremental feeds, e.g. the last GitLab event id processed
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS sync_cursors (
+                    name TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Listing versions behind response caches, shared by every process using this file.
+            # scope_key is '<scope>:<id>': 'groups' by parent id, 'projects' by group id
+            # ('projects:' = all projects), 'pipelines' and 'branches' by project id, 'summary' for the
+            # dashboard stats; '*' invalidates all.
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS data_versions (
+                    scope_key TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL,
+                    refreshed_at REAL
+                )
+            ''')
+            # A recreated database starts from a new epoch, so caches never match its versions to old entries
+            cursor.execute("INSERT OR IGNORE INTO data_versions (scope_key, version) VALUES ('*', ?)",
+                           (int(time.time() * 1000),))
+
+            # Access frequency/recency per project and group, used to prioritize sync.
+            # heat_key = log2(heat) + last_access / half_life orders entities by current decayed heat.
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS access_stats (
+                    entity_type TEXT NOT NULL,
+                    entity_id INTEGER NOT NULL,
+                    heat REAL NOT NULL,
+                    heat_key REAL NOT NULL,
+                    hits INTEGER DEFAULT 0,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (entity_type, entity_id)
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_access_stats_heat
+                ON access_stats (entity_type, heat_key DESC)
+            ''')
+            
+            # Databases created before content hashing was introduced
+            for table in ('groups', 'projects', 'pipelines', 'branches'):
+                self._ensure_column(cursor, table, 'content_hash', 'TEXT')
+            self._ensure_column(cursor, 'data_versions', 'refreshed_at', 'REAL')
+            
+            if self._ensure_column(cursor, 'projects', 'last_activity_at', 'TIMESTAMP'):
+                cursor.execute('''
+                    UPDATE projects SET last_activity_at = json_extract(gitlab_data, '$.last_activity_at')
+                    WHERE json_valid(gitlab_data)
+                ''')
+            if self._ensure_column(cursor, 'projects', 'archived', 'BOOLEAN DEFAULT FALSE'):
+                cursor.execute('''
+                    UPDATE projects SET archived = COALESCE(json_extract(gitlab_data, '$.archived'), FALSE)
+                    WHERE json_valid(gitlab_data)
+                ''')
+            # Keyset order for iter_projects(order_by_activity=True); missing activity sorts last
+            cursor.execute('DROP INDEX IF EXISTS idx_projects_activity')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_projects_activity_key
+                ON projects (COALESCE(last_activity_at, '') DESC, id)
+            ''')
+            # Default orders of the paginated listings (see LISTINGS), so a page is an index range
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_groups_parent_name
+                ON groups (parent_id, name, id)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_projects_group_name
+                ON projects (group_id, name, id)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_pipelines_project_created
+                ON pipelines (project_id, created_at, id)
+            ''')
+
+            self._migrate_branch_commits(cursor)
+            
             conn.commit()
+    
+    # Columns branches used to carry for their head commit, now stored once in commits
+    LEGACY_BRANCH_COMMIT_COLUMNS = (
+        'commit_short_id', 'commit_title', 'commit_author_name', 'commit_author_email',
+        'commit_authored_date', 'commit_committer_name', 'commit_committer_email',
+        'commit_committed_date', 'commit_message'
+    )
+    
+    def _migrate_branch_commits(self, cursor):
+        """Move commit details copied into branch rows into the commits table"""
+        cursor.execute('PRAGMA table_info(branches)')
+        if 'commit_message' not in [row[1] for row in cursor.fetchall()]:
+            return
+        
+        cursor.execute('''
+            INSERT OR IGNORE INTO commits
+            (sha, short_id, title, message, author_name, author_email, authored_date,
+             committer_name, committer_email, committed_date, web_url, gitlab_data)
+            SELECT commit_id, commit_short_id, commit_title, commit_message, commit_author_name,
+                   commit_author_email, commit_authored_date, commit_committer_name,
+                   commit_committer_email, commit_committed_date,
+                   CASE WHEN json_valid(gitlab_data) THEN json_extract(gitlab_data, '$.commit.web_url') END,
+                   CASE WHEN json_valid(gitlab_data) THEN json_extract(gitlab_data, '$.commit') END
+            FROM branches
+            WHERE commit_id IS NOT NULL AND commit_id != ''
+        ''')
+        cursor.execute('''
+            UPDATE branches SET gitlab_data = json_remove(gitlab_data, '$.commit')
+            WHERE json_valid(gitlab_data)
+        ''')
+        for column in self.LEGACY_BRANCH_COMMIT_COLUMNS:
+            try:
+                cursor.execute(f'ALTER TABLE branches DROP COLUMN {column}')
+            except sqlite3.OperationalError:
+                # SQLite before 3.35 cannot drop columns; empty them instead
+                cursor.execute(f'UPDATE branches SET {column} = NULL')
+        logging.getLogger(__name__).info("Moved branch commit details into the commits table")
+    
+    @staticmethod
+    def _save_commits(cursor, commits: List[Dict], source: str = 'api'):
+        """
+        Insert commits that are not stored yet
+        
+        Commits are immutable, so an existing row is only rewritten when a webhook-built
+        commit (which lacks committer and parent details) is superseded by the API's version.
+        """
+        unique = {commit['id']: commit for commit in commits if commit and commit.get('id')}
+        if not unique:
+            return
+        cursor.executemany('''
+            INSERT INTO commits
+            (sha, short_id, title, message, author_name, author_email, authored_date,
+             committer_name, committer_email, committed_date, web_url, source, gitlab_data)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(sha) DO UPDATE SET
+                short_id = excluded.short_id,
+                title = excluded.title,
+                message = excluded.message,
+                author_name = excluded.author_name,
+                author_email = excluded.author_email,
+                authored_date = excluded.authored_date,
+                committer_name = excluded.committer_name,
+                committer_email = excluded.committer_email,
+                committed_date = excluded.committed_date,
+                web_url = excluded.web_url,
+                source = excluded.source,
+                gitlab_data = excluded.gitlab_data
+            WHERE commits.source = 'webhook' AND excluded.source = 'api'
+        ''', [(
+            sha,
+            commit.get('short_id', ''),
+            commit.get('title', ''),
+            commit.get('message', ''),
+            commit.get('author_name', ''),
+            commit.get('author_email', ''),
+            commit.get('authored_date'),
+            commit.get('committer_name', ''),
+            commit.get('committer_email', ''),
+            commit.get('committed_date'),
+            commit.get('web_url', ''),
+            source,
+            json.dumps(commit)
+        ) for sha, commit in unique.items()])
+    
+    @staticmethod
+    def _ensure_column(cursor, table: str, column: str, definition: str) -> bool:
+        """Add a column to an existing table if it is missing, returns True if it was added"""
+        cursor.execute(f'PRAGMA table_info({table})')
+        if column not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+            return True
+        return False
+    
+    @staticmethod
+    def _fetch_hashes(cursor, query: str, params: tuple) -> Dict:
+        """Map entity key to stored content hash for the rows selected by query"""
+        cursor.execute(query, params)
+        return {row[0]: row[1] for row in cursor.fetchall()}
+    
+    @staticmethod
+    def _fetch_hashes_by_id(cursor, table: str, ids: List[int]) -> Dict[int, str]:
+        """Stored content hashes for the given ids, queried in chunks to stay under SQLite's variable limit"""
+        hashes = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f'SELECT id, content_hash FROM {table} WHERE id IN ({placeholders})', chunk)
+            hashes.update({row[0]: row[1] for row in cursor.fetchall()})
+        return hashes
             
     def save_config(self, gitlab_url: str, access_token: str):
         """Save GitLab configuration"""
@@ -164,16 +481,28 @@ class GitLabDatabase:
                 }
         return None
     
-    def save_groups(self, groups: List[Dict]):
-        """Save groups to database"""
+    def save_groups(self, groups: List[Dict]) -> Dict[str, int]:
+        """Save groups to database, skipping rows whose content is unchanged"""
+        counts = {'changed': 0, 'unchanged': 0}
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
+            existing = self._fetch_hashes_by_id(cursor, 'groups', [group['id'] for group in groups])
+            changed_parents = []
             for group in groups:
+                group_hash = content_hash(group)
+                if existing.get(group['id']) == group_hash:
+                    counts['unchanged'] += 1
+                    continue
+                if group['id'] in existing:
+                    # A moved group also leaves its previous parent's listing
+                    cursor.execute('SELECT parent_id FROM groups WHERE id = ?', (group['id'],))
+                    changed_parents.append(cursor.fetchone()[0])
+                changed_parents.append(group.get('parent_id'))
                 cursor.execute('''
                     INSERT OR REPLACE INTO groups 
                     (id, name, full_name, path, full_path, description, visibility, 
-                     avatar_url, web_url, parent_id, gitlab_data, last_synced)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                     avatar_url, web_url, parent_id, gitlab_data, content_hash, last_synced)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
                 ''', (
                     group['id'],
                     group.get('name', ''),
@@ -185,9 +514,14 @@ class GitLabDatabase:
                     group.get('avatar_url', ''),
                     group.get('web_url', ''),
                     group.get('parent_id'),
-                    json.dumps(group)
+                    json.dumps(group),
+                    group_hash
                 ))
+                counts['changed'] += 1
+            self._bump_data_versions(cursor, 'groups', changed_parents)
+            self._mark_refreshed(cursor, 'groups', [group.get('parent_id') for group in groups])
             conn.commit()
+        return counts
             
     def get_groups(self, parent_id: Optional[int] = None) -> List[Dict]:
         """Get groups from database"""
@@ -205,17 +539,83 @@ class GitLabDatabase:
         """Get subgroups for a group"""
         return self.get_groups(parent_id=group_id)
     
-    def save_projects(self, projects: List[Dict], group_id: Optional[int] = None):
-        """Save projects to database"""
+    def get_group_views(self, group_ids: List[int]) -> Dict[int, Dict]:
+        """
+        Groups with their subgroups, direct projects and project counts, read in one transaction
+        
+        Returns {group_id: {'group', 'subgroups', 'projects', 'total_projects'}} for the ids found;
+        total_projects also counts the projects of all nested subgroups.
+        """
+        if not group_ids:
+            return {}
+        placeholders = ','.join('?' * len(group_ids))
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        try:
+            cursor = conn.cursor()
+            # One read transaction, so all parts come from the same committed state
+            cursor.execute('BEGIN')
+            cursor.execute(f'SELECT * FROM groups WHERE id IN ({placeholders})', group_ids)
+            columns = [description[0] for description in cursor.description]
+            views = {}
+            for row in cursor.fetchall():
+                group = dict(zip(columns, row))
+                views[group['id']] = {'group': group, 'subgroups': [], 'projects': [], 'total_projects': 0}
+            
+            cursor.execute(f'SELECT * FROM groups WHERE parent_id IN ({placeholders}) ORDER BY name', group_ids)
+            columns = [description[0] for description in cursor.description]
+            for row in cursor.fetchall():
+                subgroup = dict(zip(columns, row))
+                if subgroup['parent_id'] in views:
+                    views[subgroup['parent_id']]['subgroups'].append(subgroup)
+            
+            cursor.execute(f'SELECT * FROM projects WHERE group_id IN ({placeholders}) ORDER BY name', group_ids)
+            columns = [description[0] for description in cursor.description]
+            for row in cursor.fetchall():
+                project = dict(zip(columns, row))
+                if project['group_id'] in views:
+                    views[project['group_id']]['projects'].append(project)
+            
+            cursor.execute(f'''
+                WITH RECURSIVE tree(root_id, id) AS (
+                    SELECT id, id FROM groups WHERE id IN ({placeholders})
+                    UNION ALL
+                    SELECT tree.root_id, groups.id FROM groups JOIN tree ON groups.parent_id = tree.id
+                )
+                SELECT tree.root_id, COUNT(projects.id) FROM tree
+                JOIN projects ON projects.group_id = tree.id
+                GROUP BY tree.root_id
+            ''', group_ids)
+            for group_id, total in cursor.fetchall():
+                views[group_id]['total_projects'] = total
+            cursor.execute('COMMIT')
+            return views
+        finally:
+            conn.close()
+    
+    def save_projects(self, projects: List[Dict], group_id: Optional[int] = None) -> Dict[str, int]:
+        """Save projects to database, skipping rows whose content is unchanged"""
+        counts = {'changed': 0, 'unchanged': 0}
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
+            existing = self._fetch_hashes_by_id(cursor, 'projects', [project['id'] for project in projects])
+            changed_groups = []
             for project in projects:
+                project_group_id = group_id or project.get('namespace', {}).get('id')
+                project_hash = content_hash([project_group_id, project])
+                if existing.get(project['id']) == project_hash:
+                    counts['unchanged'] += 1
+                    continue
+                if project['id'] in existing:
+                    cursor.execute('SELECT group_id FROM projects WHERE id = ?', (project['id'],))
+                    changed_groups.append(cursor.fetchone()[0])
+                changed_groups.append(project_group_id)
                 cursor.execute('''
                     INSERT OR REPLACE INTO projects 
                     (id, name, name_with_namespace, path, path_with_namespace, description,
                      default_branch, visibility, avatar_url, web_url, http_url_to_repo,
-                     ssh_url_to_repo, group_id, gitlab_data, last_synced)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                     ssh_url_to_repo, group_id, archived, last_activity_at, gitlab_data, content_hash,
+                     last_synced)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
                 ''', (
                     project['id'],
                     project.get('name', ''),
@@ -229,10 +629,19 @@ class GitLabDatabase:
                     project.get('web_url', ''),
                     project.get('http_url_to_repo', ''),
                     project.get('ssh_url_to_repo', ''),
-                    group_id or project.get('namespace', {}).get('id'),
-                    json.dumps(project)
+                    project_group_id,
+                    bool(project.get('archived', False)),
+                    project.get('last_activity_at'),
+                    json.dumps(project),
+                    project_hash
                 ))
+                counts['changed'] += 1
+            if changed_groups:
+                self._bump_data_versions(cursor, 'projects', changed_groups + [None])
+            self._mark_refreshed(cursor, 'projects', [group_id] if group_id else
+                                 [project.get('namespace', {}).get('id') for project in projects])
             conn.commit()
+        return counts
     
     def get_projects(self, group_id: Optional[int] = None) -> List[Dict]:
         """Get projects from database"""
@@ -257,19 +666,119 @@ class GitLabDatabase:
                 return dict(zip(columns, result))
         return None
     
-    def save_pipelines(self, pipelines: List[Dict], project_id: int):
-        """Save pipelines to database"""
+    # Columns needed to apply sync policies, read without decoding gitlab_data
+    PROJECT_SYNC_COLUMNS = ('id', 'path_with_namespace', 'default_branch', 'archived')
+    
+    def iter_projects(self, columns: tuple = ('id',), chunk_size: int = 1000,
+                      order_by_activity: bool = False) -> Iterator[Dict]:
+        """
+        Stream projects as dicts of the requested columns, chunk_size rows per query
+        
+        Uses keyset pagination, by id or by most recent activity, so memory stays flat however
+        many projects exist and no read transaction is held open between chunks.
+        """
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
-            # Clear existing pipelines for this project
-            cursor.execute('DELETE FROM pipelines WHERE project_id = ?', (project_id,))
+            cursor.execute('PRAGMA table_info(projects)')
+            known = {row[1] for row in cursor.fetchall()}
+        unknown = set(columns) - known
+        if unknown:
+            raise ValueError(f"Unknown project columns: {', '.join(sorted(unknown))}")
+        
+        select = ', '.join(columns)
+        if order_by_activity:
+            key_sql = "COALESCE(last_activity_at, '')"
+            first_query = f'SELECT {select}, {key_sql}, id FROM projects ORDER BY {key_sql} DESC, id LIMIT ?'
+            next_query = (f'SELECT {select}, {key_sql}, id FROM projects '
+                          f'WHERE {key_sql} < ? OR ({key_sql} = ? AND id > ?) '
+                          f'ORDER BY {key_sql} DESC, id LIMIT ?')
+        else:
+            first_query = f'SELECT {select}, NULL, id FROM projects ORDER BY id LIMIT ?'
+            next_query = f'SELECT {select}, NULL, id FROM projects WHERE id > ? ORDER BY id LIMIT ?'
+        
+        last = None
+        while True:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                if last is None:
+                    cursor.execute(first_query, (chunk_size,))
+                elif order_by_activity:
+                    cursor.execute(next_query, (last[0], last[0], last[1], chunk_size))
+                else:
+                    cursor.execute(next_query, (last[1], chunk_size))
+                rows = cursor.fetchall()
+            for row in rows:
+                yield dict(zip(columns, row[:-2]))
+            if len(rows) < chunk_size:
+                return
+            last = rows[-1][-2:]
+    
+    def get_project_sync_info(self, project_ids: List[int]) -> List[Dict]:
+        """Sync policy columns (see PROJECT_SYNC_COLUMNS) for the given projects"""
+        projects = []
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            for start in range(0, len(project_ids), 500):
+                chunk = project_ids[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f'''
+                    SELECT {', '.join(self.PROJECT_SYNC_COLUMNS)} FROM projects WHERE id IN ({placeholders})
+                ''', chunk)
+                projects.extend(dict(zip(self.PROJECT_SYNC_COLUMNS, row)) for row in cursor.fetchall())
+        return projects
+    
+    def get_protected_branch_names(self, project_id: int) -> List[str]:
+        """The project's default branch and any branch stored as protected"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT default_branch FROM projects WHERE id = ? AND default_branch IS NOT NULL
+                UNION
+                SELECT name FROM branches WHERE project_id = ? AND (protected OR default_branch)
+            ''', (project_id, project_id))
+            return [row[0] for row in cursor.fetchall()]
+    
+    # Terminal pipeline states; a pipeline in one of these only changes if it is retried
+    FINISHED_PIPELINE_STATUSES = ('success', 'failed', 'canceled', 'skipped')
+    # Keys of a pipeline in GitLab's pipeline listing, the shape stored in pipelines.gitlab_data
+    PIPELINE_LISTING_FIELDS = ('id', 'iid', 'project_id', 'sha', 'ref', 'status', 'source',
+                               'created_at', 'updated_at', 'web_url')
+    PIPELINE_TIMING_FIELDS = ('started_at', 'finished_at', 'duration')
+    
+    def save_pipelines(self, pipelines: List[Dict], project_id: int) -> Dict[str, int]:
+        """Save pipelines to database, skipping unchanged rows and removing ones no longer listed"""
+        counts = {'changed': 0, 'unchanged': 0, 'removed': 0}
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            existing = self._fetch_hashes(
+                cursor, 'SELECT id, content_hash FROM pipelines WHERE project_id = ?', (project_id,)
+            )
+            # Finished pipelines never change, so they are not even re-hashed
+            finished = dict(cursor.execute(f'''
+                SELECT id, status FROM pipelines
+                WHERE project_id = ? AND status IN ({','.join('?' * len(self.FINISHED_PIPELINE_STATUSES))})
+            ''', (project_id, *self.FINISHED_PIPELINE_STATUSES)).fetchall())
+            
+            # Remove pipelines that are no longer part of the project's listing
+            stale_ids = set(existing) - {pipeline['id'] for pipeline in pipelines}
+            for pipeline_id in stale_ids:
+                cursor.execute('DELETE FROM pipelines WHERE id = ?', (pipeline_id,))
+            counts['removed'] = len(stale_ids)
             
             for pipeline in pipelines:
+                if finished.get(pipeline['id']) == pipeline.get('status'):
+                    counts['unchanged'] += 1
+                    continue
+                pipeline_hash = content_hash(pipeline)
+                if existing.get(pipeline['id']) == pipeline_hash:
+                    counts['unchanged'] += 1
+                    continue
                 cursor.execute('''
-                    INSERT INTO pipelines 
+                    INSERT OR REPLACE INTO pipelines 
                     (id, project_id, status, ref, sha, tag, source, web_url,
-                     created_at, updated_at, started_at, finished_at, duration, gitlab_data, last_synced)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                     created_at, updated_at, started_at, finished_at, duration, gitlab_data,
+                     content_hash, last_synced)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
                 ''', (
                     pipeline['id'],
                     project_id,
@@ -284,9 +793,103 @@ class GitLabDatabase:
                     pipeline.get('started_at'),
                     pipeline.get('finished_at'),
                     pipeline.get('duration'),
-                    json.dumps(pipeline)
+                    json.dumps(pipeline),
+                    pipeline_hash
                 ))
+                counts['changed'] += 1
+            if counts['changed'] or counts['removed']:
+                self._bump_data_versions(cursor, 'pipelines', [project_id])
+            self._mark_refreshed(cursor, 'pipelines', [project_id])
             conn.commit()
+        return counts
+    
+    @staticmethod
+    def _merge_pipeline(cursor, project_id: int, pipeline: Dict, timings: Optional[Dict] = None) -> bool:
+        """
+        Upsert one pipeline on top of its stored data, returns False if nothing changed
+        
+        timings, if given, supplies the started_at/finished_at/duration columns instead of the
+        pipeline itself, for callers that keep those fields out of gitlab_data.
+        """
+        timings = timings if timings is not None else pipeline
+        cursor.execute('SELECT gitlab_data, content_hash FROM pipelines WHERE id = ?', (pipeline['id'],))
+        existing = cursor.fetchone()
+        if existing and existing[0]:
+            pipeline = {**json.loads(existing[0]), **{k: v for k, v in pipeline.items() if v is not None}}
+        pipeline_hash = content_hash(pipeline)
+        if existing and existing[1] == pipeline_hash:
+            return False
+        cursor.execute('''
+            INSERT OR REPLACE INTO pipelines
+            (id, project_id, status, ref, sha, tag, source, web_url,
+             created_at, updated_at, started_at, finished_at, duration, gitlab_data,
+             content_hash, last_synced)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ''', (
+            pipeline['id'],
+            project_id,
+            pipeline.get('status', ''),
+            pipeline.get('ref', ''),
+            pipeline.get('sha', ''),
+            pipeline.get('tag', False),
+            pipeline.get('source', ''),
+            pipeline.get('web_url', ''),
+            pipeline.get('created_at'),
+            pipeline.get('updated_at'),
+            timings.get('started_at'),
+            timings.get('finished_at'),
+            timings.get('duration'),
+            json.dumps(pipeline),
+            pipeline_hash
+        ))
+        return True
+    
+    def update_pipelines(self, pipelines: List[tuple]) -> Dict[str, int]:
+        """
+        Update individual (project_id, pipeline) rows in place, leaving the project's other pipelines alone
+        
+        The pipelines may be detail payloads (GET /pipelines/:id); only their listing fields are
+        stored in gitlab_data, so listing responses keep the shape syncs store, and their timings
+        go to the timing columns.
+        """
+        counts = {'changed': 0, 'unchanged': 0}
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            cursor = conn.cursor()
+            changed_projects = []
+            for project_id, pipeline in pipelines:
+                listing = {key: pipeline[key] for key in self.PIPELINE_LISTING_FIELDS if key in pipeline}
+                timings = {key: pipeline.get(key) for key in self.PIPELINE_TIMING_FIELDS}
+                if self._merge_pipeline(cursor, project_id, listing, timings):
+                    counts['changed'] += 1
+                    changed_projects.append(project_id)
+                else:
+                    counts['unchanged'] += 1
+            self._bump_data_versions(cursor, 'pipelines', changed_projects)
+            conn.commit()
+        return counts
+    
+    def get_pipelines_by_status(self, statuses: tuple) -> List[Dict]:
+        """Get id, project, status and timestamps of every pipeline in one of the given states"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            placeholders = ','.join('?' * len(statuses))
+            cursor.execute(f'''
+                SELECT id, project_id, status, ref, created_at, started_at FROM pipelines
+                WHERE status IN ({placeholders})
+            ''', statuses)
+            columns = [description[0] for description in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    
+    def get_pipeline(self, pipeline_id: int) -> Optional[Dict]:
+        """Get a single pipeline row"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM pipelines WHERE id = ?', (pipeline_id,))
+            result = cursor.fetchone()
+            if result:
+                columns = [description[0] for description in cursor.description]
+                return dict(zip(columns, result))
+        return None
     
     def get_pipelines(self, project_id: int) -> List[Dict]:
         """Get pipelines for a project"""
@@ -301,23 +904,152 @@ class GitLabDatabase:
             columns = [description[0] for description in cursor.description]
             return [dict(zip(columns, row)) for row in cursor.fetchall()]
     
-    def save_branches(self, branches: List[Dict], project_id: int):
-        """Save branches to database"""
+    # Listings served by iter_listing and count_listing: the table, its filter without and with
+    # an entity id, and the sort keys accepted by sort= ('-' prefix = descending). A sort key
+    # maps to its columns; the direction applies to the first and id always breaks ties, so
+    # pages never overlap. Defaults keep the order of get_groups, get_projects and get_pipelines.
+    LISTINGS = {
+        'groups': {
+            'table': 'groups', 'where': ('parent_id IS NULL', 'parent_id = :entity'),
+            'sorts': {'name': ('name',), 'path': ('full_path',), 'id': ('id',)},
+            'default_sort': 'name'
+        },
+        'projects': {
+            'table': 'projects', 'where': ('1', 'group_id = :entity'),
+            'sorts': {'name': ('name',), 'path': ('path_with_namespace',), 'id': ('id',),
+                      'last_activity_at': ("COALESCE(last_activity_at, '')",)},
+            'default_sort': 'name'
+        },
+        'pipelines': {
+            'table': 'pipelines', 'where': (None, 'project_id = :entity'),
+            'sorts': {'created_at': ('created_at',), 'updated_at': ('updated_at',), 'id': ('id',),
+                      'status': ('status',), 'ref': ('ref',)},
+            'default_sort': '-created_at'
+        },
+        # Used by get_branches; none of these columns also exist in the joined commits table
+        'branches': {
+            'table': 'branches', 'where': (None, 'project_id = :entity'),
+            'sorts': {'default': ('default_branch', 'name'), 'name': ('name',), 'id': ('id',)},
+            'default_sort': '-default'
+        },
+        # entity is the LIKE pattern
+        'search': {
+            'table': 'projects',
+            'where': (None, 'name LIKE :entity OR name_with_namespace LIKE :entity OR description LIKE :entity'),
+            'sorts': {'name': ('name',), 'path': ('path_with_namespace',), 'id': ('id',),
+                      'last_activity_at': ("COALESCE(last_activity_at, '')",)},
+            'default_sort': 'name'
+        }
+    }
+    
+    def _listing_clauses(self, listing: str, entity_id, sort: Optional[str] = None) -> tuple:
+        """WHERE and ORDER BY clauses of a listing; ValueError for an unknown sort key"""
+        spec = self.LISTINGS[listing]
+        where = spec['where'][1] if entity_id else spec['where'][0]
+        if where is None:
+            raise ValueError(f"Listing {listing} needs an id")
+        sort = sort or spec['default_sort']
+        columns = spec['sorts'].get(sort.lstrip('-'))
+        if columns is None:
+            raise ValueError(f"Cannot sort {listing} by '{sort.lstrip('-')}', "
+                             f"use one of: {', '.join(spec['sorts'])}")
+        direction = 'DESC' if sort.startswith('-') else 'ASC'
+        order = [f'{columns[0]} {direction}', *columns[1:], f'id {direction}']
+        return f'({where})', ', '.join(order)
+    
+    def count_listing(self, listing: str, entity_id=None) -> int:
+        """Number of rows in a listing"""
+        where, _ = self._listing_clauses(listing, entity_id)
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT COUNT(*) FROM {self.LISTINGS[listing]['table']} WHERE {where}",
+                           {'entity': entity_id})
+            return cursor.fetchone()[0]
+    
+    @staticmethod
+    def _json_value(path: str) -> str:
+        """
+        SQL for the JSON value at path in gitlab_data, as the -> operator returns it
+        
+        Spelled with json_extract, which every SQLite with JSON1 has (-> needs 3.38). json_extract
+        gives SQL values, so objects and arrays go through json() and booleans are rebuilt from
+        json_type instead of becoming 1 and 0.
+        """
+        return (f"CASE json_type(gitlab_data, {path}) "
+                f"WHEN 'object' THEN json(json_extract(gitlab_data, {path})) "
+                f"WHEN 'array' THEN json(json_extract(gitlab_data, {path})) "
+                f"WHEN 'true' THEN json('true') WHEN 'false' THEN json('false') "
+                f"ELSE json_extract(gitlab_data, {path}) END")
+    
+    def iter_listing(self, listing: str, entity_id=None, sort: Optional[str] = None,
+                     fields: Optional[List[str]] = None, limit: Optional[int] = None, offset: int = 0,
+                     chunk_size: int = 500) -> Iterator[sqlite3.Row]:
+        """
+        Stream the rows of a groups, projects, pipelines or search listing as sqlite3.Row objects
+        
+        Each row carries its stored GitLab JSON as payload. With fields, SQLite projects the
+        payload down to those top-level keys (missing keys become null; rows without stored JSON
+        have a NULL payload). Sorting, limit and offset run in the same indexed query. Rows are
+        read chunk_size at a time from that single query, so the listing is one consistent
+        snapshot and no row is turned into a dict. The connection closes when the iterator is
+        exhausted or closed.
+        """
+        where, order = self._listing_clauses(listing, entity_id, sort)
+        params = {'entity': entity_id, 'limit': -1 if limit is None else limit, 'offset': offset}
+        if fields:
+            pairs = []
+            for index, field in enumerate(fields):
+                params[f'field{index}'] = field
+                params[f'path{index}'] = f'$."{field}"'
+                pairs.append(f':field{index}, {self._json_value(f":path{index}")}')
+            payload = f"CASE WHEN gitlab_data IS NULL THEN NULL ELSE json_object({', '.join(pairs)}) END"
+        else:
+            payload = 'gitlab_data'
+        query = (f"SELECT *, {payload} AS payload FROM {self.LISTINGS[listing]['table']} "
+                 f"WHERE {where} ORDER BY {order} LIMIT :limit OFFSET :offset")
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+    
+    def save_branches(self, branches: List[Dict], project_id: int) -> Dict[str, int]:
+        """Save branches to database, skipping unchanged rows and removing deleted branches"""
+        counts = {'changed': 0, 'unchanged': 0, 'removed': 0}
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
-            # Clear existing branches for this project
-            cursor.execute('DELETE FROM branches WHERE project_id = ?', (project_id,))
+            existing = self._fetch_hashes(
+                cursor, 'SELECT name, content_hash FROM branches WHERE project_id = ?', (project_id,)
+            )
             
+            # Remove branches that no longer exist in GitLab
+            stale_names = set(existing) - {branch.get('name', '') for branch in branches}
+            for name in stale_names:
+                cursor.execute('DELETE FROM branches WHERE project_id = ? AND name = ?', (project_id, name))
+            counts['removed'] = len(stale_names)
+            
+            changed_branches = []
             for branch in branches:
-                commit = branch.get('commit', {})
+                branch_hash = content_hash(branch)
+                if existing.get(branch.get('name', '')) == branch_hash:
+                    counts['unchanged'] += 1
+                    continue
+                changed_branches.append(branch)
+                commit = branch.get('commit') or {}
+                # The commit itself lives in the commits table, keyed by commit_id
+                branch_data = {key: value for key, value in branch.items() if key != 'commit'}
                 cursor.execute('''
-                    INSERT INTO branches 
+                    INSERT OR REPLACE INTO branches 
                     (project_id, name, merged, protected, default_branch, developers_can_push,
-                     developers_can_merge, can_push, web_url, commit_id, commit_short_id,
-                     commit_title, commit_author_name, commit_author_email, commit_authored_date,
-                     commit_committer_name, commit_committer_email, commit_committed_date,
-                     commit_message, gitlab_data, last_synced)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                     developers_can_merge, can_push, web_url, commit_id, gitlab_data, content_hash,
+                     last_synced)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
                 ''', (
                     project_id,
                     branch.get('name', ''),
@@ -329,32 +1061,142 @@ class GitLabDatabase:
                     branch.get('can_push', False),
                     branch.get('web_url', ''),
                     commit.get('id', ''),
-                    commit.get('short_id', ''),
-                    commit.get('title', ''),
-                    commit.get('author_name', ''),
-                    commit.get('author_email', ''),
-                    commit.get('authored_date'),
-                    commit.get('committer_name', ''),
-                    commit.get('committer_email', ''),
-                    commit.get('committed_date'),
-                    commit.get('message', ''),
-                    json.dumps(branch)
+                    json.dumps(branch_data),
+                    branch_hash
                 ))
+                counts['changed'] += 1
+            self._save_commits(cursor, [branch.get('commit') for branch in changed_branches])
+            if counts['changed'] or counts['removed']:
+                self._bump_data_versions(cursor, 'branches', [project_id])
+            self._mark_refreshed(cursor, 'branches', [project_id])
             conn.commit()
+        return counts
+    
+    # Branch rows with their head commit joined in as commit_* columns
+    BRANCH_SELECT = '''
+        SELECT b.id, b.project_id, b.name, b.merged, b.protected, b.default_branch,
+               b.developers_can_push, b.developers_can_merge, b.can_push, b.web_url,
+               b.commit_id, b.last_synced, b.gitlab_data, b.content_hash,
+               c.short_id AS commit_short_id, c.title AS commit_title,
+               c.message AS commit_message, c.author_name AS commit_author_name,
+               c.author_email AS commit_author_email, c.authored_date AS commit_authored_date,
+               c.committer_name AS commit_committer_name,
+               c.committer_email AS commit_committer_email,
+               c.committed_date AS commit_committed_date, c.web_url AS commit_web_url,
+               c.gitlab_data AS commit_data
+        FROM branches b
+        LEFT JOIN commits c ON c.sha = b.commit_id
+    '''
     
-    def get_branches(self, project_id: int) -> List[Dict]:
-        """Get branches for a project"""
+    def get_branches(self, project_id: int, sort: Optional[str] = None, limit: Optional[int] = None,
+                     offset: int = 0) -> List[Dict]:
+        """Get branches for a project, with their head commit joined in as commit_* columns"""
+        where, order = self._listing_clauses('branches', project_id, sort)
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT * FROM branches 
-                WHERE project_id = ? 
-                ORDER BY default_branch DESC, name
-            ''', (project_id,))
+            cursor.execute(f'''
+                {self.BRANCH_SELECT}
+                WHERE {where}
+                ORDER BY {order}
+                LIMIT :limit OFFSET :offset
+            ''', {'entity': project_id, 'limit': -1 if limit is None else limit, 'offset': offset})
             
             columns = [description[0] for description in cursor.description]
             return [dict(zip(columns, row)) for row in cursor.fetchall()]
     
+    def get_branch(self, project_id: int, name: str) -> Optional[Dict]:
+        """Get one branch of a project, in the same shape as get_branches"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                {self.BRANCH_SELECT}
+                WHERE b.project_id = ? AND b.name = ?
+            ''', (project_id, name))
+            result = cursor.fetchone()
+            if result:
+                columns = [description[0] for description in cursor.description]
+                return dict(zip(columns, result))
+        return None
+    
+    def apply_webhook_changes(self, pipelines: List[tuple], branch_updates: List[tuple],
+                              branch_deletes: List[tuple], merged_branches: List[tuple],
+                              touched_projects: List[int], commits: Optional[List[Dict]] = None):
+        """Apply a batch of webhook-derived changes in a single transaction"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            # Heads of pushes without commits are SHA-only and must not replace stored commit details
+            self._save_commits(cursor, (commits or []) + [branch['commit'] for _, _, branch in branch_updates
+                                                          if len(branch['commit']) > 1],
+                               source='webhook')
+
+            for project_id, pipeline in pipelines:
+                self._merge_pipeline(cursor, project_id, pipeline)
+
+            for project_id, name, branch in branch_updates:
+                cursor.execute('SELECT gitlab_data FROM branches WHERE project_id = ? AND name = ?',
+                               (project_id, name))
+                existing = cursor.fetchone()
+                if existing:
+                    # Keep protection and permission flags from the last full sync, move the head
+                    merged_data = json.loads(existing[0]) if existing[0] else {}
+                    merged_data.update({'name': name, 'merged': False})
+                    merged_data.pop('commit', None)
+                else:
+                    merged_data = {key: value for key, value in branch.items() if key != 'commit'}
+                commit = branch['commit']
+                cursor.execute('''
+                    INSERT INTO branches
+                    (project_id, name, default_branch, web_url, commit_id, gitlab_data, content_hash,
+                     last_synced)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT(project_id, name) DO UPDATE SET
+                        merged = FALSE,
+                        commit_id = excluded.commit_id,
+                        gitlab_data = excluded.gitlab_data,
+                        content_hash = excluded.content_hash,
+                        last_synced = CURRENT_TIMESTAMP
+                ''', (
+                    project_id,
+                    name,
+                    branch.get('default', False),
+                    branch.get('web_url', ''),
+                    commit.get('id', ''),
+                    json.dumps(merged_data),
+                    content_hash({**merged_data, 'commit': commit})
+                ))
+
+            for project_id, name in branch_deletes:
+                cursor.execute('DELETE FROM branches WHERE project_id = ? AND name = ?', (project_id, name))
+
+            for project_id, name in merged_branches:
+                cursor.execute('SELECT gitlab_data FROM branches WHERE project_id = ? AND name = ?',
+                               (project_id, name))
+                existing = cursor.fetchone()
+                if not existing:
+                    continue
+                branch_data = json.loads(existing[0]) if existing[0] else {}
+                branch_data['merged'] = True
+                cursor.execute('''
+                    UPDATE branches SET merged = TRUE, gitlab_data = ?, content_hash = ?,
+                        last_synced = CURRENT_TIMESTAMP
+                    WHERE project_id = ? AND name = ?
+                ''', (json.dumps(branch_data), content_hash(branch_data), project_id, name))
+
+            for project_id in touched_projects:
+                cursor.execute('''
+                    INSERT OR REPLACE INTO sync_status
+                    (entity_type, entity_id, sync_status, error_message, last_sync)
+                    VALUES ('webhook', ?, 'completed', NULL, CURRENT_TIMESTAMP)
+                ''', (project_id,))
+            self._bump_data_versions(cursor, 'pipelines', [project_id for project_id, _ in pipelines])
+            self._bump_data_versions(cursor, 'branches',
+                                     [update[0] for update in branch_updates + branch_deletes + merged_branches])
+            # Webhook events carry current state, so they confirm the listings they touch
+            self._mark_refreshed(cursor, 'pipelines', [project_id for project_id, _ in pipelines])
+            self._mark_refreshed(cursor, 'branches',
+                                 [update[0] for update in branch_updates + branch_deletes + merged_branches])
+            conn.commit()
+
     def search_projects(self, query: str) -> List[Dict]:
         """Search projects by name"""
         with sqlite3.connect(self.db_path) as conn:
@@ -385,8 +1227,15 @@ class GitLabDatabase:
             cursor.execute('SELECT COUNT(*) FROM projects')
             total_projects = cursor.fetchone()[0]
             
-            # Get last sync time
-            cursor.execute('SELECT MAX(last_synced) FROM groups')
+            # Get last sync time (unchanged rows keep their old last_synced, so include completed syncs)
+            cursor.execute('''
+                SELECT MAX(synced) FROM (
+                    SELECT MAX(last_synced) AS synced FROM groups
+                    UNION ALL
+                    SELECT MAX(last_sync) FROM sync_status
+                    WHERE entity_type = 'full_sync' AND sync_status = 'completed'
+                )
+            ''')
             last_sync = cursor.fetchone()[0]
             
             return {
@@ -405,6 +1254,9 @@ class GitLabDatabase:
                 (entity_type, entity_id, sync_status, error_message, last_sync)
                 VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
             ''', (entity_type, entity_id, status, error))
+            if entity_type == 'full_sync' and status == 'completed':
+                # The dashboard summary reports the last completed full sync
+                self._bump_data_versions(cursor, 'summary', [None])
             conn.commit()
     
     def get_sync_status(self, entity_type: str, entity_id: Optional[int] = None) -> Optional[Dict]:
@@ -430,13 +1282,351 @@ class GitLabDatabase:
                 return dict(zip(columns, result))
         return None
     
+    def get_sync_age_seconds(self, entity_type: str, entity_id: Optional[int] = None) -> Optional[float]:
+        """Get seconds since the most recent sync status update for an entity type"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            if entity_id:
+                cursor.execute('''
+                    SELECT (julianday('now') - julianday(MAX(last_sync))) * 86400 FROM sync_status
+                    WHERE entity_type = ? AND entity_id = ?
+                ''', (entity_type, entity_id))
+            else:
+                cursor.execute('''
+                    SELECT (julianday('now') - julianday(MAX(last_sync))) * 86400 FROM sync_status
+                    WHERE entity_type = ?
+                ''', (entity_type,))
+            result = cursor.fetchone()
+            return result[0] if result else None
+    
+    def get_recently_synced_ids(self, entity_type: str, max_age_seconds: float) -> set:
+        """Get the entity ids whose sync status for an entity type was updated within max_age_seconds"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT entity_id FROM sync_status
+                WHERE entity_type = ? AND entity_id IS NOT NULL
+                AND (julianday('now') - julianday(last_sync)) * 86400 <= ?
+            ''', (entity_type, max_age_seconds))
+            return {row[0] for row in cursor.fetchall()}
+    
+    def get_immutable_object(self, cache_key: str) -> Optional[str]:
+        """Get a cached immutable GitLab response as stored JSON"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT data FROM immutable_objects WHERE cache_key = ?', (cache_key,))
+            result = cursor.fetchone()
+            return result[0] if result else None
+    
+    def save_immutable_object(self, cache_key: str, data: str):
+        """Store an immutable GitLab response; an existing entry is identical, so it is kept"""
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.execute('INSERT OR IGNORE INTO immutable_objects (cache_key, data) VALUES (?, ?)',
+                         (cache_key, data))
+            conn.commit()
+    
+    def get_sync_cursor(self, name: str) -> Optional[str]:
+        """Get the stored position of an incremental feed"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT value FROM sync_cursors WHERE name = ?', (name,))
+            result = cursor.fetchone()
+            return result[0] if result else None
+    
+    def save_sync_cursor(self, name: str, value: str):
+        """Store the position of an incremental feed"""
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO sync_cursors (name, value) VALUES (?, ?)
+                ON CONFLICT(name) DO UPDATE SET value = excluded.value, updated_at = CURRENT_TIMESTAMP
+            ''', (name, value))
+            conn.commit()
+    
+    def enqueue_sync_tasks(self, tasks: List[tuple]) -> int:
+        """
+        Queue (task_type, entity_id, priority) sync tasks
+        
+        Finished or failed tasks are re-queued; tasks already pending or leased only have their
+        priority raised, so planning the same work twice does not duplicate it.
+        """
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                INSERT INTO sync_tasks (task_type, entity_id, priority)
+                VALUES (?, ?, ?)
+                ON CONFLICT(task_type, entity_id) DO UPDATE SET
+                    priority = MAX(priority, excluded.priority),
+                    status = CASE WHEN status IN ('done', 'failed') THEN 'pending' ELSE status END,
+                    attempts = CASE WHEN status IN ('done', 'failed') THEN 0 ELSE attempts END,
+                    updated_at = CURRENT_TIMESTAMP
+            ''', tasks)
+            conn.commit()
+            return len(tasks)
+    
+    def claim_sync_tasks(self, worker_id: str, limit: int, lease_seconds: float,
+                         max_attempts: int = 5) -> List[Dict]:
+        """Atomically lease up to `limit` pending tasks, including tasks whose lease has expired"""
+        now = time.time()
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            cursor = conn.cursor()
+            # Take the write lock up front so two workers can never select the same rows
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                UPDATE sync_tasks SET status = 'failed', lease_owner = NULL,
+                    last_error = COALESCE(last_error, 'lease expired too many times')
+                WHERE status = 'leased' AND lease_expires_at < ? AND attempts >= ?
+            ''', (now, max_attempts))
+            cursor.execute('''
+                SELECT id FROM sync_tasks
+                WHERE status = 'pending' OR (status = 'leased' AND lease_expires_at < ?)
+                ORDER BY priority DESC, id
+                LIMIT ?
+            ''', (now, limit))
+            task_ids = [row[0] for row in cursor.fetchall()]
+            if task_ids:
+                placeholders = ','.join('?' * len(task_ids))
+                cursor.execute(f'''
+                    UPDATE sync_tasks SET status = 'leased', lease_owner = ?, lease_expires_at = ?,
+                        attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP
+                    WHERE id IN ({placeholders})
+                ''', (worker_id, now + lease_seconds, *task_ids))
+                cursor.execute(f'''
+                    SELECT id, task_type, entity_id, priority, attempts FROM sync_tasks
+                    WHERE id IN ({placeholders}) ORDER BY priority DESC, id
+                ''', task_ids)
+                columns = [description[0] for description in cursor.description]
+                tasks = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            else:
+                tasks = []
+            cursor.execute('COMMIT')
+            return tasks
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def heartbeat_sync_tasks(self, worker_id: str, task_ids: List[int], lease_seconds: float) -> int:
+        """Extend the leases a worker still holds, returning how many were extended"""
+        if not task_ids:
+            return 0
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            cursor = conn.cursor()
+            placeholders = ','.join('?' * len(task_ids))
+            cursor.execute(f'''
+                UPDATE sync_tasks SET lease_expires_at = ?
+                WHERE id IN ({placeholders}) AND lease_owner = ? AND status = 'leased'
+            ''', (time.time() + lease_seconds, *task_ids, worker_id))
+            conn.commit()
+            return cursor.rowcount
+    
+    def complete_sync_task(self, task_id: int, worker_id: str, error: Optional[str] = None,
+                           max_attempts: int = 5) -> bool:
+        """
+        Mark a leased task done, or return it to the queue on error
+        
+        Returns False when the lease was lost (the task expired and another worker took it over).
+        """
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            cursor = conn.cursor()
+            if error is None:
+                cursor.execute('''
+                    UPDATE sync_tasks SET status = 'done', lease_owner = NULL, last_error = NULL,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND lease_owner = ? AND status = 'leased'
+                ''', (task_id, worker_id))
+            else:
+                cursor.execute('''
+                    UPDATE sync_tasks SET
+                        status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                        lease_owner = NULL, last_error = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND lease_owner = ? AND status = 'leased'
+                ''', (max_attempts, error, task_id, worker_id))
+            conn.commit()
+            return cursor.rowcount == 1
+    
+    def get_sync_task_stats(self) -> Dict[str, int]:
+        """Count queued sync tasks by status"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT status, COUNT(*) FROM sync_tasks GROUP BY status')
+            stats = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+            stats.update({row[0]: row[1] for row in cursor.fetchall()})
+            return stats
+    
+    # Smallest heat stored, so heat_key = log2(heat) + ... stays finite
+    MIN_ACCESS_HEAT = 1e-300
+    
+    def merge_access_stats(self, entries: List[tuple], half_life_seconds: float):
+        """Merge (entity_type, entity_id, heat, last_access, hits) access counts into access_stats"""
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            cursor = conn.cursor()
+            for entity_type, entity_id, heat, last_access, hits in entries:
+                cursor.execute('''
+                    SELECT heat, last_access, hits FROM access_stats
+                    WHERE entity_type = ? AND entity_id = ?
+                ''', (entity_type, entity_id))
+                stored = cursor.fetchone()
+                if stored:
+                    stored_heat, stored_last, stored_hits = stored
+                    # Decay the older of the two readings to the newer one before adding them up
+                    newest = max(last_access, stored_last)
+                    heat = (heat * math.pow(0.5, (newest - last_access) / half_life_seconds) +
+                            stored_heat * math.pow(0.5, (newest - stored_last) / half_life_seconds))
+                    last_access = newest
+                    hits += stored_hits
+                # Heat of an entity idle for thousands of half-lives underflows to 0.0, which
+                # log2 rejects; the floor keeps it the coldest key instead
+                heat = max(heat, self.MIN_ACCESS_HEAT)
+                cursor.execute('''
+                    INSERT OR REPLACE INTO access_stats
+                    (entity_type, entity_id, heat, heat_key, hits, last_access)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (entity_type, entity_id, heat,
+                      math.log2(heat) + last_access / half_life_seconds, hits, last_access))
+            conn.commit()
+    
+    def get_hot_entities(self, entity_type: str, limit: int, half_life_seconds: float) -> List[tuple]:
+        """Get (entity_id, current_heat) of the most accessed entities, hottest first"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT entity_id, heat_key FROM access_stats
+                WHERE entity_type = ?
+                ORDER BY heat_key DESC
+                LIMIT ?
+            ''', (entity_type, limit))
+            now_key = time.time() / half_life_seconds
+            return [(row[0], math.pow(2, row[1] - now_key)) for row in cursor.fetchall()]
+    
+    def get_access_heat(self, entity_type: str, entity_ids: List[int], half_life_seconds: float) -> Dict[int, float]:
+        """Get current heat for specific entities; entities never accessed are omitted"""
+        heat = {}
+        now_key = time.time() / half_life_seconds
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            for start in range(0, len(entity_ids), 500):
+                chunk = entity_ids[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f'''
+                    SELECT entity_id, heat_key FROM access_stats
+                    WHERE entity_type = ? AND entity_id IN ({placeholders})
+                ''', (entity_type, *chunk))
+                heat.update({row[0]: math.pow(2, row[1] - now_key) for row in cursor.fetchall()})
+        return heat
+    
+    # Synced tables replaced as a whole by a rebuild (see swap_in_shadow)
+    REBUILD_TABLES = ('groups', 'projects', 'commits', 'pipelines', 'branches')
+    # Natural key and write-time column of each rebuilt table, used to merge live writes into a rebuild
+    REBUILD_KEYS = {
+        'groups': (('id',), 'last_synced'),
+        'projects': (('id',), 'last_synced'),
+        'commits': (('sha',), 'first_seen'),
+        'pipelines': (('id',), 'last_synced'),
+        'branches': (('project_id', 'name'), 'last_synced')
+    }
+    
+    def create_shadow(self) -> 'GitLabDatabase':
+        """Create an empty database next to this one for a full rebuild, carrying over access stats"""
+        shadow_path = f"{self.db_path}.rebuild"
+        self.remove_database_files(shadow_path)
+        shadow = GitLabDatabase(shadow_path)
+        shadow.rebuild_started_at = time.time()
+        with sqlite3.connect(shadow_path) as conn:
+            # Keeps the rebuild ordering projects by how often they are viewed
+            conn.execute('ATTACH DATABASE ? AS live', (self.db_path,))
+            conn.execute('INSERT INTO access_stats SELECT * FROM live.access_stats')
+            conn.commit()
+            conn.execute('DETACH DATABASE live')
+        return shadow
+    
+    def swap_in_shadow(self, shadow: 'GitLabDatabase') -> Dict[str, int]:
+        """Replace the synced tables with the shadow's contents in one transaction
+        
+        Readers keep seeing the previous data until the commit and the complete new data after it.
+        Rows written to the live tables since the rebuild began (webhooks, write-through, the
+        pipeline tracker) are merged back in unless the shadow holds a newer copy; deletions made
+        meanwhile are not replayed. Refresh times of listings the rebuild did not confirm are
+        cleared, so listings that no longer exist do not count as fresh.
+        """
+        started_at = shadow.rebuild_started_at or time.time()
+        # Same format as CURRENT_TIMESTAMP, which fills last_synced and first_seen
+        started_timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(started_at))
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            cursor = conn.cursor()
+            cursor.execute('ATTACH DATABASE ? AS shadow', (shadow.db_path,))
+            cursor.execute('BEGIN IMMEDIATE')
+            counts = {}
+            for table in self.REBUILD_TABLES:
+                key_columns, written_column = self.REBUILD_KEYS[table]
+                # branches.id is a surrogate key, the shadow numbers its rows independently
+                columns = ', '.join(row[1] for row in cursor.execute(f'PRAGMA main.table_info({table})')
+                                    if not (table == 'branches' and row[1] == 'id'))
+                cursor.execute(f'DROP TABLE IF EXISTS temp.live_{table}')
+                cursor.execute(f'''
+                    CREATE TEMP TABLE live_{table} AS
+                    SELECT {columns} FROM main.{table} WHERE {written_column} >= ?
+                ''', (started_timestamp,))
+                cursor.execute(f'DELETE FROM main.{table}')
+                cursor.execute(f'INSERT INTO main.{table} ({columns}) SELECT {columns} FROM shadow.{table}')
+                counts[table] = cursor.rowcount
+                key_match = ' AND '.join(f'rebuilt.{column} = live.{column}' for column in key_columns)
+                cursor.execute(f'''
+                    INSERT OR REPLACE INTO main.{table} ({columns})
+                    SELECT {columns} FROM temp.live_{table} AS live
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM main.{table} AS rebuilt
+                        WHERE {key_match} AND rebuilt.{written_column} > live.{written_column}
+                    )
+                ''')
+                if cursor.rowcount:
+                    counts[f'{table}_kept_live'] = cursor.rowcount
+                cursor.execute(f'DROP TABLE temp.live_{table}')
+            # The rebuild fetched every listing it stored
+            cursor.execute('''
+                INSERT INTO main.data_versions (scope_key, version, refreshed_at)
+                SELECT scope_key, 0, refreshed_at FROM shadow.data_versions WHERE refreshed_at IS NOT NULL
+                ON CONFLICT(scope_key) DO UPDATE SET refreshed_at = excluded.refreshed_at
+            ''')
+            # Listings confirmed neither by the rebuild nor by a live write since it began
+            cursor.execute('''
+                UPDATE main.data_versions SET refreshed_at = NULL
+                WHERE refreshed_at < ? AND scope_key NOT IN (
+                    SELECT scope_key FROM shadow.data_versions WHERE refreshed_at IS NOT NULL
+                )
+            ''', (started_at,))
+            self._bump_data_versions(cursor, '*', [None])
+            cursor.execute('COMMIT')
+            cursor.execute('DETACH DATABASE shadow')
+            return counts
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def remove_database_files(db_path: str):
+        """Delete a database file together with its WAL and shared-memory files"""
+        for path in (db_path, f"{db_path}-wal", f"{db_path}-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+    
     def clear_all_data(self):
         """Clear all data (for fresh sync)"""
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
             cursor.execute('DELETE FROM branches')
             cursor.execute('DELETE FROM pipelines')
+            cursor.execute('DELETE FROM commits')
+            cursor.execute('DELETE FROM immutable_objects')
             cursor.execute('DELETE FROM projects')
             cursor.execute('DELETE FROM groups')
             cursor.execute('DELETE FROM sync_status')
+            cursor.execute('DELETE FROM sync_tasks')
+            cursor.execute('UPDATE data_versions SET refreshed_at = NULL')
+            self._bump_data_versions(cursor, '*', [None])
             conn.commit()
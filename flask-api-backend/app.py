@@ -2,9 +2,16 @@ from flask import Flask, jsonify, request
 from flask_cors import CORS
 import requests
 import os
+import gzip
 from datetime import datetime
 import logging
 
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -16,6 +23,28 @@ CORS(app)  # Enable CORS for React frontend
 class Config:
     GITLAB_URL = os.getenv('GITLAB_URL', 'https://gitlab.com')
     GITLAB_TOKEN = os.getenv('GITLAB_TOKEN', '')
+    # JSON responses of at least this many bytes are sent with Brotli or gzip (0 = off)
+    COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', '1024'))
+
+@app.after_request
+def compress_response(response):
+    """Compress JSON responses with Brotli or gzip, whichever the client accepts"""
+    if (response.status_code != 200 or response.mimetype != 'application/json'
+            or 'Content-Encoding' in response.headers or response.direct_passthrough):
+        return response
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if not Config.COMPRESSION_MIN_BYTES or len(body) < Config.COMPRESSION_MIN_BYTES:
+        return response
+    encoding = request.accept_encodings.best_match(['br', 'gzip'] if BROTLI_AVAILABLE else ['gzip'])
+    if encoding == 'br':
+        response.set_data(brotli.compress(body, quality=4))
+    elif encoding == 'gzip':
+        response.set_data(gzip.compress(body, compresslevel=6, mtime=0))
+    else:
+        return response
+    response.headers['Content-Encoding'] = encoding
+    return response
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
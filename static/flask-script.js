@@ -426,12 +426,55 @@ class GitLabDashboardFlask {
             </div>
         `;
 
+        // Subgroups and projects of every group in one request instead of two per group
+        const views = await this.fetchGroupViews(groups.map(group => group.id));
         for (const group of groups) {
-            const groupElement = await this.createTreeGroupElement(group);
+            const groupElement = await this.createTreeGroupElement(group, views.get(group.id));
             treeContainer.appendChild(groupElement);
         }
     }
 
+    // Load subgroups, projects and counts of several groups with one request per 100 groups
+    async fetchGroupViews(groupIds) {
+        const views = new Map();
+        for (let i = 0; i < groupIds.length; i += 100) {
+            const ids = groupIds.slice(i, i + 100);
+            try {
+                const response = await fetch(`${this.baseApiUrl}/groups/view?ids=${ids.join(',')}`);
+                const result = await response.json();
+                if (response.ok && result.success) {
+                    result.groups.forEach(view => views.set(view.group.id, view));
+                }
+            } catch (error) {
+                console.warn('Failed to load group views:', error);
+            }
+        }
+        return views;
+    }
+
+    // Subgroups and projects of one group; groups not synced yet go through the per-listing endpoints
+    async fetchGroupView(groupId) {
+        groupId = Number(groupId);
+        const views = await this.fetchGroupViews([groupId]);
+        return views.has(groupId) ? views.get(groupId) : this.fetchGroupListings(groupId);
+    }
+
+    // Subgroups and projects of one group from the per-listing endpoints, for groups the batched view missed
+    async fetchGroupListings(groupId) {
+        const [subgroupsResponse, projectsResponse] = await Promise.all([
+            fetch(`${this.baseApiUrl}/groups/${groupId}/subgroups`),
+            fetch(`${this.baseApiUrl}/groups/${groupId}/projects`)
+        ]);
+        const subgroupsResult = await subgroupsResponse.json();
+        const projectsResult = await projectsResponse.json();
+
+        return {
+            group: null,
+            subgroups: (subgroupsResponse.ok && subgroupsResult.success && subgroupsResult.subgroups) ? subgroupsResult.subgroups : [],
+            projects: (projectsResponse.ok && projectsResult.success && projectsResult.projects) ? projectsResult.projects : []
+        };
+    }
+
     // Render tree view from cache (without individual API calls)
     async renderTreeViewFromCache(groups) {
         const treeContainer = document.getElementById('treeView');
@@ -479,23 +522,14 @@ class GitLabDashboardFlask {
         }
     }
 
-    // Create tree group element
-    async createTreeGroupElement(group) {
+    // Create tree group element from its prefetched view; groups the batch missed use the per-listing endpoints
+    async createTreeGroupElement(group, view) {
         const groupDiv = document.createElement('div');
         groupDiv.className = 'tree-group-container';
 
         try {
             // Get subgroups and projects for this group
-            const [subgroupsResult, projectsResult] = await Promise.all([
-                fetch(`${this.baseApiUrl}/groups/${group.id}/subgroups`),
-                fetch(`${this.baseApiUrl}/groups/${group.id}/projects`)
-            ]);
-
-            const subgroupsResponse = await subgroupsResult.json();
-            const projectsResponse = await projectsResult.json();
-            
-            const subgroups = (subgroupsResult.ok && subgroupsResponse.success && subgroupsResponse.subgroups) ? subgroupsResponse.subgroups : [];
-            const projects = (projectsResult.ok && projectsResponse.success && projectsResponse.projects) ? projectsResponse.projects : [];
+            const { subgroups, projects } = view || await this.fetchGroupListings(group.id);
 
             const hasChildren = (subgroups && subgroups.length > 0) || (projects && projects.length > 0);
 
@@ -629,17 +663,8 @@ class GitLabDashboardFlask {
         if (!contentElement || contentElement.dataset.loaded === 'true') return;
 
         try {
-            // Load subgroups and projects in parallel
-            const [subgroupsResponse, projectsResponse] = await Promise.all([
-                fetch(`${this.baseApiUrl}/groups/${groupId}/subgroups`),
-                fetch(`${this.baseApiUrl}/groups/${groupId}/projects`)
-            ]);
-
-            const subgroupsResult = await subgroupsResponse.json();
-            const projectsResult = await projectsResponse.json();
-            
-            const subgroups = (subgroupsResponse.ok && subgroupsResult.success && subgroupsResult.subgroups) ? subgroupsResult.subgroups : [];
-            const projects = (projectsResponse.ok && projectsResult.success && projectsResult.projects) ? projectsResult.projects : [];
+            // Load subgroups and projects in one request
+            const { subgroups, projects } = await this.fetchGroupView(groupId);
 
             // Render the content
             contentElement.innerHTML = `
@@ -683,19 +708,15 @@ class GitLabDashboardFlask {
         this.setActiveTreeItem(event ? event.target.parentElement : null);
         
         try {
-            const [groupResponse, subgroupsResponse, projectsResponse] = await Promise.all([
-                fetch(`${this.baseApiUrl}/groups`),
-                fetch(`${this.baseApiUrl}/groups/${groupId}/subgroups`),
-                fetch(`${this.baseApiUrl}/groups/${groupId}/projects`)
-            ]);
-
-            const groupsResult = await groupResponse.json();
-            const subgroupsResult = await subgroupsResponse.json();
-            const projectsResult = await projectsResponse.json();
-
-            const group = groupsResult.groups.find(g => g.id === groupId);
-            const subgroups = subgroupsResult.subgroups || [];
-            const projects = projectsResult.projects || [];
+            // The group itself comes with its view; only unsynced groups need the groups list
+            const view = await this.fetchGroupView(groupId);
+            const { subgroups, projects } = view;
+            let group = view.group;
+            if (!group) {
+                const groupResponse = await fetch(`${this.baseApiUrl}/groups`);
+                const groupsResult = await groupResponse.json();
+                group = (groupsResult.groups || []).find(g => g.id === groupId);
+            }
 
             if (group) {
                 document.getElementById('contentTitle').innerHTML = `<i class="fas fa-layer-group"></i> ${this.escapeHtml(group.name)}`;
@@ -1407,9 +1428,10 @@ class GitLabDashboardFlask {
     async showPipelineDetails(projectId, pipelineId) {
         try {
             const response = await fetch(`${this.baseApiUrl}/projects/${projectId}/pipelines/${pipelineId}`);
-            const pipeline = await response.json();
+            const result = await response.json();
+            const pipeline = result.pipeline;
 
-            if (response.ok && pipeline.success) {
+            if (response.ok && result.success && pipeline) {
                 // Create and show modal with pipeline details
                 const modalHtml = `
                     <div class="modal fade" id="pipelineModal" tabindex="-1">
@@ -1460,7 +1482,7 @@ class GitLabDashboardFlask {
                 const modal = new bootstrap.Modal(document.getElementById('pipelineModal'));
                 modal.show();
             } else {
-                this.showError(`Failed to load pipeline details: ${pipeline.error}`);
+                this.showError(`Failed to load pipeline details: ${result.error}`);
             }
         } catch (error) {
             this.showError(`Error loading pipeline details: ${error.message}`);
@@ -1690,10 +1712,63 @@ function handleSearchKeypress(event) {
     }
 }
 
+// Render live sync progress received from /api/sync/events
+function renderSyncProgress(alertDiv, state) {
+    const counts = state.counts || {};
+    const countText = ['groups', 'projects', 'pipelines', 'branches']
+        .filter(entity => counts[entity])
+        .map(entity => `${counts[entity].success} ${entity}`)
+        .join(', ');
+    const rate = state.entitiesPerSecond !== undefined ? ` (${state.entitiesPerSecond}/s)` : '';
+    const errors = state.errors > 0 ? ` &middot; ${state.errors} errors` : '';
+    
+    alertDiv.innerHTML = `
+        <div class="alert alert-info alert-dismissible fade show" role="alert">
+            <i class="fas fa-sync-alt fa-spin"></i> Synchronizing ${state.stage || 'data'}...
+            ${countText ? `<br><small>${countText}${rate}${errors}</small>` : ''}
+            <button type="button" class="btn-close" data-bs-dismiss="alert"></button>
+        </div>
+    `;
+}
+
+// Subscribe to sync progress events, returns the EventSource (or null if unsupported)
+function openSyncProgressStream(alertDiv) {
+    if (!window.EventSource) {
+        return null;
+    }
+    
+    const state = { stage: null, counts: {}, errors: 0 };
+    const source = new EventSource('/api/sync/events');
+    
+    source.addEventListener('stage', event => {
+        const data = JSON.parse(event.data);
+        if (data.status === 'started') {
+            state.stage = data.stage;
+            renderSyncProgress(alertDiv, state);
+        }
+    });
+    source.addEventListener('progress', event => {
+        const data = JSON.parse(event.data);
+        state.counts = data.counts;
+        state.entitiesPerSecond = data.entities_per_second;
+        renderSyncProgress(alertDiv, state);
+    });
+    source.addEventListener('error', event => {
+        // Also fired by EventSource itself on connection problems, without data
+        if (event.data) {
+            state.errors += 1;
+            renderSyncProgress(alertDiv, state);
+        }
+    });
+    
+    return source;
+}
+
 // Trigger full synchronization
 async function triggerFullSync() {
     const syncButton = document.getElementById('syncButton');
     const syncIcon = document.getElementById('syncIcon');
+    let progressStream = null;
     
     try {
         // Show loading state
@@ -1708,18 +1783,23 @@ async function triggerFullSync() {
                 <button type="button" class="btn-close" data-bs-dismiss="alert"></button>
             </div>
         `;
+        progressStream = openSyncProgressStream(alertDiv);
 
         const response = await fetch('/api/sync/full', {
             method: 'POST'
         });
 
         const result = await response.json();
+        if (progressStream) {
+            progressStream.close();
+            progressStream = null;
+        }
 
         if (response.ok && result.success) {
             alertDiv.innerHTML = `
                 <div class="alert alert-success alert-dismissible fade show" role="alert">
                     <i class="fas fa-check-circle"></i> Synchronization completed! 
-                    Updated: ${result.results.groups.success} groups, ${result.results.projects.success} projects, ${result.results.pipelines.success} pipelines, ${result.results.branches.success} branches
+                    Updated: ${result.groups.success} groups, ${result.projects.success} projects, ${result.pipelines.success} pipelines, ${result.branches.success} branches
                     <button type="button" class="btn-close" data-bs-dismiss="alert"></button>
                 </div>
             `;
@@ -1745,6 +1825,9 @@ async function triggerFullSync() {
             </div>
         `;
     } finally {
+        if (progressStream) {
+            progressStream.close();
+        }
         syncButton.disabled = false;
         syncIcon.classList.remove('fa-spin');
     }
@@ -1,428 +1,605 @@
 import asyncio
 import logging
-from typing import Optional, Dict, List
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Dict, List, Iterator
+from concurrent.futures import ThreadPoolExecutor
 from database import GitLabDatabase
+from utils.concurrency import AdaptiveConcurrencyLimiter
+from utils.error_handler import SyncInProgressError
+from utils.sync_policy import SyncPolicy
 import requests
 
 class GitLabSyncService:
-    def __init__(self, db: GitLabDatabase):
+    # Task types understood by queue workers (see sync_worker.py)
+    TASK_GROUP_LISTING = 'group_listing'
+    TASK_PROJECT_PIPELINES = 'project_pipelines'
+    TASK_PROJECT_BRANCHES = 'project_branches'
+    
+    def __init__(self, db: GitLabDatabase, access_tracker=None, events=None,
+                 sync_policy: Optional[SyncPolicy] = None):
         self.db = db
         self.logger = logging.getLogger(__name__)
         self.gitlab_api = None
+        # Optional SyncEventBroadcaster receiving stage, progress and error events
+        self.events = events
+        self.progress_interval = 0.5
+        self._sync_started = None
+        self._last_progress = 0.0
+        # Recently viewed projects are refreshed first; with a budget, cold projects wait for a later run
+        self.access_tracker = access_tracker
+        self.project_budget = int(os.environ.get('SYNC_PROJECT_BUDGET', '0'))
+        self.hot_project_limit = int(os.environ.get('SYNC_HOT_PROJECT_LIMIT', '1000'))
+        # With webhooks delivering pipeline and branch updates, polling them is only a consistency check
+        self.webhook_poll_interval = float(os.environ.get('WEBHOOK_POLL_INTERVAL_HOURS', '24')) * 3600
+        # Projects with a recent webhook, skipped by the pipeline and branch stages of the current sync
+        self.webhook_current_projects = set()
+        # Which groups are synced and how deeply; archived projects are excluded by default
+        self.sync_policy = sync_policy or SyncPolicy()
+        # Per-project requests run in parallel; the limiter adapts how many are in flight
+        self.concurrency = AdaptiveConcurrencyLimiter(
+            max_limit=int(os.environ.get('SYNC_MAX_CONCURRENCY', '16'))
+        )
+        # Held by the running full, warm-up, queued or per-project sync (see exclusive)
+        self._sync_lock = threading.Lock()
+        self.running_sync = None
         
     def set_gitlab_api(self, gitlab_api):
         """Set the GitLab API instance"""
         self.gitlab_api = gitlab_api
+        if gitlab_api is not None:
+            gitlab_api.observer = self.concurrency.observe
+    
+    @contextmanager
+    def exclusive(self, kind: str, gitlab_api=None):
+        """
+        Hold the service for one sync at a time
+        
+        Syncs share this service's API client, progress state and rows, so every entry point
+        (full sync and warm-up, queued sync planning, per-project sync, initial sync) takes
+        this guard and a second one raises SyncInProgressError instead of running alongside.
+        gitlab_api, if given, is installed once the service is held.
+        """
+        if not self._sync_lock.acquire(blocking=False):
+            raise SyncInProgressError(f"A {self.running_sync} sync is already running")
+        self.running_sync = kind
+        try:
+            if gitlab_api is not None:
+                self.set_gitlab_api(gitlab_api)
+            yield
+        finally:
+            self.running_sync = None
+            self._sync_lock.release()
+    
+    async def full_sync(self, force: bool = False, rebuild: bool = False, gitlab_api=None) -> Dict:
+        """Perform a full synchronization of all GitLab data
+        
+        With rebuild, everything is synced into a shadow database and swapped in once complete,
+        so the dashboard keeps serving the previous data instead of a half-populated one.
+        Raises SyncInProgressError while another sync holds the service.
+        """
+        with self.exclusive('rebuild' if rebuild else 'full', gitlab_api):
+            return await self._full_sync(force, rebuild)
     
-    async def full_sync(self) -> Dict:
-        """Perform a full synchronization of all GitLab data"""
+    async def _full_sync(self, force: bool, rebuild: bool) -> Dict:
         if not self.gitlab_api:
             raise Exception("GitLab API not configured")
         
-        sync_results = {
-            'groups': {'success': 0, 'failed': 0, 'errors': []},
-            'projects': {'success': 0, 'failed': 0, 'errors': []},
-            'pipelines': {'success': 0, 'failed': 0, 'errors': []},
-            'branches': {'success': 0, 'failed': 0, 'errors': []}
-        }
+        sync_results = self.new_sync_results()
+        kind = 'rebuild' if rebuild else 'full'
+        
+        self._sync_started = time.time()
+        self._emit('sync', status='started', kind=kind)
         
         try:
-            # Step 1: Sync groups and subgroups
-            self.logger.info("Starting groups synchronization...")
-            await self.sync_groups(sync_results)
-            
-            # Step 2: Sync projects
-            self.logger.info("Starting projects synchronization...")
-            await self.sync_projects(sync_results)
-            
-            # Step 3: Sync pipelines for each project
-            self.logger.info("Starting pipelines synchronization...")
-            await self.sync_pipelines(sync_results)
-            
-            # Step 4: Sync branches for each project
-            self.logger.info("Starting branches synchronization...")
-            await self.sync_branches(sync_results)
+            if rebuild:
+                await self._rebuild(sync_results)
+            else:
+                await self._sync_stages(sync_results, force)
             
             self.db.update_sync_status('full_sync', None, 'completed')
             self.logger.info("Full synchronization completed successfully")
+            self._emit('sync', status='completed', kind=kind, **self._progress_summary(sync_results))
             
         except Exception as e:
             self.logger.error(f"Full sync failed: {str(e)}")
             self.db.update_sync_status('full_sync', None, 'failed', str(e))
+            self._emit('sync', status='failed', kind=kind, error=str(e),
+                       **self._progress_summary(sync_results))
             raise
         
         return sync_results
     
-    async def sync_groups(self, sync_results: Dict):
-        """Sync all groups and subgroups"""
+    async def _sync_stages(self, sync_results: Dict, force: bool):
+        # Step 1: Sync groups and subgroups
+        await self._run_stage('groups', self.sync_groups, sync_results)
+        
+        # Step 2: Sync projects
+        await self._run_stage('projects', self.sync_projects, sync_results)
+        
+        full_poll = force or self.project_polling_due()
+        self.webhook_current_projects = set() if full_poll else self.projects_kept_current()
+        if self.webhook_current_projects is None:
+            self.webhook_current_projects = set()
+            self.logger.info("Change feed is active, skipping pipeline and branch polling")
+            sync_results['pipelines']['skipped'] = 'change_feed_active'
+            sync_results['branches']['skipped'] = 'change_feed_active'
+            for stage in ('pipelines', 'branches'):
+                self._emit('stage', stage=stage, status='skipped', reason='change_feed_active')
+            return
+        
         try:
-            # Get all groups
-            groups_data = self.gitlab_api.get_groups()
-            if not groups_data['success']:
-                raise Exception(groups_data['error'])
-            
-            groups = groups_data['groups']
-            self.db.save_groups(groups)
-            sync_results['groups']['success'] += len(groups)
+            # Step 3: Sync branches for each project; protected-level pipelines are filtered by them
+            await self._run_stage('branches', self.sync_branches, sync_results)
             
-            # Get subgroups for each group
-            for group in groups:
-                try:
-                    subgroups_data = self.gitlab_api.get_subgroups(group['id'])
-                    if subgroups_data['success']:
-                        subgroups = subgroups_data['subgroups']
-                        if subgroups:
-                            # Mark subgroups with parent_id
-                            for subgroup in subgroups:
-                                subgroup['parent_id'] = group['id']
-                            self.db.save_groups(subgroups)
-                            sync_results['groups']['success'] += len(subgroups)
-                except Exception as e:
-                    error_msg = f"Failed to sync subgroups for group {group['id']}: {str(e)}"
-                    self.logger.error(error_msg)
-                    sync_results['groups']['errors'].append(error_msg)
-                    sync_results['groups']['failed'] += 1
-                    
-        except Exception as e:
-            error_msg = f"Failed to sync groups: {str(e)}"
-            self.logger.error(error_msg)
-            sync_results['groups']['errors'].append(error_msg)
-            raise
+            # Step 4: Sync pipelines for each project
+            await self._run_stage('pipelines', self.sync_pipelines, sync_results)
+        finally:
+            self.webhook_current_projects = set()
+        
+        if full_poll:
+            self.db.update_sync_status('project_poll', 0, 'completed')
     
-    async def sync_projects(self, sync_results: Dict):
-        """Sync all projects"""
+    async def _rebuild(self, sync_results: Dict):
+        """Run every stage against a shadow database, then swap its tables in atomically"""
+        shadow_db = self.db.create_shadow()
         try:
-            # Get all groups from database
-            all_groups = self.db.get_groups()
-            subgroups = self.db.get_groups(parent_id=0)  # This will get subgroups
+            shadow = GitLabSyncService(shadow_db, self.access_tracker, self.events, self.sync_policy)
+            # Share the limiter so the rebuild starts from the concurrency GitLab is known to handle
+            shadow.concurrency = self.concurrency
+            shadow.gitlab_api = self.gitlab_api
+            shadow._sync_started = self._sync_started
+            # Every project goes into the shadow: one deferred by the budget would lose its rows on swap
+            shadow.project_budget = 0
+            await shadow._sync_stages(sync_results, force=True)
             
-            # Add subgroups to the list
-            for group in all_groups:
-                subgroups.extend(self.db.get_subgroups(group['id']))
+            incomplete = [entity for entity in ('groups', 'projects', 'pipelines', 'branches')
+                          if sync_results[entity]['errors']]
+            if incomplete:
+                # Any partial listing would drop live data on swap
+                raise Exception(f"Rebuild incomplete ({', '.join(incomplete)} failed), keeping the current data")
             
-            all_groups.extend(subgroups)
-            
-            # Sync projects for each group
-            for group in all_groups:
-                try:
-                    projects_data = self.gitlab_api.get_group_projects(group['id'])
-                    if projects_data['success']:
-                        projects = projects_data['projects']
-                        if projects:
-                            self.db.save_projects(projects, group['id'])
-                            sync_results['projects']['success'] += len(projects)
-                except Exception as e:
-                    error_msg = f"Failed to sync projects for group {group['id']}: {str(e)}"
-                    self.logger.error(error_msg)
-                    sync_results['projects']['errors'].append(error_msg)
-                    sync_results['projects']['failed'] += 1
-                    
-        except Exception as e:
-            error_msg = f"Failed to sync projects: {str(e)}"
-            self.logger.error(error_msg)
-            sync_results['projects']['errors'].append(error_msg)
-            raise
+            self._emit('stage', stage='swap', status='started')
+            swapped = self.db.swap_in_shadow(shadow_db)
+            self.db.update_sync_status('project_poll', 0, 'completed')
+            self.logger.info(f"Swapped in rebuilt data: {swapped}")
+            self._emit('stage', stage='swap', status='completed', counts=swapped)
+        finally:
+            self.db.remove_database_files(shadow_db.db_path)
     
-    async def sync_pipelines(self, sync_results: Dict):
-        """Sync pipelines for all projects"""
+    async def _run_stage(self, stage: str, stage_method, sync_results: Dict):
+        """Run one sync stage, announcing its start and end to event subscribers"""
+        self.logger.info(f"Starting {stage} synchronization...")
+        self._emit('stage', stage=stage, status='started')
         try:
-            # Get all projects from database
-            projects = self.db.get_projects()
-            
-            for project in projects:
-                try:
-                    pipelines_data = self.gitlab_api.get_project_pipelines(project['id'])
-                    if pipelines_data['success']:
-                        pipelines = pipelines_data['pipelines']
-                        self.db.save_pipelines(pipelines, project['id'])
-                        sync_results['pipelines']['success'] += len(pipelines)
-                except Exception as e:
-                    error_msg = f"Failed to sync pipelines for project {project['id']}: {str(e)}"
-                    self.logger.error(error_msg)
-                    sync_results['pipelines']['errors'].append(error_msg)
-                    sync_results['pipelines']['failed'] += 1
-                    
-        except Exception as e:
-            error_msg = f"Failed to sync pipelines: {str(e)}"
-            self.logger.error(error_msg)
-            sync_results['pipelines']['errors'].append(error_msg)
+            await stage_method(sync_results)
+        except Exception:
+            self._emit('stage', stage=stage, status='failed', counts=self._counts(sync_results[stage]))
             raise
+        self._emit('stage', stage=stage, status='completed', counts=self._counts(sync_results[stage]))
+        self._report_progress(sync_results, force=True)
     
-    async def sync_branches(self, sync_results: Dict):
-        """Sync branches for all projects"""
-        try:
-            # Get all projects from database
-            projects = self.db.get_projects()
-            
-            for project in projects:
-                try:
-                    branches_data = self.gitlab_api.get_project_branches(project['id'])
-                    if branches_data['success']:
-                        branches = branches_data['branches']
-                        self.db.save_branches(branches, project['id'])
-                        sync_results['branches']['success'] += len(branches)
-                except Exception as e:
-                    error_msg = f"Failed to sync branches for project {project['id']}: {str(e)}"
-                    self.logger.error(error_msg)
-                    sync_results['branches']['errors'].append(error_msg)
-                    sync_results['branches']['failed'] += 1
-                    
-        except Exception as e:
-            error_msg = f"Failed to sync branches: {str(e)}"
-            self.logger.error(error_msg)
-            sync_results['branches']['errors'].append(error_msg)
-            raise
+    def _emit(self, event_type: str, **data):
+        if self.events:
+            self.events.publish(event_type, data)
     
-    async def sync_single_project(self, project_id: int) -> Dict:
-        """Sync data for a single project"""
-        if not self.gitlab_api:
-            raise Exception("GitLab API not configured")
-        
-        sync_results = {
-            'pipelines': {'success': 0, 'failed': 0, 'errors': []},
-            'branches': {'success': 0, 'failed': 0, 'errors': []}
-        }
-        
-        try:
-            # Sync pipelines
-            pipelines_data = self.gitlab_api.get_project_pipelines(project_id)
-            if pipelines_data['success']:
-                pipelines = pipelines_data['pipelines']
-                self.db.save_pipelines(pipelines, project_id)
-                sync_results['pipelines']['success'] = len(pipelines)
-            else:
-                sync_results['pipelines']['errors'].append(pipelines_data.get('error', 'Unknown error'))
-                sync_results['pipelines']['failed'] = 1
-            
-            # Sync branches
-            branches_data = self.gitlab_api.get_project_branches(project_id)
-            if branches_data['success']:
-                branches = branches_data['branches']
-                self.db.save_branches(branches, project_id)
-                sync_results['branches']['success'] = len(branches)
-            else:
-                sync_results['branches']['errors'].append(branches_data.get('error', 'Unknown error'))
-                sync_results['branches']['failed'] = 1
-            
-            self.db.update_sync_status('project_sync', project_id, 'completed')
-            
-        except Exception as e:
-            error_msg = f"Failed to sync project {project_id}: {str(e)}"
-            self.logger.error(error_msg)
-            self.db.update_sync_status('project_sync', project_id, 'failed', str(e))
-            raise
-        
-        return sync_results
+    @staticmethod
+    def _counts(entity_results: Dict) -> Dict:
+        return {key: value for key, value in entity_results.items() if key != 'errors'}
     
-    def get_sync_status(self) -> Dict:
-        """Get overall sync status"""
-        full_sync_status = self.db.get_sync_status('full_sync')
-        stats = self.db.get_dashboard_stats()
-        
+    def _progress_summary(self, sync_results: Dict) -> Dict:
+        elapsed = time.time() - (self._sync_started or time.time())
+        synced = sum(entity_results.get('success', 0) for entity_results in sync_results.values())
         return {
-            'last_full_sync': full_sync_status['last_sync'] if full_sync_status else None,
-            'sync_status': full_sync_status['sync_status'] if full_sync_status else 'never',
-            'error_message': full_sync_status['error_message'] if full_sync_status else None,
-            'stats': stats
+            'counts': {entity: self._counts(entity_results) for entity, entity_results in sync_results.items()},
+            'elapsed_seconds': round(elapsed, 2),
+            'entities_per_second': round(synced / elapsed, 1) if elapsed > 0 else 0.0,
+            'concurrency': self.concurrency.limit
         }
-    def __init__(self, db: GitLabDatabase):
-        self.db = db
-        self.logger = logging.getLogger(__name__)
-        self.gitlab_api = None
-        
-    def set_gitlab_api(self, gitlab_api):
-        """Set the GitLab API instance"""
-        self.gitlab_api = gitlab_api
     
-    async def full_sync(self) -> Dict:
-        """Perform a full synchronization of all GitLab data"""
-        if not self.gitlab_api:
-            raise Exception("GitLab API not configured")
-        
-        sync_results = {
-            'groups': {'success': 0, 'failed': 0, 'errors': []},
-            'projects': {'success': 0, 'failed': 0, 'errors': []},
-            'pipelines': {'success': 0, 'failed': 0, 'errors': []},
-            'branches': {'success': 0, 'failed': 0, 'errors': []}
+    def _report_progress(self, sync_results: Dict, force: bool = False):
+        """Publish per-entity counts and throughput, at most every progress_interval seconds"""
+        if not self.events:
+            return
+        now = time.time()
+        if not force and now - self._last_progress < self.progress_interval:
+            return
+        self._last_progress = now
+        self._emit('progress', **self._progress_summary(sync_results))
+    
+    def _record_error(self, sync_results: Dict, entity: str, error_msg: str, count_failure: bool = True):
+        """Log a sync error, add it to the results and publish it"""
+        self.logger.error(error_msg)
+        sync_results[entity]['errors'].append(error_msg)
+        if count_failure:
+            sync_results[entity]['failed'] += 1
+        self._emit('error', entity=entity, message=error_msg)
+    
+    @staticmethod
+    def new_sync_results(*entities: str) -> Dict:
+        """Empty per-entity result counters, for all four entities unless named"""
+        return {
+            entity: {'success': 0, 'failed': 0, 'changed': 0, 'unchanged': 0, 'errors': []}
+            for entity in (entities or ('groups', 'projects', 'pipelines', 'branches'))
         }
+    
+    @staticmethod
+    def _record_counts(entity_results: Dict, counts: Dict[str, int]):
+        """Add changed/unchanged counts returned by a GitLabDatabase save_* call"""
+        entity_results['changed'] += counts.get('changed', 0)
+        entity_results['unchanged'] += counts.get('unchanged', 0)
+    
+    def project_polling_due(self) -> bool:
+        """
+        Whether every project's pipelines and branches are polled this sync
         
-        try:
-            # Step 1: Sync groups and subgroups
-            self.logger.info("Starting groups synchronization...")
-            await self.sync_groups(sync_results)
-            
-            # Step 2: Sync projects
-            self.logger.info("Starting projects synchronization...")
-            await self.sync_projects(sync_results)
-            
-            # Step 3: Sync pipelines for each project
-            self.logger.info("Starting pipelines synchronization...")
-            await self.sync_pipelines(sync_results)
-            
-            # Step 4: Sync branches for each project
-            self.logger.info("Starting branches synchronization...")
-            await self.sync_branches(sync_results)
-            
-            self.db.update_sync_status('full_sync', None, 'completed')
-            self.logger.info("Full synchronization completed successfully")
-            
-        except Exception as e:
-            self.logger.error(f"Full sync failed: {str(e)}")
-            self.db.update_sync_status('full_sync', None, 'failed', str(e))
-            raise
+        Without webhooks or the change feed, and as a periodic consistency check with them,
+        every project is polled; otherwise only projects they do not keep current (see
+        projects_kept_current).
+        """
+        feed_ages = [age for age in (self.db.get_sync_age_seconds('webhook'), self._change_feed_age())
+                     if age is not None]
+        if not feed_ages or min(feed_ages) > self.webhook_poll_interval:
+            return True
+        poll_status = self.db.get_sync_status('project_poll')
+        if not poll_status or poll_status['sync_status'] != 'completed':
+            # e.g. the change feed missed events and asked for a full poll
+            return True
+        poll_age = self.db.get_sync_age_seconds('project_poll')
+        return poll_age is None or poll_age > self.webhook_poll_interval
+    
+    def projects_kept_current(self) -> Optional[set]:
+        """
+        Ids of projects whose pipelines and branches need no polling, None for all projects
         
-        return sync_results
+        The change feed follows every project; webhooks only the projects they were delivered
+        for, so a project without a recent webhook is still polled.
+        """
+        feed_age = self._change_feed_age()
+        if feed_age is not None and feed_age <= self.webhook_poll_interval:
+            return None
+        return self.db.get_recently_synced_ids('webhook', self.webhook_poll_interval)
+    
+    def _change_feed_age(self) -> Optional[float]:
+        feed_status = self.db.get_sync_status('change_feed')
+        if not feed_status or feed_status['sync_status'] != 'completed':
+            return None
+        return self.db.get_sync_age_seconds('change_feed')
     
     async def sync_groups(self, sync_results: Dict):
-        """Sync all groups and subgroups"""
+        """Sync all groups and their subgroups at every depth"""
         try:
-            # Get all groups
-            groups_data = self.gitlab_api.get_groups()
-            if not groups_data['success']:
-                raise Exception(groups_data['error'])
-            
-            groups = groups_data['groups']
-            self.db.save_groups(groups)
-            sync_results['groups']['success'] += len(groups)
-            
-            # Get subgroups for each group
-            for group in groups:
-                try:
-                    subgroups_data = self.gitlab_api.get_subgroups(group['id'])
-                    if subgroups_data['success']:
-                        subgroups = subgroups_data['subgroups']
-                        if subgroups:
-                            # Mark subgroups with parent_id
-                            for subgroup in subgroups:
-                                subgroup['parent_id'] = group['id']
-                            self.db.save_groups(subgroups)
-                            sync_results['groups']['success'] += len(subgroups)
-                except Exception as e:
-                    error_msg = f"Failed to sync subgroups for group {group['id']}: {str(e)}"
-                    self.logger.error(error_msg)
-                    sync_results['groups']['errors'].append(error_msg)
-                    sync_results['groups']['failed'] += 1
-                    
+            top_level_ids = self.sync_top_level_groups(sync_results)
         except Exception as e:
-            error_msg = f"Failed to sync groups: {str(e)}"
-            self.logger.error(error_msg)
-            sync_results['groups']['errors'].append(error_msg)
+            self._record_error(sync_results, 'groups', f"Failed to sync groups: {str(e)}", count_failure=False)
             raise
+        
+        for group_id in top_level_ids:
+            try:
+                self.sync_group_hierarchy(group_id, sync_results)
+            except Exception as e:
+                self._record_error(sync_results, 'groups',
+                                   f"Failed to sync subgroups for group {group_id}: {str(e)}")
     
     async def sync_projects(self, sync_results: Dict):
-        """Sync all projects"""
+        """Sync all projects, one include_subgroups listing per top-level group"""
         try:
-            # Get all groups from database
-            all_groups = self.db.get_groups()
-            subgroups = self.db.get_groups(parent_id=0)  # This will get subgroups
-            
-            # Add subgroups to the list
-            for group in all_groups:
-                subgroups.extend(self.db.get_subgroups(group['id']))
-            
-            all_groups.extend(subgroups)
-            
-            # Sync projects for each group
-            for group in all_groups:
-                try:
-                    projects_data = self.gitlab_api.get_group_projects(group['id'])
-                    if projects_data['success']:
-                        projects = projects_data['projects']
-                        if projects:
-                            self.db.save_projects(projects, group['id'])
-                            sync_results['projects']['success'] += len(projects)
-                except Exception as e:
-                    error_msg = f"Failed to sync projects for group {group['id']}: {str(e)}"
-                    self.logger.error(error_msg)
-                    sync_results['projects']['errors'].append(error_msg)
-                    sync_results['projects']['failed'] += 1
-                    
+            top_level_groups = self._order_by_heat('group', self.db.get_groups())
         except Exception as e:
-            error_msg = f"Failed to sync projects: {str(e)}"
-            self.logger.error(error_msg)
-            sync_results['projects']['errors'].append(error_msg)
+            self._record_error(sync_results, 'projects', f"Failed to sync projects: {str(e)}", count_failure=False)
             raise
+        
+        for group in top_level_groups:
+            if not self.sync_policy.syncs_group(group.get('full_path', '')):
+                continue
+            try:
+                self.sync_group_projects(group['id'], sync_results)
+            except Exception as e:
+                self._record_error(sync_results, 'projects',
+                                   f"Failed to sync projects for group {group['id']}: {str(e)}")
     
     async def sync_pipelines(self, sync_results: Dict):
-        """Sync pipelines for all projects"""
-        try:
-            # Get all projects from database
-            projects = self.db.get_projects()
-            
-            for project in projects:
-                try:
-                    pipelines_data = self.gitlab_api.get_project_pipelines(project['id'])
-                    if pipelines_data['success']:
-                        pipelines = pipelines_data['pipelines']
-                        self.db.save_pipelines(pipelines, project['id'])
-                        sync_results['pipelines']['success'] += len(pipelines)
-                except Exception as e:
-                    error_msg = f"Failed to sync pipelines for project {project['id']}: {str(e)}"
-                    self.logger.error(error_msg)
-                    sync_results['pipelines']['errors'].append(error_msg)
-                    sync_results['pipelines']['failed'] += 1
-                    
-        except Exception as e:
-            error_msg = f"Failed to sync pipelines: {str(e)}"
-            self.logger.error(error_msg)
-            sync_results['pipelines']['errors'].append(error_msg)
-            raise
+        """Sync pipelines for all projects, most viewed first"""
+        await self._sync_project_stage('pipelines', self.fetch_project_pipelines,
+                                       self.store_project_pipelines, sync_results)
     
     async def sync_branches(self, sync_results: Dict):
-        """Sync branches for all projects"""
-        try:
-            # Get all projects from database
-            projects = self.db.get_projects()
-            
-            for project in projects:
+        """Sync branches for all projects, most viewed first"""
+        await self._sync_project_stage('branches', self.fetch_project_branches,
+                                       self.store_project_branches, sync_results)
+    
+    async def _sync_project_stage(self, entity: str, fetch_method, store_method, sync_results: Dict):
+        """
+        Run a per-project sync stage in priority order within the project budget
+        
+        Fetches run in a thread pool with at most concurrency.limit requests in flight;
+        results are stored from the event loop so database writes and counters stay serial.
+        Projects that fail are retried once at the end of the stage.
+        """
+        loop = asyncio.get_running_loop()
+        in_flight = {}
+        retries = []
+        
+        def store_completed(done, retry_failed):
+            for future in done:
+                project_id, level = in_flight.pop(future)
                 try:
-                    branches_data = self.gitlab_api.get_project_branches(project['id'])
-                    if branches_data['success']:
-                        branches = branches_data['branches']
-                        self.db.save_branches(branches, project['id'])
-                        sync_results['branches']['success'] += len(branches)
+                    store_method(project_id, future.result(), sync_results, level)
                 except Exception as e:
-                    error_msg = f"Failed to sync branches for project {project['id']}: {str(e)}"
-                    self.logger.error(error_msg)
-                    sync_results['branches']['errors'].append(error_msg)
-                    sync_results['branches']['failed'] += 1
+                    if retry_failed:
+                        retries.append((project_id, level))
+                    else:
+                        self._record_error(sync_results, entity,
+                                           f"Failed to sync {entity} for project {project_id}: {str(e)}")
+        
+        async def dispatch(projects, retry_failed):
+            for project_id, level in projects:
+                while len(in_flight) >= self.concurrency.limit:
+                    done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    store_completed(done, retry_failed)
+                in_flight[loop.run_in_executor(executor, fetch_method, project_id)] = (project_id, level)
+            while in_flight:
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                store_completed(done, retry_failed)
+        
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency.max_limit,
+                                    thread_name_prefix=f'sync-{entity}') as executor:
+                await dispatch(self._budgeted_projects(entity, sync_results), retry_failed=True)
+                # Failures are often throttling while the limit was still too high; by now it has adapted
+                if retries:
+                    self.logger.info(f"Retrying {entity} for {len(retries)} projects")
+                    await dispatch(list(retries), retry_failed=False)
                     
         except Exception as e:
-            error_msg = f"Failed to sync branches: {str(e)}"
-            self.logger.error(error_msg)
-            sync_results['branches']['errors'].append(error_msg)
+            self._record_error(sync_results, entity, f"Failed to sync {entity}: {str(e)}", count_failure=False)
             raise
     
-    async def sync_single_project(self, project_id: int) -> Dict:
-        """Sync data for a single project"""
+    def _budgeted_projects(self, entity: str, sync_results: Dict) -> Iterator[tuple]:
+        """
+        (project_id, level) for projects whose policy includes pipelines and branches,
+        in priority order, within the project budget
+        """
+        refreshed = 0
+        deferred = 0
+        kept_current = 0
+        for project in self.iter_projects_by_priority():
+            level = self.sync_policy.project_level(project['path_with_namespace'], project['archived'])
+            if not SyncPolicy.syncs_details(level):
+                continue
+            if project['id'] in self.webhook_current_projects:
+                kept_current += 1
+                continue
+            if self.project_budget and refreshed >= self.project_budget:
+                deferred += 1
+                continue
+            refreshed += 1
+            yield project['id'], level
+        
+        if kept_current:
+            sync_results[entity]['kept_current'] = kept_current
+            self.logger.info(f"Webhooks keep {entity} of {kept_current} projects current, skipping them")
+        if deferred:
+            sync_results[entity]['deferred'] = deferred
+            self.logger.info(f"Project budget of {self.project_budget} reached, "
+                             f"deferring {entity} for {deferred} projects")
+    
+    def iter_projects_by_priority(self) -> Iterator[Dict]:
+        """
+        Stream projects (sync policy columns only), recently and frequently viewed projects first,
+        then by GitLab activity
+        """
+        hot_ids = []
+        if self.access_tracker:
+            self.access_tracker.flush()
+            hot_ids = [project_id for project_id, _ in self.db.get_hot_entities(
+                'project', self.hot_project_limit, self.access_tracker.half_life_seconds
+            )]
+        hot_projects = {project['id']: project for project in self.db.get_project_sync_info(hot_ids)}
+        for project_id in hot_ids:
+            if project_id in hot_projects:
+                yield hot_projects[project_id]
+        for project in self.db.iter_projects(self.db.PROJECT_SYNC_COLUMNS, order_by_activity=True):
+            if project['id'] not in hot_projects:
+                yield project
+    
+    def project_sync_level(self, project_id: int) -> str:
+        project = self.db.get_project_sync_info([project_id])
+        if not project:
+            return self.sync_policy.default_level
+        return self.sync_policy.project_level(project[0]['path_with_namespace'], project[0]['archived'])
+    
+    def _protected_refs(self, project_id: int) -> set:
+        """Default branch plus the branches GitLab reported as protected at the last branch sync"""
+        return set(self.db.get_protected_branch_names(project_id))
+    
+    def _heat(self, entity_type: str, entity_ids: List[int]) -> Dict[int, float]:
+        if not self.access_tracker or not entity_ids:
+            return {}
+        self.access_tracker.flush()
+        return self.db.get_access_heat(entity_type, entity_ids, self.access_tracker.half_life_seconds)
+    
+    def _order_by_heat(self, entity_type: str, entities: List[Dict]) -> List[Dict]:
+        heat = self._heat(entity_type, [entity['id'] for entity in entities])
+        return sorted(entities, key=lambda entity: -heat.get(entity['id'], 0))
+    
+    # Units of work shared by the sync stages above and by queue workers (see sync_worker.py)
+    
+    def sync_top_level_groups(self, sync_results: Dict) -> List[int]:
+        """Stream and save top-level groups, returning their ids"""
+        top_level_ids = []
+        for groups in self.gitlab_api.iter_groups(top_level_only=True):
+            groups = self._apply_group_policy(groups, sync_results)
+            self._record_counts(sync_results['groups'], self.db.save_groups(groups))
+            sync_results['groups']['success'] += len(groups)
+            top_level_ids.extend(group['id'] for group in groups)
+            self._report_progress(sync_results)
+        return top_level_ids
+    
+    def sync_group_hierarchy(self, group_id: int, sync_results: Dict):
+        """Save every subgroup below a top-level group; each payload carries its own parent_id"""
+        for subgroups in self.gitlab_api.iter_descendant_groups(group_id):
+            subgroups = self._apply_group_policy(subgroups, sync_results)
+            self._record_counts(sync_results['groups'], self.db.save_groups(subgroups))
+            sync_results['groups']['success'] += len(subgroups)
+            self._report_progress(sync_results)
+    
+    def sync_group_projects(self, group_id: int, sync_results: Dict) -> List[int]:
+        """
+        Save all projects below a top-level group allowed by the sync policy
+        
+        Returns the ids of the saved projects whose level includes pipelines and branches.
+        Projects are listed most recently active first, so a max_projects ceiling keeps the
+        active ones.
+        """
+        detail_ids = []
+        # Projects kept per budgeted subtree, shared by all groups below it
+        per_subtree = {}
+        listing = self.gitlab_api.iter_group_projects(
+            group_id, include_subgroups=True,
+            archived=None if self.sync_policy.include_archived else False,
+            order_by='last_activity_at'
+        )
+        for projects in listing:
+            allowed = []
+            for project in projects:
+                namespace = SyncPolicy.namespace_path(project.get('path_with_namespace', ''))
+                level = self.sync_policy.project_level(project.get('path_with_namespace', ''),
+                                                       project.get('archived', False))
+                subtree, max_projects = self.sync_policy.project_budget_for(namespace)
+                if level == SyncPolicy.SKIP or (max_projects is not None and
+                                                per_subtree.get(subtree, 0) >= max_projects):
+                    sync_results['projects']['excluded'] = sync_results['projects'].get('excluded', 0) + 1
+                    continue
+                if subtree is not None:
+                    per_subtree[subtree] = per_subtree.get(subtree, 0) + 1
+                allowed.append(project)
+                if SyncPolicy.syncs_details(level):
+                    detail_ids.append(project['id'])
+            
+            # group_id comes from each project's namespace, so subgroup projects land in their own group
+            self._record_counts(sync_results['projects'], self.db.save_projects(allowed))
+            sync_results['projects']['success'] += len(allowed)
+            self._report_progress(sync_results)
+        return detail_ids
+    
+    def _apply_group_policy(self, groups: List[Dict], sync_results: Dict) -> List[Dict]:
+        allowed = [group for group in groups if self.sync_policy.syncs_group(group.get('full_path', ''))]
+        if len(allowed) < len(groups):
+            sync_results['groups']['excluded'] = (sync_results['groups'].get('excluded', 0) +
+                                                  len(groups) - len(allowed))
+        return allowed
+    
+    def sync_project_pipelines(self, project_id: int, sync_results: Dict):
+        """Fetch and save the pipelines of one project, as far as its sync policy allows"""
+        level = self.project_sync_level(project_id)
+        if SyncPolicy.syncs_details(level):
+            self.store_project_pipelines(project_id, self.fetch_project_pipelines(project_id), sync_results, level)
+    
+    def sync_project_branches(self, project_id: int, sync_results: Dict):
+        """Fetch and save the branches of one project, as far as its sync policy allows"""
+        level = self.project_sync_level(project_id)
+        if SyncPolicy.syncs_details(level):
+            self.store_project_branches(project_id, self.fetch_project_branches(project_id), sync_results, level)
+    
+    def fetch_project_pipelines(self, project_id: int) -> List[Dict]:
+        pipelines_data = self.gitlab_api.get_project_pipelines(project_id)
+        if not pipelines_data['success']:
+            raise Exception(pipelines_data.get('error', 'Unknown error'))
+        return pipelines_data['pipelines']
+    
+    def store_project_pipelines(self, project_id: int, pipelines: List[Dict], sync_results: Dict,
+                                level: str = SyncPolicy.FULL):
+        if level == SyncPolicy.PROTECTED:
+            if self.db.listing_status('branches', project_id)['refreshed_at'] is None:
+                # Branches not synced yet (e.g. a queued pipelines task ran first): ask GitLab now
+                protected_refs = {branch['name'] for branch in self.fetch_project_branches(project_id)
+                                  if branch.get('default') or branch.get('protected')}
+            else:
+                protected_refs = self._protected_refs(project_id)
+            pipelines = [pipeline for pipeline in pipelines if pipeline.get('ref') in protected_refs]
+        self._record_counts(sync_results['pipelines'], self.db.save_pipelines(pipelines, project_id))
+        sync_results['pipelines']['success'] += len(pipelines)
+        self._report_progress(sync_results)
+    
+    def fetch_project_branches(self, project_id: int) -> List[Dict]:
+        branches_data = self.gitlab_api.get_project_branches(project_id)
+        if not branches_data['success']:
+            raise Exception(branches_data.get('error', 'Unknown error'))
+        return branches_data['branches']
+    
+    def store_project_branches(self, project_id: int, branches: List[Dict], sync_results: Dict,
+                               level: str = SyncPolicy.FULL):
+        if level == SyncPolicy.PROTECTED:
+            branches = [branch for branch in branches if branch.get('default') or branch.get('protected')]
+        self._record_counts(sync_results['branches'], self.db.save_branches(branches, project_id))
+        sync_results['branches']['success'] += len(branches)
+        self._report_progress(sync_results)
+    
+    def plan_queued_sync(self, gitlab_api=None) -> Dict:
+        """
+        Prepare a full sync for queue workers
+        
+        Saves the top-level groups and queues one group listing task per group; workers expand
+        those into per-project pipeline and branch tasks as they go.
+        """
+        with self.exclusive('queued', gitlab_api):
+            if not self.gitlab_api:
+                raise Exception("GitLab API not configured")
+            
+            sync_results = self.new_sync_results('groups')
+            top_level_ids = self.sync_top_level_groups(sync_results)
+            heat = self._heat('group', top_level_ids)
+            queued = self.db.enqueue_sync_tasks(
+                [(self.TASK_GROUP_LISTING, group_id, heat.get(group_id, 0)) for group_id in top_level_ids]
+            )
+            return {'queued_tasks': queued, 'groups': sync_results['groups']}
+    
+    def run_task(self, task: Dict) -> Dict:
+        """Execute one queued sync task"""
+        task_type = task['task_type']
+        entity_id = task['entity_id']
+        sync_results = self.new_sync_results()
+        
+        if task_type == self.TASK_GROUP_LISTING:
+            self.sync_group_hierarchy(entity_id, sync_results)
+            project_ids = self.sync_group_projects(entity_id, sync_results)
+            heat = self._heat('project', project_ids)
+            self.db.enqueue_sync_tasks(
+                [(self.TASK_PROJECT_PIPELINES, project_id, heat.get(project_id, 0)) for project_id in project_ids] +
+                [(self.TASK_PROJECT_BRANCHES, project_id, heat.get(project_id, 0)) for project_id in project_ids]
+            )
+        elif task_type == self.TASK_PROJECT_PIPELINES:
+            self.sync_project_pipelines(entity_id, sync_results)
+        elif task_type == self.TASK_PROJECT_BRANCHES:
+            self.sync_project_branches(entity_id, sync_results)
+        else:
+            raise ValueError(f"Unknown sync task type: {task_type}")
+        
+        return sync_results
+    
+    async def sync_single_project(self, project_id: int, gitlab_api=None) -> Dict:
+        """Sync data for a single project; raises SyncInProgressError while another sync holds the service"""
+        with self.exclusive('project', gitlab_api):
+            return await self._sync_single_project(project_id)
+    
+    async def _sync_single_project(self, project_id: int) -> Dict:
         if not self.gitlab_api:
             raise Exception("GitLab API not configured")
         
-        sync_results = {
-            'pipelines': {'success': 0, 'failed': 0, 'errors': []},
-            'branches': {'success': 0, 'failed': 0, 'errors': []}
-        }
+        sync_results = self.new_sync_results('pipelines', 'branches')
         
         try:
-            # Sync pipelines
-            pipelines_data = self.gitlab_api.get_project_pipelines(project_id)
-            if pipelines_data['success']:
-                pipelines = pipelines_data['pipelines']
-                self.db.save_pipelines(pipelines, project_id)
-                sync_results['pipelines']['success'] = len(pipelines)
-            else:
-                sync_results['pipelines']['errors'].append(pipelines_data.get('error', 'Unknown error'))
-                sync_results['pipelines']['failed'] = 1
-            
-            # Sync branches
-            branches_data = self.gitlab_api.get_project_branches(project_id)
-            if branches_data['success']:
-                branches = branches_data['branches']
-                self.db.save_branches(branches, project_id)
-                sync_results['branches']['success'] = len(branches)
-            else:
-                sync_results['branches']['errors'].append(branches_data.get('error', 'Unknown error'))
-                sync_results['branches']['failed'] = 1
+            # Branches first, so protected-level pipelines are filtered by current protection
+            for entity, sync_method in (('branches', self.sync_project_branches),
+                                        ('pipelines', self.sync_project_pipelines)):
+                try:
+                    sync_method(project_id, sync_results)
+                except Exception as e:
+                    sync_results[entity]['errors'].append(str(e))
+                    sync_results[entity]['failed'] = 1
             
             self.db.update_sync_status('project_sync', project_id, 'completed')
             
@@ -443,5 +620,8 @@ class GitLabSyncService:
             'last_full_sync': full_sync_status['last_sync'] if full_sync_status else None,
             'sync_status': full_sync_status['sync_status'] if full_sync_status else 'never',
             'error_message': full_sync_status['error_message'] if full_sync_status else None,
+            'task_queue': self.db.get_sync_task_stats(),
+            'concurrency': self.concurrency.snapshot(),
+            'policy': self.sync_policy.describe(),
             'stats': stats
         }
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Sync Worker
+Processes queued sync tasks from the dashboard database. Any number of workers, on one host
+or several sharing the database file, can run side by side; leases that are not renewed
+expire and the task is handed to another worker.
+
+Usage:
+    python3 sync_worker.py --plan --workers 4 --exit-when-idle
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from database import GitLabDatabase
+from sync_service import GitLabSyncService
+from utils.gitlab_api import GitLabAPI
+from utils.access_tracker import AccessTracker
+
+logger = logging.getLogger(__name__)
+
+class SyncWorker:
+    """Claims sync tasks under a lease, keeps the lease alive while working and reports completion"""
+
+    def __init__(self, db: GitLabDatabase, sync_service: GitLabSyncService,
+                 worker_id: Optional[str] = None, lease_seconds: float = 60.0,
+                 batch_size: int = 4, idle_sleep: float = 1.0, max_attempts: int = 5):
+        self.db = db
+        self.sync_service = sync_service
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.lease_seconds = lease_seconds
+        self.batch_size = batch_size
+        self.idle_sleep = idle_sleep
+        self.max_attempts = max_attempts
+        self.held_task_ids: List[int] = []
+        self.stats = {'completed': 0, 'failed': 0, 'lost_leases': 0}
+        self._held_lock = threading.Lock()
+
+    def run(self, stop_event: Optional[threading.Event] = None, exit_when_idle: bool = False) -> Dict:
+        """Process tasks until stopped, or until the queue is empty when exit_when_idle is set"""
+        stop_event = stop_event or threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat_loop, args=(stop_event,), daemon=True)
+        heartbeat.start()
+        logger.info(f"Sync worker {self.worker_id} started")
+
+        try:
+            while not stop_event.is_set():
+                tasks = self.db.claim_sync_tasks(self.worker_id, self.batch_size,
+                                                 self.lease_seconds, self.max_attempts)
+                if not tasks:
+                    if exit_when_idle and not self._work_outstanding():
+                        break
+                    stop_event.wait(self.idle_sleep)
+                    continue
+
+                with self._held_lock:
+                    self.held_task_ids = [task['id'] for task in tasks]
+                for task in tasks:
+                    if stop_event.is_set():
+                        break
+                    self.process_task(task)
+                    with self._held_lock:
+                        self.held_task_ids.remove(task['id'])
+        finally:
+            stop_event.set()
+            heartbeat.join(timeout=1)
+
+        logger.info(f"Sync worker {self.worker_id} stopped: {self.stats}")
+        return self.stats
+
+    def process_task(self, task: Dict):
+        """Run one task and record the outcome against its lease"""
+        error = None
+        try:
+            self.sync_service.run_task(task)
+        except Exception as e:
+            error = str(e)
+            logger.warning(f"Task {task['task_type']}:{task['entity_id']} failed "
+                           f"(attempt {task['attempts']}): {error}")
+
+        if not self.db.complete_sync_task(task['id'], self.worker_id, error, self.max_attempts):
+            # The lease expired and the task was reassigned; the other worker owns it now
+            self.stats['lost_leases'] += 1
+        elif error:
+            self.stats['failed'] += 1
+        else:
+            self.stats['completed'] += 1
+
+    def _work_outstanding(self) -> bool:
+        """Other workers may still be expanding group listings into new tasks"""
+        stats = self.db.get_sync_task_stats()
+        return stats['pending'] > 0 or stats['leased'] > 0
+
+    def _heartbeat_loop(self, stop_event: threading.Event):
+        interval = self.lease_seconds / 3
+        while not stop_event.wait(interval):
+            with self._held_lock:
+                task_ids = list(self.held_task_ids)
+            try:
+                self.db.heartbeat_sync_tasks(self.worker_id, task_ids, self.lease_seconds)
+            except Exception as e:
+                logger.warning(f"Heartbeat failed for worker {self.worker_id}: {str(e)}")
+
+def build_sync_service(db: GitLabDatabase) -> GitLabSyncService:
+    """Sync service with the same sync policy the web app uses"""
+    from utils.enhanced_config import EnhancedConfigManager
+    return GitLabSyncService(db, _access_tracker(db), sync_policy=EnhancedConfigManager(db).get_sync_policy())
+
+def build_gitlab_api(db: GitLabDatabase) -> Optional[GitLabAPI]:
+    """Resolve GitLab configuration outside a request, the same way the web app does"""
+    from utils.enhanced_config import EnhancedConfigManager
+    try:
+        config = EnhancedConfigManager(db).get_gitlab_config()
+    except RuntimeError:
+        # The last configuration source is the Flask session, which does not exist here
+        config = None
+    if config:
+        return GitLabAPI(config['gitlab_url'], config['access_token'])
+    return None
+
+def _access_tracker(db: GitLabDatabase) -> AccessTracker:
+    """Workers record no accesses themselves; the tracker lets them read the web app's heat scores"""
+    return AccessTracker(db, half_life_seconds=float(os.environ.get('ACCESS_HALF_LIFE_HOURS', '24')) * 3600)
+
+def _worker_main(db_path: str, exit_when_idle: bool, lease_seconds: float, batch_size: int):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    db = GitLabDatabase(db_path)
+    gitlab_api = build_gitlab_api(db)
+    if not gitlab_api:
+        logger.error("GitLab not configured, worker exiting")
+        return
+    sync_service = build_sync_service(db)
+    sync_service.set_gitlab_api(gitlab_api)
+    SyncWorker(db, sync_service, lease_seconds=lease_seconds, batch_size=batch_size).run(
+        exit_when_idle=exit_when_idle
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description='Run GitLab Dashboard sync workers')
+    parser.add_argument('--db', default=os.environ.get('DATABASE_URL', 'gitlab_dashboard.db'),
+                        help='Path to the dashboard database')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes to start on this host')
+    parser.add_argument('--plan', action='store_true', help='Queue a full sync before starting workers')
+    parser.add_argument('--exit-when-idle', action='store_true', help='Stop once the queue is drained')
+    parser.add_argument('--lease-seconds', type=float, default=60.0)
+    parser.add_argument('--batch-size', type=int, default=4, help='Tasks claimed per lease')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    db = GitLabDatabase(args.db)
+
+    if args.plan:
+        gitlab_api = build_gitlab_api(db)
+        if not gitlab_api:
+            parser.error('GitLab is not configured')
+        sync_service = build_sync_service(db)
+        sync_service.set_gitlab_api(gitlab_api)
+        plan = sync_service.plan_queued_sync()
+        logger.info(f"Queued {plan['queued_tasks']} group listing tasks")
+
+    started = time.time()
+    processes = [
+        multiprocessing.Process(target=_worker_main,
+                                args=(args.db, args.exit_when_idle, args.lease_seconds, args.batch_size))
+        for _ in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    logger.info(f"All workers finished in {time.time() - started:.1f}s: {db.get_sync_task_stats()}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+"""
+Shared test fixtures: a throwaway database and recorded GitLab payloads
+"""
+import json
+import os
+import pytest
+from database import GitLabDatabase
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+def load_fixture(*path: str):
+    """Load a recorded JSON payload from tests/fixtures"""
+    with open(os.path.join(FIXTURES_DIR, *path)) as fixture:
+        return json.load(fixture)
+
+@pytest.fixture
+def database(tmp_path):
+    return GitLabDatabase(str(tmp_path / 'gitlab_dashboard.db'))
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """The Flask app module, imported from a scratch directory so its database stays out of the tree"""
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('app'))
+    try:
+        import app
+        yield app
+    finally:
+        os.chdir(cwd)
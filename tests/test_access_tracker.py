@@ -0,0 +1,27 @@
+"""
+Tests for access heat tracking
+"""
+import time
+
+from utils.access_tracker import AccessTracker
+
+def test_quiet_tracker_flushes_on_its_own(database):
+    tracker = AccessTracker(database, flush_interval=0.2)
+    tracker.start()
+    try:
+        tracker.record('project', 7)
+        deadline = time.time() + 5
+        while not database.get_access_heat('project', [7], tracker.half_life_seconds) and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        tracker.stop()
+
+    assert database.get_access_heat('project', [7], tracker.half_life_seconds)
+
+def test_long_idle_heat_does_not_underflow(database):
+    half_life = 3600.0
+    database.merge_access_stats([('project', 7, 1.0, 0.0, 1)], half_life)
+    # Ten thousand half-lives later the old heat decays to 0.0
+    database.merge_access_stats([('project', 7, 0.0, half_life * 10000, 1)], half_life)
+
+    assert database.get_hot_entities('project', 1, half_life)[0][0] == 7
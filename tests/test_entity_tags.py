@@ -0,0 +1,21 @@
+"""
+Tests for ETags of database listings
+"""
+
+GROUPS = [
+    {'id': 801, 'name': 'etag-a', 'path': 'etag-a', 'full_path': 'etag-a', 'parent_id': None},
+    {'id': 802, 'name': 'etag-b', 'path': 'etag-b', 'full_path': 'etag-b', 'parent_id': None}
+]
+
+def test_list_options_get_their_own_etag(app_module):
+    app_module.db.save_groups(GROUPS)
+    client = app_module.app.test_client()
+
+    first = client.get('/api/groups?page=1&per_page=1')
+    etag = first.headers['ETag']
+    second = client.get('/api/groups?page=2&per_page=1', headers={'If-None-Match': etag})
+    again = client.get('/api/groups?page=1&per_page=1', headers={'If-None-Match': etag})
+
+    assert first.status_code == 200
+    assert second.status_code == 200 and second.headers['ETag'] != etag
+    assert again.status_code == 304
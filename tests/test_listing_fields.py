@@ -0,0 +1,21 @@
+"""
+Tests for projecting listing payloads down to requested fields
+"""
+import json
+
+PROJECT = {
+    'id': 7, 'name': 'api', 'path_with_namespace': 'platform/api', 'name_with_namespace': 'Platform / api',
+    'description': None, 'archived': False, 'star_count': 3, 'topics': ['python', 'flask'],
+    'namespace': {'id': 2, 'full_path': 'platform'}, 'last_activity_at': '2024-05-01T10:00:00.000Z'
+}
+
+def test_fields_keep_json_types(database):
+    database.save_projects([PROJECT], 2)
+
+    rows = list(database.iter_listing('projects', 2, fields=['namespace', 'topics', 'archived',
+                                                             'star_count', 'description', 'missing']))
+
+    assert [json.loads(row['payload']) for row in rows] == [{
+        'namespace': PROJECT['namespace'], 'topics': PROJECT['topics'], 'archived': False,
+        'star_count': 3, 'description': None, 'missing': None
+    }]
@@ -0,0 +1,26 @@
+"""
+Tests for in-place pipeline row updates from detail payloads
+"""
+import json
+
+LISTED = {
+    'id': 31, 'iid': 3, 'project_id': 1, 'sha': 'bcbb5ec396a2c0f828686f14fac9b80b780504f2', 'ref': 'main',
+    'status': 'running', 'source': 'push', 'created_at': '2024-05-01T10:00:00.000Z',
+    'updated_at': '2024-05-01T10:00:05.000Z', 'web_url': 'http://gitlab.example.com/platform/api/-/pipelines/31'
+}
+
+def test_detail_payload_keeps_listing_shape(database):
+    database.save_pipelines([LISTED], 1)
+    detail = {
+        **LISTED, 'status': 'success', 'updated_at': '2024-05-01T10:03:00.000Z',
+        'before_sha': '0' * 40, 'tag': False, 'yaml_errors': None, 'coverage': '91.5',
+        'user': {'id': 1, 'username': 'root'}, 'detailed_status': {'text': 'passed', 'group': 'success'},
+        'started_at': '2024-05-01T10:00:10.000Z', 'finished_at': '2024-05-01T10:03:00.000Z', 'duration': 170
+    }
+
+    counts = database.update_pipelines([(1, detail)])
+
+    row = database.get_pipeline(31)
+    assert counts['changed'] == 1
+    assert json.loads(row['gitlab_data']) == {**LISTED, 'status': 'success', 'updated_at': detail['updated_at']}
+    assert (row['status'], row['finished_at'], row['duration']) == ('success', detail['finished_at'], 170)
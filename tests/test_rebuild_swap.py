@@ -0,0 +1,50 @@
+"""
+Tests for swapping a rebuilt shadow database into the live one
+"""
+import time
+
+def group(group_id, name, parent_id=None):
+    return {'id': group_id, 'name': name, 'path': name.lower(), 'full_path': name.lower(), 'parent_id': parent_id}
+
+def pipeline(pipeline_id, status):
+    return {'id': pipeline_id, 'ref': 'main', 'sha': 'a' * 40, 'status': status}
+
+def test_swap_replaces_rows_synced_before_the_rebuild(database):
+    database.save_groups([group(1, 'Old')])
+    # Write times have second resolution; writes in the rebuild's first second count as live
+    time.sleep(1.1)
+    shadow = database.create_shadow()
+    shadow.save_groups([group(2, 'New')])
+
+    database.swap_in_shadow(shadow)
+
+    assert [stored['id'] for stored in database.get_groups()] == [2]
+
+def test_live_writes_during_the_rebuild_are_kept(database):
+    shadow = database.create_shadow()
+    shadow.save_groups([group(1, 'Platform')])
+    shadow.save_pipelines([pipeline(31, 'running')], 7)
+    # Webhooks keep writing to the live tables while the rebuild runs
+    database.update_pipelines([(7, pipeline(31, 'success'))])
+    database.update_pipelines([(7, pipeline(32, 'running'))])
+    time.sleep(1.1)
+    shadow.update_pipelines([(7, pipeline(32, 'failed'))])
+
+    counts = database.swap_in_shadow(shadow)
+
+    statuses = {stored['id']: stored['status'] for stored in database.get_pipelines(7)}
+    # 31: written in the same second, the live write wins; 32: the shadow wrote it later
+    assert statuses == {31: 'success', 32: 'failed'}
+    assert counts['pipelines_kept_live'] == 1
+
+def test_refresh_times_of_vanished_listings_are_cleared(database):
+    database.save_pipelines([pipeline(31, 'success')], 7)
+    database.save_pipelines([pipeline(41, 'success')], 8)
+    time.sleep(1.1)
+    shadow = database.create_shadow()
+    shadow.save_pipelines([pipeline(31, 'success')], 7)
+
+    database.swap_in_shadow(shadow)
+
+    assert database.listing_status('pipelines', 7)['refreshed_at'] is not None
+    assert database.listing_status('pipelines', 8)['refreshed_at'] is None
@@ -0,0 +1,34 @@
+"""
+Tests for the one-sync-at-a-time guard of GitLabSyncService
+"""
+import asyncio
+import pytest
+from sync_service import GitLabSyncService
+from utils.error_handler import SyncInProgressError
+
+@pytest.fixture
+def sync_service(database):
+    return GitLabSyncService(database)
+
+def test_second_sync_is_refused_while_one_runs(sync_service):
+    with sync_service.exclusive('full'):
+        with pytest.raises(SyncInProgressError, match='full sync is already running'):
+            asyncio.run(sync_service.sync_single_project(7))
+        with pytest.raises(SyncInProgressError):
+            sync_service.plan_queued_sync()
+
+def test_guard_is_released_after_a_failed_sync(sync_service):
+    with pytest.raises(Exception, match='GitLab API not configured'):
+        asyncio.run(sync_service.full_sync())
+
+    with sync_service.exclusive('project'):
+        assert sync_service.running_sync == 'project'
+    assert sync_service.running_sync is None
+
+def test_sync_route_answers_409_while_a_sync_runs(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'get_gitlab_api', lambda: object())
+    with app_module.sync_service.exclusive('full'):
+        response = app_module.app.test_client().post('/api/sync/project/7')
+
+    assert response.status_code == 409
+    assert response.get_json()['error_type'] == 'sync_in_progress'
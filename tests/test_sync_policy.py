@@ -0,0 +1,89 @@
+"""
+Tests for sync policy project budgets and protected-level pipeline filtering
+"""
+import asyncio
+from sync_service import GitLabSyncService
+from utils.sync_policy import SyncPolicy
+
+def project(project_id, path_with_namespace, namespace_id=1):
+    return {'id': project_id, 'name': path_with_namespace.rsplit('/', 1)[-1],
+            'path_with_namespace': path_with_namespace, 'default_branch': 'main', 'archived': False,
+            'namespace': {'id': namespace_id}}
+
+class StubGitLabAPI:
+    observer = None
+
+    def __init__(self, projects=(), pipelines=(), branches=()):
+        self.projects = list(projects)
+        self.pipelines = list(pipelines)
+        self.branches = list(branches)
+        self.calls = []
+
+    def iter_group_projects(self, group_id, **kwargs):
+        yield self.projects
+
+    def get_project_pipelines(self, project_id):
+        self.calls.append(('pipelines', project_id))
+        return {'success': True, 'pipelines': self.pipelines}
+
+    def get_project_branches(self, project_id):
+        self.calls.append(('branches', project_id))
+        return {'success': True, 'branches': self.branches}
+
+def sync_service(database, policy, api):
+    service = GitLabSyncService(database, sync_policy=SyncPolicy.from_config(policy))
+    service.set_gitlab_api(api)
+    return service
+
+class TestProjectBudget:
+    def test_budget_covers_the_whole_subtree(self, database):
+        api = StubGitLabAPI([project(10 + index, f'platform/team-{index}/service') for index in range(5)])
+        service = sync_service(database, 'platform=full:2', api)
+        results = service.new_sync_results('projects')
+
+        service.sync_group_projects(1, results)
+
+        assert [stored['id'] for stored in database.get_project_sync_info(range(10, 15))] == [10, 11]
+        assert results['projects']['excluded'] == 3
+
+    def test_each_matched_group_gets_its_own_budget(self, database):
+        api = StubGitLabAPI([project(20, 'sandbox/a/one'), project(21, 'sandbox/a/two'),
+                             project(22, 'sandbox/b/one')])
+        service = sync_service(database, 'sandbox/*=metadata:1', api)
+
+        service.sync_group_projects(1, service.new_sync_results('projects'))
+
+        assert [stored['id'] for stored in database.get_project_sync_info([20, 21, 22])] == [20, 22]
+
+    def test_budget_path(self):
+        policy = SyncPolicy.from_config('platform=protected:200')
+
+        assert policy.project_budget_for('platform/a/b') == ('platform', 200)
+        assert policy.project_budget_for('other') == (None, None)
+
+class TestProtectedPipelines:
+    PIPELINES = [{'id': 1, 'ref': 'main', 'status': 'success'},
+                 {'id': 2, 'ref': 'release', 'status': 'success'},
+                 {'id': 3, 'ref': 'feature', 'status': 'success'}]
+    BRANCHES = [{'name': 'main', 'default': True, 'protected': True, 'commit': {'id': 'a' * 40}},
+                {'name': 'release', 'default': False, 'protected': True, 'commit': {'id': 'b' * 40}},
+                {'name': 'feature', 'default': False, 'protected': False, 'commit': {'id': 'c' * 40}}]
+
+    def test_first_project_sync_keeps_protected_branch_pipelines(self, database):
+        database.save_projects([project(7, 'platform/api')])
+        api = StubGitLabAPI(pipelines=self.PIPELINES, branches=self.BRANCHES)
+        service = sync_service(database, 'platform=protected', api)
+
+        asyncio.run(service.sync_single_project(7))
+
+        assert sorted(pipeline['id'] for pipeline in database.get_pipelines(7)) == [1, 2]
+        assert api.calls == [('branches', 7), ('pipelines', 7)]
+
+    def test_pipelines_before_any_branch_sync_ask_gitlab_for_protection(self, database):
+        database.save_projects([project(7, 'platform/api')])
+        api = StubGitLabAPI(pipelines=self.PIPELINES, branches=self.BRANCHES)
+        service = sync_service(database, 'platform=protected', api)
+
+        service.sync_project_pipelines(7, service.new_sync_results('pipelines'))
+
+        assert sorted(pipeline['id'] for pipeline in database.get_pipelines(7)) == [1, 2]
@@ -0,0 +1,171 @@
+"""
+Tests for WebhookProcessor and POST /api/webhooks/gitlab, driven by recorded GitLab payloads
+"""
+import copy
+import pytest
+from conftest import load_fixture
+from utils.webhook_handler import WebhookProcessor
+
+SECRET = 'webhook-secret'
+
+@pytest.fixture
+def processor(database):
+    return WebhookProcessor(database, SECRET)
+
+@pytest.fixture
+def client(app_module, processor, monkeypatch):
+    monkeypatch.setattr(app_module, 'webhook_processor', processor)
+    return app_module.app.test_client()
+
+class TestWebhookProcessor:
+    def test_push_moves_branch_head_and_stores_commits(self, database, processor):
+        payload = load_fixture('webhooks', 'push.json')
+        processor.process_batch([('push', payload)])
+
+        branch = database.get_branch(15, 'master')
+        assert branch['commit_id'] == payload['after']
+        assert branch['default_branch']
+        assert branch['web_url'] == 'http://example.com/mike/diaspora/-/tree/master'
+        assert branch['commit_title'] == 'fixed readme'
+        assert branch['commit_author_name'] == 'GitLab dev user'
+        assert branch['commit_committed_date'] == '2012-01-03T23:36:29.000Z'
+        assert database.get_recently_synced_ids('webhook', 60) == {15}
+
+    def test_push_without_commits_keeps_commit_details(self, database, processor):
+        payload = load_fixture('webhooks', 'push.json')
+        processor.process_batch([('push', payload)])
+
+        branch_push = copy.deepcopy(payload)
+        branch_push.update(ref='refs/heads/feature', before='0' * 40, commits=[], total_commits_count=0)
+        processor.process_batch([('push', branch_push)])
+
+        branch = database.get_branch(15, 'feature')
+        assert branch['commit_id'] == payload['after']
+        assert branch['commit_title'] == 'fixed readme'
+        assert branch['commit_author_email'] == 'gitlabdev@dv6700.(none)'
+
+    def test_push_deleting_branch_removes_it(self, database, processor):
+        payload = load_fixture('webhooks', 'push.json')
+        processor.process_batch([('push', payload)])
+
+        delete = copy.deepcopy(payload)
+        delete.update(after='0' * 40, checkout_sha=None, commits=[], total_commits_count=0)
+        processor.process_batch([('push', delete)])
+
+        assert database.get_branch(15, 'master') is None
+
+    def test_pipeline_event_is_stored(self, database, processor):
+        payload = load_fixture('webhooks', 'pipeline.json')
+        processor.process_batch([('pipeline', payload)])
+
+        pipelines = database.get_pipelines(1)
+        assert len(pipelines) == 1
+        pipeline = pipelines[0]
+        assert pipeline['id'] == 31
+        assert pipeline['status'] == 'success'
+        assert pipeline['ref'] == 'master'
+        assert pipeline['sha'] == 'bcbb5ec396a2c0f828686f14fac9b80b780504f2'
+        assert pipeline['created_at'] == '2016-08-12T15:23:28.000Z'
+        assert pipeline['finished_at'] == '2016-08-12T15:26:29.000Z'
+        assert pipeline['duration'] == 63
+        assert pipeline['web_url'] == 'http://192.168.64.1:3005/gitlab-org/gitlab-test/-/pipelines/31'
+
+    def test_latest_pipeline_event_in_a_batch_wins(self, database, processor):
+        running = load_fixture('webhooks', 'pipeline.json')
+        running['object_attributes'].update(status='running', finished_at=None, duration=None)
+        processor.process_batch([('pipeline', running), ('pipeline', load_fixture('webhooks', 'pipeline.json'))])
+
+        assert [pipeline['status'] for pipeline in database.get_pipelines(1)] == ['success']
+
+    def test_pipeline_without_project_id_is_dropped(self, database, processor):
+        payload = load_fixture('webhooks', 'pipeline.json')
+        del payload['project']['id']
+        processor.process_batch([('pipeline', payload)])
+
+        assert database.get_pipelines(1) == []
+        assert database.get_recently_synced_ids('webhook', 60) == set()
+
+    def test_merged_merge_request_marks_source_branch_merged(self, database, processor):
+        database.save_branches([{
+            'name': 'ms-viewport',
+            'merged': False,
+            'protected': False,
+            'default': False,
+            'web_url': 'http://example.com/diaspora/-/tree/ms-viewport',
+            'commit': {'id': 'da1560886d4f094c3e6c9ef40349f7d38b5d27d7', 'title': 'fixed readme'}
+        }], 14)
+        processor.process_batch([('merge_request', load_fixture('webhooks', 'merge_request.json'))])
+
+        assert database.get_branch(14, 'ms-viewport')['merged']
+        assert database.get_recently_synced_ids('webhook', 60) == {14}
+
+    def test_malformed_event_does_not_block_the_batch(self, database, processor):
+        processor.process_batch([
+            ('pipeline', {'project': {'id': 1}}),
+            ('push', load_fixture('webhooks', 'push.json'))
+        ])
+
+        assert database.get_branch(15, 'master') is not None
+
+class TestWebhookEndpoint:
+    URL = '/api/webhooks/gitlab'
+
+    def post(self, client, fixture, event, token=SECRET):
+        headers = {'X-Gitlab-Event': event}
+        if token is not None:
+            headers['X-Gitlab-Token'] = token
+        return client.post(self.URL, json=load_fixture('webhooks', fixture), headers=headers)
+
+    @pytest.mark.parametrize('fixture, event', [
+        ('push.json', 'Push Hook'),
+        ('pipeline.json', 'Pipeline Hook'),
+        ('merge_request.json', 'Merge Request Hook')
+    ])
+    def test_supported_events_are_queued(self, client, processor, fixture, event):
+        response = self.post(client, fixture, event)
+
+        assert response.status_code == 202
+        assert response.get_json()['event_type'] == event
+        processor.queue.stop()
+        assert processor.queue.stats['processed'] == 1
+
+    def test_queued_push_reaches_the_database(self, client, processor, database):
+        self.post(client, 'push.json', 'Push Hook')
+        processor.queue.stop()
+
+        assert database.get_branch(15, 'master')['commit_id'] == 'da1560886d4f094c3e6c9ef40349f7d38b5d27d7'
+
+    def test_missing_token_is_rejected(self, client, processor):
+        response = self.post(client, 'push.json', 'Push Hook', token=None)
+
+        assert response.status_code == 401
+        assert processor.queue.stats['enqueued'] == 0
+
+    def test_wrong_token_is_rejected(self, client, processor):
+        response = self.post(client, 'push.json', 'Push Hook', token='not-the-secret')
+
+        assert response.status_code == 401
+        assert processor.queue.stats['enqueued'] == 0
+
+    def test_unconfigured_secret_is_forbidden(self, app_module, database, monkeypatch):
+        monkeypatch.setattr(app_module, 'webhook_processor', WebhookProcessor(database, ''))
+        response = app_module.app.test_client().post(
+            self.URL, json=load_fixture('webhooks', 'push.json'),
+            headers={'X-Gitlab-Event': 'Push Hook', 'X-Gitlab-Token': SECRET}
+        )
+
+        assert response.status_code == 403
+
+    def test_non_object_payload_is_rejected(self, client):
+        response = client.post(self.URL, json=['not', 'an', 'object'],
+                               headers={'X-Gitlab-Event': 'Push Hook', 'X-Gitlab-Token': SECRET})
+
+        assert response.status_code == 400
+
+    def test_unsupported_event_is_ignored(self, client, processor):
+        response = client.post(self.URL, json={'object_kind': 'issue'},
+                               headers={'X-Gitlab-Event': 'Issue Hook', 'X-Gitlab-Token': SECRET})
+
+        assert response.status_code == 200
+        assert 'ignored' in response.get_json()['message']
+        assert processor.queue.stats['enqueued'] == 0
@@ -0,0 +1,159 @@
+"""
+Tests for writing API fallback listings through to the database in background batches
+"""
+import json
+import pytest
+from flask import Flask
+from utils.response_helper import ResponseHelper
+from utils.write_through import WriteThroughQueue
+
+COMMIT_SHA = 'da1560886d4f094c3e6c9ef40349f7d38b5d27d7'
+
+class StubGitLabAPI:
+    """Answers the listing calls of the API fallback with one fixed row each, counting calls"""
+
+    def __init__(self):
+        self.calls = []
+
+    def get_groups(self):
+        self.calls.append(('groups', None))
+        return {'success': True, 'groups': [
+            {'id': 1, 'name': 'Platform', 'path': 'platform', 'full_path': 'platform', 'parent_id': None}
+        ]}
+
+    def get_subgroups(self, group_id):
+        self.calls.append(('subgroups', group_id))
+        return {'success': True, 'subgroups': [
+            {'id': 2, 'name': 'Backend', 'path': 'backend', 'full_path': 'platform/backend', 'parent_id': group_id}
+        ]}
+
+    def get_group_projects(self, group_id):
+        self.calls.append(('projects', group_id))
+        return {'success': True, 'projects': [{
+            'id': 7, 'name': 'api', 'path': 'api', 'path_with_namespace': 'platform/api',
+            'default_branch': 'main', 'last_activity_at': '2024-05-01T10:00:00.000Z',
+            'namespace': {'id': group_id, 'full_path': 'platform'}
+        }]}
+
+    def get_project_pipelines(self, project_id):
+        self.calls.append(('pipelines', project_id))
+        return {'success': True, 'pipelines': [{
+            'id': 31, 'project_id': project_id, 'status': 'success', 'ref': 'main', 'sha': COMMIT_SHA,
+            'created_at': '2024-05-01T10:00:00.000Z', 'updated_at': '2024-05-01T10:05:00.000Z'
+        }]}
+
+    def get_project_branches(self, project_id):
+        self.calls.append(('branches', project_id))
+        return {'success': True, 'branches': [{
+            'name': 'main', 'default': True, 'merged': False, 'protected': True,
+            'web_url': 'http://gitlab.example.com/platform/api/-/tree/main',
+            'commit': {'id': COMMIT_SHA, 'short_id': COMMIT_SHA[:8], 'title': 'fixed readme',
+                       'author_name': 'GitLab dev user', 'committed_date': '2024-05-01T09:59:00.000Z'}
+        }]}
+
+@pytest.fixture
+def api():
+    return StubGitLabAPI()
+
+@pytest.fixture
+def write_through():
+    return WriteThroughQueue(flush_interval=0.05)
+
+@pytest.fixture
+def helper(database, api, write_through):
+    return ResponseHelper(database, lambda: api, write_through=write_through)
+
+@pytest.fixture
+def request_context():
+    with Flask(__name__).test_request_context('/'):
+        yield
+
+def body(response):
+    return json.loads(response.get_data())
+
+LISTINGS = {
+    'groups': (lambda helper: helper.handle_groups_request(), ('groups', None)),
+    'subgroups': (lambda helper: helper.handle_subgroups_request(1), ('groups', 1)),
+    'projects': (lambda helper: helper.handle_projects_request(1), ('projects', 1)),
+    'pipelines': (lambda helper: helper.handle_pipelines_request(7), ('pipelines', 7)),
+    'branches': (lambda helper: helper.handle_branches_request(7), ('branches', 7))
+}
+
+@pytest.mark.usefixtures('request_context')
+class TestWriteThrough:
+    @pytest.mark.parametrize('listing', sorted(LISTINGS))
+    def test_fallback_is_served_live_then_from_the_database(self, helper, api, write_through, listing):
+        handler, scope = LISTINGS[listing]
+
+        first = body(handler(helper))
+        write_through.queue.stop()
+        second = body(handler(helper))
+
+        assert first['source'] == 'api_live'
+        assert second['source'] == 'database'
+        assert api.calls == [(listing, scope[1])]
+        assert write_through.get_status()['saved'] == 1
+
+    def test_groups_rows(self, helper, database, write_through):
+        helper.handle_groups_request()
+        write_through.queue.stop()
+
+        assert [(group['id'], group['name']) for group in database.get_groups()] == [(1, 'Platform')]
+        assert database.listing_status('groups', None)['refreshed_at'] is not None
+
+    def test_subgroups_rows(self, helper, database, write_through):
+        helper.handle_subgroups_request(1)
+        write_through.queue.stop()
+
+        assert [(group['id'], group['parent_id']) for group in database.get_subgroups(1)] == [(2, 1)]
+        assert database.listing_status('groups', 1)['refreshed_at'] is not None
+
+    def test_projects_rows(self, helper, database, write_through):
+        helper.handle_projects_request(1)
+        write_through.queue.stop()
+
+        assert [(project['id'], project['path_with_namespace']) for project in database.get_projects(1)] == [
+            (7, 'platform/api')
+        ]
+        assert database.listing_status('projects', 1)['refreshed_at'] is not None
+
+    def test_pipelines_rows(self, helper, database, write_through):
+        helper.handle_pipelines_request(7)
+        write_through.queue.stop()
+
+        assert [(pipeline['id'], pipeline['status'], pipeline['sha']) for pipeline in database.get_pipelines(7)] == [
+            (31, 'success', COMMIT_SHA)
+        ]
+        assert database.listing_status('pipelines', 7)['refreshed_at'] is not None
+
+    def test_branches_rows(self, helper, database, write_through):
+        helper.handle_branches_request(7)
+        write_through.queue.stop()
+
+        branch = database.get_branch(7, 'main')
+        assert branch['commit_id'] == COMMIT_SHA
+        assert branch['commit_title'] == 'fixed readme'
+        assert branch['protected']
+        assert database.listing_status('branches', 7)['refreshed_at'] is not None
+
+    def test_repeated_views_in_one_batch_are_written_once(self, database, write_through):
+        saves = []
+        write_through.process_batch([
+            (('projects', 1), lambda data: saves.append(data), [f'view {view}'], (), {}) for view in range(3)
+        ])
+
+        assert saves == [['view 2']]
+        assert write_through.stats['coalesced'] == 2
+
+    def test_failing_save_does_not_drop_the_batch(self, database, write_through):
+        def failing_save(data):
+            raise ValueError('disk full')
+
+        write_through.process_batch([
+            (('pipelines', 7), failing_save, [], (), {}),
+            (('branches', 7), lambda data: database.save_branches(data, 7),
+             StubGitLabAPI().get_project_branches(7)['branches'], (), {})
+        ])
+
+        assert write_through.stats == {'saved': 1, 'coalesced': 0, 'failed': 1}
+        assert database.get_branch(7, 'main') is not None
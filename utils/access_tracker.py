@@ -0,0 +1,89 @@
+"""
+Access Tracking Utility
+Records how often and how recently projects and groups are viewed, so sync can refresh hot data first
+"""
+import logging
+import math
+import threading
+import time
+from typing import Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+class AccessTracker:
+    """
+    In-memory access counter with exponential decay, flushed to the database periodically
+
+    Only the heat accumulated since the last flush is kept in memory (one small list per
+    entity viewed), so the structure stays compact regardless of how many entities exist.
+    Recording flushes once flush_interval has passed; start() also flushes every
+    flush_interval on a background thread, so a quiet process does not hold its heat.
+    """
+
+    def __init__(self, database, half_life_seconds: float = 86400.0, flush_interval: float = 60.0):
+        self.database = database
+        self.half_life_seconds = half_life_seconds
+        self.flush_interval = flush_interval
+        # (entity_type, entity_id) -> [heat, last_access, hits]
+        self._pending: Dict[Tuple[str, int], list] = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.time()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self) -> bool:
+        """Flush every flush_interval seconds on a background thread; False if already running"""
+        if self._thread and self._thread.is_alive():
+            return False
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='access-tracker', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """Stop the flush thread and write what is still pending"""
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            if time.time() - self._last_flush >= self.flush_interval:
+                self.flush()
+
+    def record(self, entity_type: str, entity_id: int):
+        """Count one access to an entity"""
+        now = time.time()
+        with self._lock:
+            entry = self._pending.get((entity_type, entity_id))
+            if entry is None:
+                self._pending[(entity_type, entity_id)] = [1.0, now, 1]
+            else:
+                entry[0] = entry[0] * self._decay(now - entry[1]) + 1.0
+                entry[1] = now
+                entry[2] += 1
+            flush_due = now - self._last_flush >= self.flush_interval
+        if flush_due:
+            self.flush()
+
+    def flush(self) -> int:
+        """Merge pending accesses into the access_stats table, returns entities written"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.time()
+        if not pending:
+            return 0
+        try:
+            self.database.merge_access_stats(
+                [(entity_type, entity_id, heat, last_access, hits)
+                 for (entity_type, entity_id), (heat, last_access, hits) in pending.items()],
+                self.half_life_seconds
+            )
+        except Exception as e:
+            logger.warning(f"Failed to flush access stats for {len(pending)} entities: {str(e)}")
+            return 0
+        return len(pending)
+
+    def _decay(self, elapsed: float) -> float:
+        return math.pow(0.5, max(elapsed, 0) / self.half_life_seconds)
@@ -0,0 +1,102 @@
+"""
+Batch Queue Utility
+Buffers work items and hands them to a handler in batches on a background thread
+"""
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, List
+
+logger = logging.getLogger(__name__)
+
+class BatchQueue:
+    """Thread-backed queue that processes items in batches"""
+
+    def __init__(self, handler: Callable[[List[Any]], None], batch_size: int = 100,
+                 flush_interval: float = 1.0, name: str = 'batch-queue'):
+        self.handler = handler
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self.stats = {'enqueued': 0, 'processed': 0, 'batches': 0, 'failed': 0}
+
+    def put(self, item: Any):
+        """Add an item to the queue, starting the worker thread if needed"""
+        self._queue.put(item)
+        with self._lock:
+            self.stats['enqueued'] += 1
+        self._ensure_worker()
+
+    def get_stats(self) -> dict:
+        """Snapshot of the counters"""
+        with self._lock:
+            return dict(self.stats)
+
+    def pending(self) -> int:
+        """Number of items waiting to be processed"""
+        return self._queue.qsize()
+
+    def drain(self) -> int:
+        """Process everything currently queued on the calling thread"""
+        processed = 0
+        while True:
+            batch = self._take_batch(block=False)
+            if not batch:
+                return processed
+            self._process(batch)
+            processed += len(batch)
+
+    def stop(self):
+        """Stop the worker thread after flushing pending items"""
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout=self.flush_interval * 2)
+        self.drain()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._take_batch(block=True)
+            if batch:
+                self._process(batch)
+
+    def _take_batch(self, block: bool) -> List[Any]:
+        """Collect up to batch_size items, waiting at most flush_interval for the batch to fill"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                if block:
+                    timeout = max(deadline - time.monotonic(), 0)
+                    if timeout == 0:
+                        break
+                    batch.append(self._queue.get(timeout=timeout))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _process(self, batch: List[Any]):
+        try:
+            self.handler(batch)
+        except Exception as e:
+            with self._lock:
+                self.stats['failed'] += len(batch)
+            logger.error(f"{self.name}: failed to process batch of {len(batch)} items: {str(e)}")
+        else:
+            with self._lock:
+                self.stats['processed'] += len(batch)
+                self.stats['batches'] += 1
@@ -0,0 +1,173 @@
+"""
+Change Feed Utility
+Polls GitLab's Events API and refreshes only the projects that changed, for hosts webhooks cannot reach
+"""
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+class ChangeFeedPoller:
+    """
+    Incremental sync driven by GitLab activity events
+
+    Each poll reads /events newest first and stops at the last event id already processed
+    (stored in the sync_cursors table), so a quiet interval costs a single request. Pushes,
+    branch and tag deletions and merged merge requests mark their project as changed; each
+    changed project is refreshed once per poll with GitLabSyncService.sync_single_project.
+
+    If more events arrived than max_pages can hold, some were missed: the next full sync is
+    told to poll every project again instead of relying on the feed.
+
+    sync_service must be the poller's own GitLabSyncService, without an event broadcaster:
+    refreshes install their API client on it, which must not happen under a running sync.
+    """
+
+    CURSOR_NAME = 'gitlab_events'
+    MERGE_ACTIONS = ('accepted', 'merged')
+
+    def __init__(self, database, sync_service, api_factory: Callable, interval: float = 60.0,
+                 max_pages: int = 20, per_page: int = 100):
+        self.database = database
+        self.sync_service = sync_service
+        self.api_factory = api_factory
+        self.interval = interval
+        self.max_pages = max_pages
+        self.per_page = per_page
+        # Projects whose refresh failed, retried on the next poll
+        self._retry: Set[int] = set()
+        self._thread = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self.last_result: Dict[str, Any] = {'state': 'idle'}
+
+    def start(self) -> bool:
+        """Poll every interval seconds on a background thread; False if already running"""
+        if self._thread and self._thread.is_alive():
+            return False
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='change-feed', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            'running': bool(self._thread and self._thread.is_alive()),
+            'interval_seconds': self.interval,
+            'cursor': self.database.get_sync_cursor(self.CURSOR_NAME),
+            'last_poll': self.last_result
+        }
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.warning(f"Change feed poll failed: {str(e)}")
+            self._stopped.wait(self.interval)
+
+    def poll_once(self) -> Dict[str, Any]:
+        """Read new events and refresh the projects they touch"""
+        with self._lock:
+            gitlab_api = self.api_factory()
+            if not gitlab_api:
+                self.last_result = {'state': 'not_configured'}
+                return self.last_result
+
+            started = datetime.now()
+            stored = self.database.get_sync_cursor(self.CURSOR_NAME)
+            cursor = int(stored) if stored else None
+            events, complete, pages = self._read_new_events(gitlab_api, cursor)
+
+            result = {
+                'state': 'completed',
+                'started_at': started.isoformat(),
+                'requests': pages,
+                'events': len(events)
+            }
+            if events:
+                self.database.save_sync_cursor(self.CURSOR_NAME, str(max(event['id'] for event in events)))
+
+            if cursor is None:
+                # First poll: start from the newest event rather than replaying history
+                result['state'] = 'initialized'
+                self.last_result = result
+                return result
+
+            changes = self.changed_refs(events)
+            result['refs'] = {project_id: sorted(refs) for project_id, refs in changes.items() if refs}
+            refreshed, failed, unknown = self._refresh(gitlab_api, set(changes) | self._retry)
+            result.update({'refreshed': refreshed, 'failed': failed, 'unknown_projects': unknown})
+
+            if complete:
+                self.database.update_sync_status('change_feed', 0, 'completed')
+            else:
+                result['state'] = 'gap'
+                logger.warning(f"Change feed read {self.max_pages} pages without reaching event {cursor}, "
+                               "the next full sync will poll every project")
+                self.database.update_sync_status('project_poll', 0, 'pending', 'change feed missed events')
+                self.database.update_sync_status('change_feed', 0, 'failed', 'missed events')
+
+            result['finished_at'] = datetime.now().isoformat()
+            self.last_result = result
+            return result
+
+    def _read_new_events(self, gitlab_api, cursor: Optional[int]) -> tuple:
+        """Events newer than the cursor, whether the cursor was reached and the pages read"""
+        if cursor is None:
+            newest = next(gitlab_api.iter_events(per_page=1), [])
+            return newest[:1], True, 1
+        events = []
+        pages = 0
+        for page in gitlab_api.iter_events(per_page=self.per_page):
+            pages += 1
+            for event in page:
+                if event['id'] <= cursor:
+                    return events, True, pages
+                events.append(event)
+            if pages >= self.max_pages:
+                return events, False, pages
+        return events, True, pages
+
+    @classmethod
+    def changed_refs(cls, events: List[Dict[str, Any]]) -> Dict[int, Set[str]]:
+        """Map events to the projects they change and the branches or tags involved"""
+        changes: Dict[int, Set[str]] = {}
+        for event in events:
+            project_id = event.get('project_id')
+            if not project_id:
+                continue
+            push_data = event.get('push_data')
+            if push_data:
+                refs = changes.setdefault(project_id, set())
+                if push_data.get('ref'):
+                    refs.add(push_data['ref'])
+            elif event.get('target_type') == 'MergeRequest' and event.get('action_name') in cls.MERGE_ACTIONS:
+                changes.setdefault(project_id, set())
+        return changes
+
+    def _refresh(self, gitlab_api, project_ids: Set[int]) -> tuple:
+        """Sync each known project once; projects not synced yet arrive with the next full sync"""
+        known = {project['id'] for project in self.database.get_project_sync_info(sorted(project_ids))}
+        refreshed, failed = [], []
+        for project_id in sorted(known):
+            try:
+                results = asyncio.run(self.sync_service.sync_single_project(project_id, gitlab_api))
+                if any(entity_results['failed'] for entity_results in results.values()):
+                    raise Exception('; '.join(error for entity_results in results.values()
+                                              for error in entity_results['errors']))
+                refreshed.append(project_id)
+                self._retry.discard(project_id)
+            except Exception as e:
+                logger.warning(f"Change feed refresh of project {project_id} failed: {str(e)}")
+                failed.append(project_id)
+                self._retry.add(project_id)
+        return refreshed, failed, sorted(project_ids - known)
@@ -0,0 +1,104 @@
+"""
+Response Compression Utility
+Brotli/gzip content negotiation for JSON responses, with compressed bodies reusable from the response cache
+"""
+import gzip
+import logging
+from typing import Dict, Any, Optional
+from flask import Response, request
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+class ResponseCompressor:
+    """
+    Compresses JSON responses with the best encoding the client accepts
+
+    Brotli is preferred when the brotli package is installed, gzip otherwise. Bodies that are
+    served once are compressed at a fast level by apply(), installed as an after_request hook.
+    Cached bodies are compressed at the best level by ResponseHelper and stored in the response
+    cache next to the plain body, so each one is compressed once per data version. A compressed
+    response keeps its strong ETag with the encoding appended ("<tag>-br"), and
+    requested_variant() lets If-None-Match match either form. Streamed responses are left as they are.
+    """
+
+    COMPRESSIBLE_TYPES = ('application/json', 'text/html', 'text/plain', 'text/css', 'application/javascript')
+    # (fast, best) levels: fast for per-request bodies, best for bodies compressed once and cached
+    LEVELS = {'br': (4, 9), 'gzip': (6, 9)}
+
+    def __init__(self, min_size: int = 1024):
+        # Bodies smaller than this are sent uncompressed; 0 turns compression off
+        self.min_size = min_size
+        self.encodings = ['br', 'gzip'] if BROTLI_AVAILABLE else ['gzip']
+        self.stats = {'compressed': 0, 'bytes_in': 0, 'bytes_out': 0}
+
+    def negotiate(self, body: bytes) -> Optional[str]:
+        """The encoding to send body with, None if it is too small or the client accepts none"""
+        if not self.min_size or len(body) < self.min_size:
+            return None
+        return request.accept_encodings.best_match(self.encodings)
+
+    def compress(self, body: bytes, encoding: str, best: bool = False) -> bytes:
+        level = self.LEVELS[encoding][1 if best else 0]
+        if encoding == 'br':
+            compressed = brotli.compress(body, quality=level)
+        else:
+            compressed = gzip.compress(body, compresslevel=level, mtime=0)
+        self.stats['compressed'] += 1
+        self.stats['bytes_in'] += len(body)
+        self.stats['bytes_out'] += len(compressed)
+        return compressed
+
+    @staticmethod
+    def encoded(response: Response, body: bytes, encoding: str) -> Response:
+        """Replace a response's body with its compressed form and mark the encoding"""
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        tag, weak = response.get_etag()
+        if tag:
+            response.set_etag(f'{tag}-{encoding}', weak)
+        return response
+
+    def requested_variant(self, etag: str) -> Optional[str]:
+        """The tag of etag or of one of its encoded variants named in If-None-Match, else None"""
+        for tag in [etag] + [f'{etag}-{encoding}' for encoding in self.LEVELS]:
+            if request.if_none_match.contains(tag):
+                return tag
+        return None
+
+    def apply(self, response: Response) -> Response:
+        """after_request hook compressing eligible responses that were not compressed yet"""
+        if response.status_code == 304:
+            # Revalidated: answer with the variant tag the client holds
+            tag = response.get_etag()[0]
+            matched = self.requested_variant(tag) if tag else None
+            if matched:
+                response.set_etag(matched)
+            return response
+        if (response.status_code != 200 or response.mimetype not in self.COMPRESSIBLE_TYPES
+                or 'Content-Encoding' in response.headers):
+            return response
+        response.vary.add('Accept-Encoding')
+        if response.is_streamed or response.direct_passthrough:
+            return response
+        body = response.get_data()
+        encoding = self.negotiate(body)
+        if encoding:
+            self.encoded(response, self.compress(body, encoding), encoding)
+        return response
+
+    def get_status(self) -> Dict[str, Any]:
+        saved = self.stats['bytes_in'] - self.stats['bytes_out']
+        return {
+            'encodings': self.encodings,
+            'min_size': self.min_size,
+            'ratio': round(self.stats['bytes_out'] / self.stats['bytes_in'], 3) if self.stats['bytes_in'] else None,
+            'bytes_saved': saved,
+            **self.stats
+        }
@@ -0,0 +1,123 @@
+"""
+Adaptive Concurrency Utility
+AIMD controller that sizes the number of in-flight GitLab requests from observed latency and errors
+"""
+import logging
+import math
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Additive-increase / multiplicative-decrease concurrency limit
+
+    Every time a full round of requests (as many as the current limit) completes with a
+    healthy p95 latency, the limit grows by one. A 429, a 5xx, a connection failure or a p95
+    above latency_tolerance times the baseline halves it. After a decrease, congestion signals
+    are ignored until the requests that were in flight at the time have completed, so one
+    burst of failures only cuts the limit once.
+    """
+
+    def __init__(self, initial_limit: int = 4, min_limit: int = 1, max_limit: int = 16,
+                 window_size: int = 50, latency_tolerance: float = 2.0,
+                 decrease_factor: float = 0.5, history_size: int = 50):
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, min_limit)
+        self.limit = min(max(initial_limit, self.min_limit), self.max_limit)
+        self.latency_tolerance = latency_tolerance
+        self.decrease_factor = decrease_factor
+        self.baseline_p95: Optional[float] = None
+        self._latencies = deque(maxlen=window_size)
+        self._healthy_in_round = 0
+        self._since_decrease = 0
+        self._decrease_guard = 0
+        self._history = deque(maxlen=history_size)
+        self._stats = {'requests': 0, 'throttled': 0, 'server_errors': 0, 'failures': 0}
+        self._lock = threading.Lock()
+        self._record_change('initial')
+
+    def observe(self, latency: float, status_code: Optional[int]):
+        """Feed back one completed request; status_code is None when no response arrived"""
+        with self._lock:
+            self._stats['requests'] += 1
+            self._since_decrease += 1
+
+            if status_code is None or status_code == 429 or status_code >= 500:
+                if status_code == 429:
+                    self._stats['throttled'] += 1
+                elif status_code is None:
+                    self._stats['failures'] += 1
+                else:
+                    self._stats['server_errors'] += 1
+                self._decrease(f"status {status_code or 'no response'}")
+                return
+
+            if self._since_decrease <= self._decrease_guard:
+                # Still draining requests sent under the previous, higher limit
+                return
+            self._latencies.append(latency)
+            self._healthy_in_round += 1
+            if self._healthy_in_round < self.limit or len(self._latencies) < min(10, self._latencies.maxlen):
+                return
+            self._healthy_in_round = 0
+
+            p95 = self._p95()
+            if self.baseline_p95 is None:
+                self.baseline_p95 = p95
+            if p95 > self.baseline_p95 * self.latency_tolerance:
+                if self.limit == self.min_limit:
+                    # Still slow with nothing left to cut: the server itself got slower
+                    self.baseline_p95 = p95
+                else:
+                    self._decrease(f"p95 {p95 * 1000:.0f}ms")
+                return
+
+            # Only healthy windows move the baseline, so spikes are not absorbed into it
+            self.baseline_p95 = min(p95, 0.9 * self.baseline_p95 + 0.1 * p95)
+            if self.limit < self.max_limit:
+                self.limit += 1
+                self._record_change('increase')
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current limit, latency figures and recent limit changes"""
+        with self._lock:
+            p95 = self._p95() if self._latencies else None
+            return {
+                'limit': self.limit,
+                'min_limit': self.min_limit,
+                'max_limit': self.max_limit,
+                'p95_latency_ms': round(p95 * 1000, 1) if p95 is not None else None,
+                'baseline_p95_ms': round(self.baseline_p95 * 1000, 1) if self.baseline_p95 is not None else None,
+                **self._stats,
+                'history': list(self._history)
+            }
+
+    def _decrease(self, reason: str):
+        # Requests already in flight when the limit was cut still report the old load
+        if self._since_decrease < self._decrease_guard:
+            return
+        new_limit = max(self.min_limit, int(self.limit * self.decrease_factor))
+        self._since_decrease = 0
+        self._decrease_guard = self.limit
+        self._healthy_in_round = 0
+        # Samples from before the cut describe the old load level
+        self._latencies.clear()
+        if new_limit != self.limit:
+            logger.info(f"Reducing sync concurrency from {self.limit} to {new_limit} ({reason})")
+            self.limit = new_limit
+            self._record_change(reason)
+
+    def _p95(self) -> float:
+        ordered = sorted(self._latencies)
+        return ordered[max(0, math.ceil(len(ordered) * 0.95) - 1)]
+
+    def _record_change(self, reason: str):
+        self._history.append({
+            'time': datetime.now().isoformat(),
+            'limit': self.limit,
+            'reason': reason
+        })
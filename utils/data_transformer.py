@@ -4,7 +4,7 @@ Handles conversion between database and API formats
 """
 import json
 import logging
-from typing import List, Dict, Any, Optional
+from typing import Callable, Iterable, Iterator, List, Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -116,12 +116,13 @@ class DataTransformer:
     
     @staticmethod
     def format_branches_from_db(branches: List[Dict]) -> List[Dict]:
-        """Convert database branch format to API format"""
+        """Convert database branch format (joined with commits) to API format"""
         formatted_branches = []
         for branch in branches:
             if branch.get('gitlab_data'):
                 try:
                     gitlab_data = json.loads(branch['gitlab_data'])
+                    gitlab_data['commit'] = DataTransformer._commit_from_db(branch)
                     formatted_branches.append(gitlab_data)
                 except json.JSONDecodeError:
                     logger.warning(f"Invalid JSON data for branch {branch.get('name')}")
@@ -132,9 +133,19 @@ class DataTransformer:
         return formatted_branches
     
     @staticmethod
-    def _create_basic_branch(branch: Dict) -> Dict:
-        """Create basic branch data structure"""
-        commit_data = {
+    def _commit_from_db(branch: Dict) -> Dict:
+        """Head commit of a branch row from the joined commits table"""
+        if branch.get('commit_data'):
+            try:
+                return json.loads(branch['commit_data'])
+            except json.JSONDecodeError:
+                logger.warning(f"Invalid JSON data for commit {branch.get('commit_id')}")
+        return DataTransformer._create_basic_commit(branch)
+    
+    @staticmethod
+    def _create_basic_commit(branch: Dict) -> Dict:
+        """Create basic commit data structure from the joined commit_* columns"""
+        return {
             'id': branch.get('commit_id', ''),
             'short_id': branch.get('commit_short_id', ''),
             'title': branch.get('commit_title', ''),
@@ -144,9 +155,13 @@ class DataTransformer:
             'committer_name': branch.get('commit_committer_name', ''),
             'committer_email': branch.get('commit_committer_email', ''),
             'committed_date': branch.get('commit_committed_date'),
-            'message': branch.get('commit_message', '')
+            'message': branch.get('commit_message', ''),
+            'web_url': branch.get('commit_web_url', '')
         }
-        
+    
+    @staticmethod
+    def _create_basic_branch(branch: Dict) -> Dict:
+        """Create basic branch data structure"""
         return {
             'name': branch.get('name', ''),
             'merged': branch.get('merged', False),
@@ -156,9 +171,45 @@ class DataTransformer:
             'developers_can_merge': branch.get('developers_can_merge', False),
             'can_push': branch.get('can_push', False),
             'web_url': branch.get('web_url', ''),
-            'commit': commit_data
+            'commit': DataTransformer._create_basic_commit(branch)
         }
     
+    @staticmethod
+    def stream_json_listing(list_key: str, rows: Iterable, basic_builder: Callable[[Dict], Dict],
+                            source: str = 'database', fields: Optional[List[str]] = None,
+                            extra: Optional[Dict[str, Any]] = None, batch_size: int = 256) -> Iterator[bytes]:
+        """
+        Write a success response listing stored rows as JSON, without decoding their payloads
+        
+        Each row's payload (see GitLabDatabase.iter_listing) is JSON written by GitLabDatabase,
+        so it is spliced into the envelope as is. Only rows without a payload are built with
+        basic_builder, limited to fields, and serialized. extra adds top-level keys such as
+        pagination. The body is produced batch_size rows at a time, so it can be streamed.
+        """
+        head = {'success': True, 'source': source, **(extra or {})}
+        yield (json.dumps(head)[:-1] + f', {json.dumps(list_key)}: [').encode('utf-8')
+        separator = ''
+        parts = []
+        for row in rows:
+            payload = row['payload']
+            if payload is None:
+                basic = basic_builder(dict(row))
+                payload = json.dumps({field: basic.get(field) for field in fields} if fields else basic)
+            parts.append(separator + payload)
+            separator = ', '
+            if len(parts) >= batch_size:
+                yield ''.join(parts).encode('utf-8')
+                parts = []
+        parts.append(']}')
+        yield ''.join(parts).encode('utf-8')
+    
+    @staticmethod
+    def select_fields(items: List[Dict], fields: Optional[List[str]]) -> List[Dict]:
+        """Limit formatted items to the requested top-level fields"""
+        if not fields:
+            return items
+        return [{field: item.get(field) for field in fields} for item in items]
+    
     @staticmethod
     def create_api_response(success: bool, data: Any = None, source: str = 'database', 
                           error: Optional[str] = None, **kwargs) -> Dict[str, Any]:
@@ -5,8 +5,9 @@ Priority: Environment Variables > .env file > Config File > Database > .env.temp
 import os
 import json
 from typing import Dict, Optional, Any
-from flask import session
+from flask import session, has_request_context
 import logging
+from utils.sync_policy import SyncPolicy
 
 # Try to import python-dotenv for .env file support
 try:
@@ -205,6 +206,9 @@ class EnhancedConfigManager:
     
     def _get_session_config(self) -> Optional[Dict[str, str]]:
         """Get configuration from session"""
+        if not has_request_context():
+            # Background threads such as the change feed have no session
+            return None
         gitlab_url = session.get('gitlab_url')
         access_token = session.get('gitlab_access_token')
         
@@ -333,6 +337,31 @@ LOG_LEVEL=INFO
             logger.error(f"Failed to save configuration: {str(e)}")
             return {'success': False, 'error': str(e)}
     
+    def get_sync_policy(self) -> SyncPolicy:
+        """
+        Get the sync policy: SYNC_POLICIES / SYNC_INCLUDE_ARCHIVED environment variables,
+        otherwise the "sync" section of the config file
+        """
+        file_settings = {}
+        try:
+            if os.path.exists(self.config_file_path):
+                with open(self.config_file_path, 'r') as f:
+                    file_settings = json.load(f).get('sync', {})
+        except Exception as e:
+            logger.warning(f"Failed to read sync settings from config file: {e}")
+        
+        include_archived = os.environ.get('SYNC_INCLUDE_ARCHIVED')
+        try:
+            return SyncPolicy.from_config(
+                os.environ.get('SYNC_POLICIES') or file_settings.get('policies'),
+                include_archived=(include_archived.lower() == 'true' if include_archived is not None
+                                  else bool(file_settings.get('include_archived', False))),
+                default_level=file_settings.get('default_level', SyncPolicy.FULL)
+            )
+        except ValueError as e:
+            logger.error(f"Invalid sync policy, syncing all groups fully: {e}")
+            return SyncPolicy()
+    
     def get_app_config(self) -> Dict[str, Any]:
         """Get application configuration"""
         return {
@@ -341,5 +370,21 @@ LOG_LEVEL=INFO
             'host': os.environ.get('FLASK_HOST', '0.0.0.0'),
             'port': int(os.environ.get('FLASK_PORT', '5000')),
             'database_url': os.environ.get('DATABASE_URL', 'gitlab_dashboard.db'),
-            'log_level': os.environ.get('LOG_LEVEL', 'INFO')
+            'log_level': os.environ.get('LOG_LEVEL', 'INFO'),
+            'webhook_secret': os.environ.get('GITLAB_WEBHOOK_SECRET', ''),
+            'access_half_life_hours': float(os.environ.get('ACCESS_HALF_LIFE_HOURS', '24')),
+            'change_feed_interval_seconds': float(os.environ.get('CHANGE_FEED_INTERVAL_SECONDS', '0')),
+            'pipeline_tracker_interval_seconds': float(os.environ.get('PIPELINE_TRACKER_INTERVAL_SECONDS', '0')),
+            'response_cache_size': int(os.environ.get('RESPONSE_CACHE_SIZE', '1024')),
+            'response_cache_ttl_seconds': float(os.environ.get('RESPONSE_CACHE_TTL_SECONDS', '300')),
+            'response_cache_shared_size': int(os.environ.get('RESPONSE_CACHE_SHARED_SIZE', '8192')),
+            'compression_min_bytes': int(os.environ.get('COMPRESSION_MIN_BYTES', '1024')),
+            'negative_cache_empty_ttl_seconds': float(os.environ.get('NEGATIVE_CACHE_EMPTY_TTL_SECONDS', '120')),
+            'negative_cache_error_ttl_seconds': float(os.environ.get('NEGATIVE_CACHE_ERROR_TTL_SECONDS', '30')),
+            'freshness_seconds': {
+                'groups': float(os.environ.get('FRESHNESS_GROUPS_SECONDS', '3600')),
+                'projects': float(os.environ.get('FRESHNESS_PROJECTS_SECONDS', '900')),
+                'pipelines': float(os.environ.get('FRESHNESS_PIPELINES_SECONDS', '120')),
+                'branches': float(os.environ.get('FRESHNESS_BRANCHES_SECONDS', '600'))
+            }
         }
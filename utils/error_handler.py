@@ -40,6 +40,13 @@ class ErrorHandler:
                     'error': f'Validation Error: {str(e)}',
                     'error_type': 'validation_error'
                 }), 400
+            except SyncInProgressError as e:
+                logger.info(f"Sync refused in {func.__name__}: {str(e)}")
+                return jsonify({
+                    'success': False,
+                    'error': str(e),
+                    'error_type': 'sync_in_progress'
+                }), 409
             except Exception as e:
                 logger.error(f"Unexpected error in {func.__name__}: {str(e)}")
                 return jsonify({
@@ -97,3 +104,7 @@ class ValidationError(Exception):
 class SyncError(Exception):
     """Custom exception for synchronization errors"""
     pass
+
+class SyncInProgressError(SyncError):
+    """Raised when a sync is started while another one holds the sync service"""
+    pass
@@ -4,7 +4,8 @@ Handles all GitLab API interactions and authentication
 """
 import requests
 import logging
-from typing import Dict, List, Optional, Any
+import time
+from typing import Dict, List, Optional, Any, Iterator
 
 logger = logging.getLogger(__name__)
 
@@ -18,14 +19,51 @@ class GitLabAPI:
             'Private-Token': access_token,
             'Content-Type': 'application/json'
         }
+        # Optional callback(latency_seconds, status_code) invoked after every request;
+        # status_code is None when no response was received
+        self.observer = None
     
     def make_request(self, endpoint: str, params: Optional[Dict] = None) -> Dict[str, Any]:
         """Make a request to GitLab API"""
+        return self._get(endpoint, params).json()
+    
+    def iter_pages(self, endpoint: str, params: Optional[Dict] = None, 
+                   per_page: int = 100) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Stream a paginated GitLab API listing one page at a time
+        
+        Follows the X-Next-Page header, so only one page is held in memory.
+        Raises on request failure, like make_request.
+        """
+        page = 1
+        while page:
+            response = self._get(endpoint, {**(params or {}), 'per_page': per_page, 'page': page})
+            items = response.json()
+            if not items:
+                return
+            yield items
+            next_page = response.headers.get('X-Next-Page')
+            if next_page:
+                page = int(next_page)
+            elif 'X-Next-Page' not in response.headers and len(items) == per_page:
+                # Keyset-paginated or header-less responses: keep going until a short page
+                page += 1
+            else:
+                page = None
+    
+    def _get(self, endpoint: str, params: Optional[Dict] = None) -> requests.Response:
+        """Perform a GET request, translating HTTP failures into descriptive exceptions"""
         url = f"{self.base_url}/api/v4{endpoint}"
+        started = time.monotonic()
         try:
-            response = requests.get(url, headers=self.headers, params=params, timeout=30)
+            try:
+                response = requests.get(url, headers=self.headers, params=params, timeout=30)
+            except requests.exceptions.RequestException:
+                self._observe(started, None)
+                raise
+            self._observe(started, response.status_code)
             response.raise_for_status()
-            return response.json()
+            return response
         except requests.exceptions.HTTPError as e:
             if e.response.status_code == 401:
                 error_msg = f"Authentication failed for {endpoint}. Please check your GitLab access token."
@@ -42,6 +80,13 @@ class GitLabAPI:
             logger.error(error_msg)
             raise Exception(error_msg)
     
+    def _observe(self, started: float, status_code: Optional[int]):
+        if self.observer:
+            try:
+                self.observer(time.monotonic() - started, status_code)
+            except Exception as e:
+                logger.warning(f"Request observer failed: {str(e)}")
+    
     def test_connection(self) -> Dict[str, Any]:
         """Test the GitLab connection"""
         try:
@@ -99,6 +144,43 @@ class GitLabAPI:
         except Exception as e:
             return {'success': False, 'error': str(e), 'projects': []}
     
+    def iter_groups(self, top_level_only: bool = True, per_page: int = 100) -> Iterator[List[Dict[str, Any]]]:
+        """Stream all groups page by page"""
+        params = {'top_level_only': 'true'} if top_level_only else {}
+        return self.iter_pages('/groups', params, per_page)
+    
+    def iter_descendant_groups(self, group_id: int, per_page: int = 100) -> Iterator[List[Dict[str, Any]]]:
+        """Stream every subgroup below a group, at any depth, page by page"""
+        return self.iter_pages(f'/groups/{group_id}/descendant_groups', None, per_page)
+    
+    def iter_group_projects(self, group_id: int, include_subgroups: bool = True,
+                            archived: Optional[bool] = None, order_by: Optional[str] = None,
+                            per_page: int = 100) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Stream projects of a group (and by default all of its subgroups) page by page
+        
+        archived=False leaves out archived projects, None lists both; order_by sorts descending.
+        """
+        params = {'include_subgroups': str(include_subgroups).lower()}
+        if archived is not None:
+            params['archived'] = str(archived).lower()
+        if order_by:
+            params['order_by'] = order_by
+            params['sort'] = 'desc'
+        return self.iter_pages(f'/groups/{group_id}/projects', params, per_page)
+    
+    def iter_events(self, scope: str = 'all', after: Optional[str] = None,
+                    per_page: int = 100) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Stream activity events, newest first, page by page
+        
+        scope='all' covers every project the token's user is a member of; after is a YYYY-MM-DD date.
+        """
+        params = {'scope': scope, 'sort': 'desc'}
+        if after:
+            params['after'] = after
+        return self.iter_pages('/events', params, per_page)
+    
     def get_project_details(self, project_id: int) -> Dict[str, Any]:
         """Get detailed information about a specific project"""
         try:
@@ -154,3 +236,21 @@ class GitLabAPI:
             return {'success': True, 'branch': branch}
         except Exception as e:
             return {'success': False, 'error': str(e), 'branch': None}
+    
+    def get_commit(self, project_id: int, sha: str) -> Dict[str, Any]:
+        """Get a single commit, including its stats"""
+        try:
+            from urllib.parse import quote
+            commit = self.make_request(f'/projects/{project_id}/repository/commits/{quote(sha, safe="")}')
+            return {'success': True, 'commit': commit}
+        except Exception as e:
+            return {'success': False, 'error': str(e), 'commit': None}
+    
+    def compare_commits(self, project_id: int, from_ref: str, to_ref: str) -> Dict[str, Any]:
+        """Get the commits and diffs between two commits, branches or tags"""
+        try:
+            params = {'from': from_ref, 'to': to_ref}
+            compare = self.make_request(f'/projects/{project_id}/repository/compare', params)
+            return {'success': True, 'compare': compare}
+        except Exception as e:
+            return {'success': False, 'error': str(e), 'compare': None}
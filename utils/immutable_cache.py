@@ -0,0 +1,110 @@
+"""
+Immutable Cache Utility
+Permanent cache for GitLab responses that can never change: commits, SHA compares and finished pipelines
+"""
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+FULL_SHA = re.compile(r'^[0-9a-f]{40}$|^[0-9a-f]{64}$')
+
+class ImmutableCache:
+    """
+    Content-addressed cache in front of GitLabAPI, kept in memory and in the database
+
+    Keys only ever name immutable content: a full commit SHA, a compare between two full SHAs
+    or a pipeline id together with its terminal status. Entries therefore never need
+    invalidation. Branch names, tags and short SHAs can move and always go to GitLab. Hits come
+    from an in-process LRU first, then from the immutable_objects table shared by all processes.
+    """
+
+    def __init__(self, database, memory_size: int = 2048):
+        self.database = database
+        self.memory_size = memory_size
+        self._memory: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'database_hits': 0, 'misses': 0, 'stored': 0}
+
+    @staticmethod
+    def is_full_sha(ref: Optional[str]) -> bool:
+        return bool(ref and FULL_SHA.match(ref))
+
+    def is_terminal(self, status: Optional[str]) -> bool:
+        return status in self.database.FINISHED_PIPELINE_STATUSES
+
+    def get(self, cache_key: str) -> Optional[Any]:
+        """Cached value for a key, or None"""
+        with self._lock:
+            if cache_key in self._memory:
+                self._memory.move_to_end(cache_key)
+                self.stats['memory_hits'] += 1
+                return self._memory[cache_key]
+        stored = self.database.get_immutable_object(cache_key)
+        if stored is None:
+            self.stats['misses'] += 1
+            return None
+        value = json.loads(stored)
+        self.stats['database_hits'] += 1
+        self._remember(cache_key, value)
+        return value
+
+    def put(self, cache_key: str, value: Any):
+        """Store a value under a content-addressed key"""
+        self.database.save_immutable_object(cache_key, json.dumps(value))
+        self.stats['stored'] += 1
+        self._remember(cache_key, value)
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'memory_entries': len(self._memory), 'memory_size': self.memory_size, **self.stats}
+
+    def get_commit(self, gitlab_api, project_id: int, sha: str) -> Dict[str, Any]:
+        """GitLabAPI.get_commit, answered from the cache for full SHAs"""
+        if not self.is_full_sha(sha):
+            return gitlab_api.get_commit(project_id, sha)
+        cache_key = f'commit:{sha}'
+        commit = self.get(cache_key)
+        if commit is not None:
+            return {'success': True, 'commit': commit, 'cached': True}
+        result = gitlab_api.get_commit(project_id, sha)
+        if result['success']:
+            self.put(cache_key, result['commit'])
+        return result
+
+    def get_compare(self, gitlab_api, project_id: int, from_ref: str, to_ref: str) -> Dict[str, Any]:
+        """GitLabAPI.compare_commits, answered from the cache when both ends are full SHAs"""
+        if not (self.is_full_sha(from_ref) and self.is_full_sha(to_ref)):
+            return gitlab_api.compare_commits(project_id, from_ref, to_ref)
+        cache_key = f'compare:{project_id}:{from_ref}..{to_ref}'
+        compare = self.get(cache_key)
+        if compare is not None:
+            return {'success': True, 'compare': compare, 'cached': True}
+        result = gitlab_api.compare_commits(project_id, from_ref, to_ref)
+        if result['success'] and not result['compare'].get('compare_timeout'):
+            self.put(cache_key, result['compare'])
+        return result
+
+    def get_pipeline(self, pipeline_id: int, status: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Cached details of a pipeline known to have finished with this status"""
+        if not self.is_terminal(status):
+            return None
+        return self.get(f'pipeline:{pipeline_id}:{status}')
+
+    def store_pipeline(self, pipeline: Dict[str, Any]) -> bool:
+        """Cache pipeline details if the pipeline has finished, returns whether it was cached"""
+        if not self.is_terminal(pipeline.get('status')):
+            return False
+        self.put(f"pipeline:{pipeline['id']}:{pipeline['status']}", pipeline)
+        return True
+
+    def _remember(self, cache_key: str, value: Any):
+        with self._lock:
+            self._memory[cache_key] = value
+            self._memory.move_to_end(cache_key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
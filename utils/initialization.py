@@ -4,8 +4,11 @@ Handles application startup and initial data synchronization
 """
 import logging
 import asyncio
+import threading
+from datetime import datetime
 from typing import Dict, Any
 from utils.gitlab_api import GitLabAPI
+from utils.error_handler import SyncInProgressError
 
 logger = logging.getLogger(__name__)
 
@@ -15,11 +18,16 @@ class InitializationHelper:
     def __init__(self, database, sync_service):
         self.database = database
         self.sync_service = sync_service
+        self._warm_up_thread = None
+        self.warm_up_status = {'state': 'idle'}
     
     def perform_initial_sync(self, gitlab_api: GitLabAPI) -> Dict[str, Any]:
         """
         Perform initial synchronization when database is empty
         
+        Only the top-level groups are loaded before returning; subgroups, projects,
+        pipelines and branches are filled in by a background warm-up sync.
+        
         Args:
             gitlab_api: GitLab API instance
             
@@ -37,16 +45,20 @@ class InitializationHelper:
             
             logger.info("Database is empty, triggering initial sync...")
             
-            # Set up sync service
-            self.sync_service.set_gitlab_api(gitlab_api)
-            
-            # Perform limited initial sync for faster setup
-            sync_results = self._perform_limited_sync(gitlab_api)
+            # Hold the sync service like every other sync, so none runs alongside this one
+            with self.sync_service.exclusive('initial', gitlab_api):
+                sync_results = self.sync_service.new_sync_results('groups')
+                top_level_ids = self.sync_service.sync_top_level_groups(sync_results)
+            logger.info(f"Saved {len(top_level_ids)} top-level groups, starting warm-up sync")
+            self.start_warm_up()
             
             return {
                 'initial_sync': True,
-                'message': 'Initial data synchronized successfully',
-                'results': sync_results
+                'message': 'Top-level groups loaded, remaining data is syncing in the background',
+                'results': {
+                    'groups_synced': len(top_level_ids),
+                    'warm_up': self.warm_up_status['state']
+                }
             }
             
         except Exception as e:
@@ -57,96 +69,52 @@ class InitializationHelper:
                 'sync_error': str(e)
             }
     
-    def _perform_limited_sync(self, gitlab_api: GitLabAPI) -> Dict[str, Any]:
+    def start_warm_up(self) -> bool:
         """
-        Perform a limited sync for initial setup (faster than full sync)
+        Run a full sync in a background thread
+        
+        Projects are listed most recently active first and the pipeline and branch stages
+        follow last_activity_at, so the projects people are working on arrive first.
         
-        Args:
-            gitlab_api: GitLab API instance
-            
         Returns:
-            Dict containing sync statistics
+            False if a warm-up is already running
         """
-        sync_stats = {
-            'groups_synced': 0,
-            'projects_synced': 0,
-            'pipelines_synced': 0,
-            'branches_synced': 0,
-            'errors': []
-        }
-        
-        try:
-            # Sync groups first
-            groups_result = gitlab_api.get_groups()
-            if groups_result['success']:
-                self.database.save_groups(groups_result['groups'])
-                sync_stats['groups_synced'] = len(groups_result['groups'])
-                logger.info(f"Saved {len(groups_result['groups'])} groups to database")
-                
-                # Sync projects for first 3 groups (limit for speed)
-                for group in groups_result['groups'][:3]:
-                    try:
-                        projects_result = gitlab_api.get_group_projects(group['id'])
-                        if projects_result['success']:
-                            self.database.save_projects(projects_result['projects'], group['id'])
-                            projects_count = len(projects_result['projects'])
-                            sync_stats['projects_synced'] += projects_count
-                            logger.info(f"Saved {projects_count} projects for group {group['name']}")
-                            
-                            # Sync pipelines and branches for first 2 projects per group
-                            for project in projects_result['projects'][:2]:
-                                try:
-                                    self._sync_project_data(gitlab_api, project, sync_stats)
-                                except Exception as e:
-                                    error_msg = f"Failed to sync data for project {project['id']}: {str(e)}"
-                                    logger.warning(error_msg)
-                                    sync_stats['errors'].append(error_msg)
-                                    
-                    except Exception as e:
-                        error_msg = f"Failed to sync projects for group {group['id']}: {str(e)}"
-                        logger.warning(error_msg)
-                        sync_stats['errors'].append(error_msg)
-                        
-        except Exception as e:
-            error_msg = f"Failed to sync groups: {str(e)}"
-            logger.error(error_msg)
-            sync_stats['errors'].append(error_msg)
-        
-        return sync_stats
+        if self.is_warming_up():
+            return False
+        self.warm_up_status = {'state': 'running', 'started_at': datetime.now().isoformat()}
+        self._warm_up_thread = threading.Thread(target=self._warm_up, name='warm-up-sync', daemon=True)
+        self._warm_up_thread.start()
+        return True
     
-    def _sync_project_data(self, gitlab_api: GitLabAPI, project: Dict[str, Any], 
-                          sync_stats: Dict[str, Any]):
-        """
-        Sync pipelines and branches for a single project
-        
-        Args:
-            gitlab_api: GitLab API instance
-            project: Project data
-            sync_stats: Statistics dictionary to update
-        """
-        project_id = project['id']
-        
-        # Sync pipelines
-        try:
-            pipelines_result = gitlab_api.get_project_pipelines(project_id)
-            if pipelines_result['success'] and pipelines_result['pipelines']:
-                self.database.save_pipelines(pipelines_result['pipelines'], project_id)
-                pipelines_count = len(pipelines_result['pipelines'])
-                sync_stats['pipelines_synced'] += pipelines_count
-                logger.info(f"Saved {pipelines_count} pipelines for project {project['name']}")
-        except Exception as e:
-            logger.warning(f"Failed to sync pipelines for project {project_id}: {str(e)}")
-        
-        # Sync branches
+    def is_warming_up(self) -> bool:
+        return self._warm_up_thread is not None and self._warm_up_thread.is_alive()
+    
+    def _warm_up(self):
         try:
-            branches_result = gitlab_api.get_project_branches(project_id)
-            if branches_result['success'] and branches_result['branches']:
-                self.database.save_branches(branches_result['branches'], project_id)
-                branches_count = len(branches_result['branches'])
-                sync_stats['branches_synced'] += branches_count
-                logger.info(f"Saved {branches_count} branches for project {project['name']}")
+            sync_results = asyncio.run(self.sync_service.full_sync(force=True))
+            self.warm_up_status = {
+                **self.warm_up_status,
+                'state': 'completed',
+                'finished_at': datetime.now().isoformat(),
+                'counts': {entity: results['success'] for entity, results in sync_results.items()}
+            }
+            logger.info(f"Warm-up sync completed: {self.warm_up_status['counts']}")
+        except SyncInProgressError as e:
+            logger.info(f"Warm-up sync skipped: {str(e)}")
+            self.warm_up_status = {
+                **self.warm_up_status,
+                'state': 'skipped',
+                'finished_at': datetime.now().isoformat(),
+                'error': str(e)
+            }
         except Exception as e:
-            logger.warning(f"Failed to sync branches for project {project_id}: {str(e)}")
+            logger.warning(f"Warm-up sync failed: {str(e)}")
+            self.warm_up_status = {
+                **self.warm_up_status,
+                'state': 'failed',
+                'finished_at': datetime.now().isoformat(),
+                'error': str(e)
+            }
     
     def setup_logging(self, log_level: str = 'INFO'):
         """Setup application logging"""
@@ -0,0 +1,144 @@
+"""
+Listing Refresher Utility
+Stale-while-revalidate for stored listings: serves them as they are and refreshes old ones in the background
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+class ListingRefresher:
+    """
+    Deduplicated background refreshes of listings older than their scope's freshness threshold
+
+    Every stored listing records when it was last confirmed against GitLab (refreshed_at in
+    data_versions, written by syncs, webhooks and these refreshes). A listing younger than its
+    threshold is fresh. An older one is still served, and a refresh of exactly that listing is
+    queued unless one is already running, so a burst of requests costs one GitLab fetch.
+    Refreshes go through GitLabSyncService and therefore respect the sync policy; a refreshed
+    listing is marked fresh even if it stored nothing, so empty groups do not refresh forever.
+    sync_service must be the refresher's own instance without an event broadcaster: each
+    refresh installs its API client on it, so refreshes run one at a time on a single thread
+    and never swap the client of a running sync or publish its progress.
+    A listing whose refresh or API fallback failed is not refreshed again for
+    failure_backoff_seconds, so a broken entity costs one GitLab call per backoff, not per view.
+    """
+
+    def __init__(self, database, sync_service, api_factory: Callable,
+                 max_age_seconds: Optional[Dict[str, float]] = None, failure_backoff_seconds: float = 30.0):
+        self.database = database
+        self.sync_service = sync_service
+        self.api_factory = api_factory
+        # scope -> seconds a listing stays fresh; scopes missing or set to 0 are never refreshed
+        self.max_age_seconds = {scope: age for scope, age in (max_age_seconds or {}).items() if age}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='listing-refresh')
+        self.failure_backoff_seconds = failure_backoff_seconds
+        self._in_flight = set()
+        # (scope, entity_id) -> time.monotonic() before which failed listings are not refreshed
+        self._backoff_until: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        self.stats = {'fresh': 0, 'stale': 0, 'deduplicated': 0, 'backed_off': 0, 'refreshed': 0, 'failed': 0}
+
+    def freshness(self, scope: str, entity_id: Optional[int], refreshed_at: Optional[float],
+                  now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Age of a served listing and whether it is stale, queueing its refresh if it is
+
+        Returns None for scopes without a threshold. A listing never confirmed since the data
+        was cleared has no age and is not refreshed here: if it is empty the request falls back
+        to GitLab, which confirms it, and otherwise the next sync does.
+        """
+        max_age = self.max_age_seconds.get(scope)
+        if not max_age or (scope == 'projects' and entity_id is None):
+            # All projects is every group's listing together: only a full sync refreshes it
+            return None
+        age = (now or time.time()) - refreshed_at if refreshed_at is not None else None
+        stale = age is not None and age > max_age
+        with self._lock:
+            self.stats['stale' if stale else 'fresh'] += 1
+        if stale:
+            self.request(scope, entity_id)
+        return {'age': None if age is None else max(int(age), 0), 'stale': stale}
+
+    def request(self, scope: str, entity_id: Optional[int] = None) -> bool:
+        """Queue a refresh of one listing; False if it is already being refreshed or backing off"""
+        key = (scope, entity_id)
+        with self._lock:
+            if key in self._in_flight:
+                self.stats['deduplicated'] += 1
+                return False
+            if self._backoff_until.get(key, 0) > time.monotonic():
+                self.stats['backed_off'] += 1
+                return False
+            self._backoff_until.pop(key, None)
+            self._in_flight.add(key)
+        try:
+            self._executor.submit(self._run, scope, entity_id)
+        except RuntimeError:
+            # Executor shut down at exit
+            with self._lock:
+                self._in_flight.discard(key)
+            return False
+        return True
+
+    def _run(self, scope: str, entity_id: Optional[int]):
+        try:
+            if self.refresh(scope, entity_id):
+                with self._lock:
+                    self.stats['refreshed'] += 1
+        except Exception as e:
+            logger.warning(f"Refreshing {scope} of {entity_id} failed: {str(e)}")
+            self.record_failure(scope, entity_id)
+            with self._lock:
+                self.stats['failed'] += 1
+        finally:
+            with self._lock:
+                self._in_flight.discard((scope, entity_id))
+
+    def record_failure(self, scope: str, entity_id: Optional[int] = None):
+        """Hold off refreshing a listing GitLab just failed to return"""
+        if not self.failure_backoff_seconds:
+            return
+        with self._lock:
+            now = time.monotonic()
+            # Drop expired entries so broken entities do not accumulate
+            self._backoff_until = {key: until for key, until in self._backoff_until.items() if until > now}
+            self._backoff_until[(scope, entity_id)] = now + self.failure_backoff_seconds
+
+    def refresh(self, scope: str, entity_id: Optional[int] = None) -> bool:
+        """Fetch one listing from GitLab and store it; False if GitLab is not configured"""
+        gitlab_api = self.api_factory()
+        if not gitlab_api:
+            return False
+        self.sync_service.set_gitlab_api(gitlab_api)
+        sync_results = self.sync_service.new_sync_results(scope)
+        if scope == 'pipelines':
+            self.sync_service.sync_project_pipelines(entity_id, sync_results)
+        elif scope == 'branches':
+            self.sync_service.sync_project_branches(entity_id, sync_results)
+        elif scope == 'projects':
+            if entity_id is None:
+                return False
+            self.sync_service.sync_group_projects(entity_id, sync_results)
+        elif scope == 'groups':
+            if entity_id is None:
+                self.sync_service.sync_top_level_groups(sync_results)
+            else:
+                self.sync_service.sync_group_hierarchy(entity_id, sync_results)
+        else:
+            raise ValueError(f"Unknown listing scope: {scope}")
+        self.database.mark_refreshed(scope, entity_id)
+        return True
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'max_age_seconds': dict(self.max_age_seconds),
+                'failure_backoff_seconds': self.failure_backoff_seconds,
+                'in_flight': len(self._in_flight),
+                'backing_off': sum(1 for until in self._backoff_until.values() if until > time.monotonic()),
+                **self.stats
+            }
@@ -0,0 +1,187 @@
+"""
+Pipeline Tracker Utility
+Polls only the pipelines that are still running, backing off the longer each one runs
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+class PipelineTracker:
+    """
+    Keeps non-terminal pipelines from the pipelines table up to date
+
+    The tracked set is reloaded from the database on every tick, so pipelines picked up by a
+    sync or a webhook join it and pipelines finished elsewhere leave it. Each pipeline is
+    polled again after backoff_ratio times its age, clamped to [min_backoff, max_backoff]:
+    a pipeline created a minute ago is checked every 10s, one running for an hour every 5 minutes.
+    Updated rows are written in place; pipelines reaching a terminal status are dropped.
+    Pipelines waiting on a manual job only move when someone acts, so they are polled every
+    max_backoff regardless of age.
+    """
+
+    ACTIVE_STATUSES = ('created', 'waiting_for_resource', 'preparing', 'pending', 'running', 'scheduled')
+    WAITING_STATUSES = ('manual',)
+    TRACKED_STATUSES = ACTIVE_STATUSES + WAITING_STATUSES
+
+    def __init__(self, database, api_factory: Callable, events=None, interval: float = 5.0,
+                 min_backoff: float = 10.0, max_backoff: float = 300.0, backoff_ratio: float = 0.1,
+                 batch_size: int = 20, cache=None):
+        self.database = database
+        self.api_factory = api_factory
+        # Optional ImmutableCache; details of pipelines seen finishing are stored there
+        self.cache = cache
+        # Optional SyncEventBroadcaster receiving a 'pipeline' event per status change
+        self.events = events
+        self.interval = interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.backoff_ratio = backoff_ratio
+        self.batch_size = batch_size
+        # pipeline id -> {'project_id', 'status', 'since', 'next_poll', 'polls'}
+        self._tracked: Dict[int, Dict[str, Any]] = {}
+        self._thread = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self.stats = {'polls': 0, 'updated': 0, 'finished': 0, 'failed': 0}
+
+    def start(self) -> bool:
+        """Track pipelines on a background thread; False if already running"""
+        if self._thread and self._thread.is_alive():
+            return False
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='pipeline-tracker', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.time()
+            next_poll = min((entry['next_poll'] for entry in self._tracked.values()
+                             if entry['next_poll'] != float('inf')), default=None)
+            return {
+                'running': bool(self._thread and self._thread.is_alive()),
+                'tracked': len(self._tracked),
+                'next_poll_in_seconds': round(max(next_poll - now, 0), 1) if next_poll else None,
+                **self.stats
+            }
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.warning(f"Pipeline tracker poll failed: {str(e)}")
+            self._stopped.wait(self.interval)
+
+    def poll_once(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """Reload the tracked set and poll the pipelines whose backoff has expired"""
+        with self._lock:
+            now = now or time.time()
+            self._reload(now)
+            due = sorted((entry['next_poll'], pipeline_id) for pipeline_id, entry in self._tracked.items()
+                         if entry['next_poll'] <= now)[:self.batch_size]
+            if not due:
+                return {'tracked': len(self._tracked), 'polled': 0}
+            gitlab_api = self.api_factory()
+            if not gitlab_api:
+                return {'tracked': len(self._tracked), 'polled': 0}
+
+            updates = []
+            finished = []
+            for _, pipeline_id in due:
+                entry = self._tracked[pipeline_id]
+                pipeline = self._fetch(gitlab_api, entry['project_id'], pipeline_id)
+                entry['polls'] += 1
+                if pipeline is None:
+                    if entry['next_poll'] <= now:
+                        entry['next_poll'] = now + self._poll_delay(entry, now)
+                    continue
+                updates.append((entry['project_id'], pipeline))
+                if pipeline.get('status') != entry['status']:
+                    self._emit_change(entry, pipeline)
+                    entry['status'] = pipeline.get('status')
+                if entry['status'] not in self.TRACKED_STATUSES:
+                    finished.append(pipeline_id)
+                    if self.cache:
+                        self.cache.store_pipeline(pipeline)
+                else:
+                    entry['next_poll'] = now + self._poll_delay(entry, now)
+
+            counts = self.database.update_pipelines(updates) if updates else {'changed': 0}
+            for pipeline_id in finished:
+                self._tracked.pop(pipeline_id, None)
+            self.stats['polls'] += len(due)
+            self.stats['updated'] += counts['changed']
+            self.stats['finished'] += len(finished)
+            return {
+                'tracked': len(self._tracked),
+                'polled': len(due),
+                'updated': counts['changed'],
+                'finished': finished
+            }
+
+    def backoff(self, age: float) -> float:
+        """Seconds until the next poll of a pipeline that has existed for age seconds"""
+        return min(self.max_backoff, max(self.min_backoff, age * self.backoff_ratio))
+
+    def _poll_delay(self, entry: Dict[str, Any], now: float) -> float:
+        if entry['status'] in self.WAITING_STATUSES:
+            return self.max_backoff
+        return self.backoff(now - entry['since'])
+
+    def _reload(self, now: float):
+        active = {row['id']: row for row in self.database.get_pipelines_by_status(self.TRACKED_STATUSES)}
+        for pipeline_id in set(self._tracked) - set(active):
+            # Finished according to a sync or webhook, or removed
+            del self._tracked[pipeline_id]
+        for pipeline_id, row in active.items():
+            if pipeline_id in self._tracked:
+                continue
+            entry = {
+                'project_id': row['project_id'],
+                'status': row['status'],
+                'ref': row.get('ref'),
+                'since': self._timestamp(row.get('started_at') or row.get('created_at'), now),
+                'polls': 0
+            }
+            entry['next_poll'] = now + self._poll_delay(entry, now)
+            self._tracked[pipeline_id] = entry
+
+    def _fetch(self, gitlab_api, project_id: int, pipeline_id: int) -> Optional[Dict[str, Any]]:
+        result = gitlab_api.get_pipeline_details(project_id, pipeline_id)
+        if result['success']:
+            return result['pipeline']
+        self.stats['failed'] += 1
+        if 'not found' in (result.get('error') or '').lower():
+            # Deleted in GitLab: stop tracking until a sync removes the row
+            logger.info(f"Pipeline {pipeline_id} of project {project_id} no longer exists")
+            self._tracked[pipeline_id]['next_poll'] = float('inf')
+        return None
+
+    def _emit_change(self, entry: Dict[str, Any], pipeline: Dict[str, Any]):
+        if self.events:
+            self.events.publish('pipeline', {
+                'project_id': entry['project_id'],
+                'pipeline_id': pipeline['id'],
+                'ref': pipeline.get('ref', entry.get('ref')),
+                'previous_status': entry['status'],
+                'status': pipeline.get('status')
+            })
+
+    @staticmethod
+    def _timestamp(value: Optional[str], default: float) -> float:
+        if not value:
+            return default
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            return default
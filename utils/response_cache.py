@@ -0,0 +1,264 @@
+"""
+Response Cache Utility
+Bounded LRU/TTL cache of serialized JSON responses, validated against database data versions
+"""
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from flask import Response
+
+logger = logging.getLogger(__name__)
+
+class SharedResponseStore:
+    """
+    Response bodies in an SQLite file shared by every worker process on the host
+
+    Entries are stored with the version stamp they were built from and only returned for that
+    same stamp, so they need no invalidation messages: a write bumps the version in the main
+    database and every worker stops matching the old entries. The store is a cache, so writes
+    are not fsynced and any SQLite error is treated as a miss.
+    """
+
+    PRUNE_EVERY = 64
+
+    def __init__(self, path: str, max_entries: int = 8192, timeout: float = 1.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.stats = {'errors': 0}
+        try:
+            with sqlite3.connect(self.path, timeout=self.timeout) as conn:
+                conn.execute('PRAGMA journal_mode = WAL')
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS responses (
+                        cache_key TEXT PRIMARY KEY,
+                        version TEXT NOT NULL,
+                        expires_at REAL NOT NULL,
+                        stored_at REAL NOT NULL,
+                        body BLOB NOT NULL
+                    )
+                ''')
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Shared response cache {self.path} unavailable: {str(e)}")
+            with self._lock:
+                self.stats['errors'] += 1
+
+    def get(self, key: str, version: str) -> Optional[bytes]:
+        """The stored body for a key if it was built from this version and has not expired"""
+        try:
+            with sqlite3.connect(self.path, timeout=self.timeout) as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT version, expires_at, body FROM responses WHERE cache_key = ?', (key,))
+                row = cursor.fetchone()
+        except sqlite3.Error as e:
+            logger.debug(f"Shared response cache read failed: {str(e)}")
+            with self._lock:
+                self.stats['errors'] += 1
+            return None
+        if row is None or row[0] != version or row[1] < time.time():
+            return None
+        return row[2]
+
+    def put(self, key: str, version: str, body: bytes, ttl_seconds: float):
+        now = time.time()
+        try:
+            with sqlite3.connect(self.path, timeout=self.timeout) as conn:
+                conn.execute('PRAGMA synchronous = OFF')
+                conn.execute('''
+                    INSERT OR REPLACE INTO responses (cache_key, version, expires_at, stored_at, body)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (key, version, now + ttl_seconds, now, body))
+                with self._lock:
+                    self._puts += 1
+                    prune = self._puts % self.PRUNE_EVERY == 0
+                if prune:
+                    conn.execute('DELETE FROM responses WHERE expires_at < ?', (now,))
+                    conn.execute('''
+                        DELETE FROM responses WHERE cache_key IN
+                        (SELECT cache_key FROM responses ORDER BY stored_at DESC LIMIT -1 OFFSET ?)
+                    ''', (self.max_entries,))
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.debug(f"Shared response cache write failed: {str(e)}")
+            with self._lock:
+                self.stats['errors'] += 1
+
+    def clear(self):
+        try:
+            with sqlite3.connect(self.path, timeout=self.timeout) as conn:
+                conn.execute('DELETE FROM responses')
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.debug(f"Shared response cache clear failed: {str(e)}")
+
+    def get_status(self) -> Dict[str, Any]:
+        try:
+            with sqlite3.connect(self.path, timeout=self.timeout) as conn:
+                entries = conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        with self._lock:
+            stats = dict(self.stats)
+        return {'path': self.path, 'entries': entries, 'max_entries': self.max_entries, **stats}
+
+class ResponseCache:
+    """
+    Cache of response bodies keyed by request, each stored with the data version it was built from
+
+    An entry is only served while the version of its listing is unchanged. Versions are kept in
+    the database, so a write by any process (web worker or sync worker) invalidates exactly the
+    groups or projects it touched in every process. Lookups go to an in-process LRU first and then
+    to the optional SharedResponseStore, so a response built by one worker is reused by the others.
+    The TTL only bounds staleness for writes that bypass GitLabDatabase. Compressed variants
+    of a body are stored as entries of their own, keyed by the body's key plus the encoding.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300.0,
+                 shared: Optional[SharedResponseStore] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        # key -> (version, expires_at, body)
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'stale': 0, 'expired': 0, 'evictions': 0}
+
+    @staticmethod
+    def _shared_key(key: tuple) -> str:
+        return ':'.join('' if part is None else str(part) for part in key)
+
+    @staticmethod
+    def _shared_version(version: tuple) -> str:
+        return '.'.join(str(part) for part in version)
+
+    def get(self, key: tuple, version: tuple) -> Optional[Response]:
+        """A fresh response for the key if the cached body was built from this version"""
+        body = self.get_body(key, version)
+        return Response(body, status=200, mimetype='application/json') if body is not None else None
+    
+    def get_body(self, key: tuple, version: tuple) -> Optional[bytes]:
+        """The cached body for the key if it was built from this version"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                cached_version, expires_at, body = entry
+                if cached_version == version and expires_at >= time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return body
+                del self._entries[key]
+                self.stats['stale' if cached_version != version else 'expired'] += 1
+        body = self.shared.get(self._shared_key(key), self._shared_version(version)) if self.shared else None
+        with self._lock:
+            if body is None:
+                self.stats['misses'] += 1
+                return None
+            self.stats['shared_hits'] += 1
+            self._remember(key, version, body)
+        return body
+
+    def put(self, key: tuple, version: tuple, response: Response):
+        """Remember the body of a successful response"""
+        if response.status_code != 200:
+            return
+        self.put_body(key, version, response.get_data())
+    
+    def put_body(self, key: tuple, version: tuple, body: bytes):
+        """Remember a complete serialized 200 response body"""
+        with self._lock:
+            self._remember(key, version, body)
+        if self.shared:
+            self.shared.put(self._shared_key(key), self._shared_version(version), body, self.ttl_seconds)
+
+    def _remember(self, key: tuple, version: tuple, body: bytes):
+        self._entries[key] = (version, time.monotonic() + self.ttl_seconds, body)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.shared:
+            self.shared.clear()
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['shared_hits'] + self.stats['misses']
+            hits = self.stats['hits'] + self.stats['shared_hits']
+            status = {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hit_rate': round(hits / lookups, 3) if lookups else None,
+                **self.stats
+            }
+        if self.shared:
+            status['shared'] = self.shared.get_status()
+        return status
+
+class NegativeCache:
+    """
+    Short-lived memory of listings GitLab answered with nothing or with an error
+
+    Kept apart from ResponseCache so these answers have their own, shorter TTLs: a group without
+    subgroups is remembered as empty for empty_ttl_seconds, a failing entity as broken for
+    error_ttl_seconds, and until then its views cost no API call. Like positive entries, each
+    one holds the data version of its listing and is dropped as soon as a write changes it.
+    A TTL of 0 turns caching of that kind off.
+    """
+
+    EMPTY = 'empty'
+    ERROR = 'error'
+
+    def __init__(self, empty_ttl_seconds: float = 120.0, error_ttl_seconds: float = 30.0,
+                 max_entries: int = 4096):
+        self.ttl_seconds = {self.EMPTY: empty_ttl_seconds, self.ERROR: error_ttl_seconds}
+        self.max_entries = max_entries
+        # key -> (kind, version, expires_at)
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'empty_hits': 0, 'error_hits': 0, 'misses': 0, 'stored': 0}
+
+    def get(self, key: tuple, version: tuple) -> Optional[str]:
+        """EMPTY or ERROR if the listing got that answer at this version and it has not expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] != version or entry[2] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.stats['misses'] += 1
+                return None
+            self.stats[f'{entry[0]}_hits'] += 1
+            return entry[0]
+
+    def put(self, key: tuple, version: tuple, kind: str):
+        ttl_seconds = self.ttl_seconds[kind]
+        if not ttl_seconds:
+            return
+        with self._lock:
+            self._entries[key] = (kind, version, time.monotonic() + ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.stats['stored'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'empty_ttl_seconds': self.ttl_seconds[self.EMPTY],
+                'error_ttl_seconds': self.ttl_seconds[self.ERROR],
+                **self.stats
+            }
@@ -2,22 +2,231 @@
 Response Utilities
 Handles API response formatting and data processing
 """
+import hashlib
+import itertools
 import logging
+import math
+import re
 from typing import Dict, Any, List, Optional, Union
+from flask import Response, request
 from utils.data_transformer import DataTransformer
-from utils.error_handler import ErrorHandler
+from utils.error_handler import ErrorHandler, ValidationError
+from utils.response_cache import NegativeCache
 
 logger = logging.getLogger(__name__)
 
+FIELD_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
 class ResponseHelper:
     """Utility for handling API responses and data processing"""
     
-    def __init__(self, database, gitlab_api_factory):
+    # Query parameters of list endpoints; results are only paginated when page or per_page is given
+    LIST_PARAMETERS = ('page', 'per_page', 'sort', 'fields')
+    DEFAULT_PER_PAGE = 20
+    MAX_PER_PAGE = 100
+    # Most groups one composite group view request may name
+    MAX_GROUP_VIEWS = 100
+    
+    def __init__(self, database, gitlab_api_factory, access_tracker=None, response_cache=None,
+                 refresher=None, write_through=None, negative_cache=None, compressor=None):
         self.database = database
         self.gitlab_api_factory = gitlab_api_factory
+        self.access_tracker = access_tracker
+        # Optional ResponseCache for responses served from the database
+        self.response_cache = response_cache
+        # Optional ListingRefresher; stale listings are served and refreshed in the background
+        self.refresher = refresher
+        # Optional WriteThroughQueue saving API fallback results off the request thread
+        self.write_through = write_through
+        # Optional NegativeCache of listings GitLab answered with nothing or an error
+        self.negative_cache = negative_cache
+        # Optional ResponseCompressor; cached bodies are compressed once per data version
+        self.compressor = compressor
+    
+    def record_access(self, entity_type: str, entity_id: int):
+        """Count a view of a project or group towards its sync priority"""
+        if self.access_tracker:
+            self.access_tracker.record(entity_type, entity_id)
+    
+    @staticmethod
+    def entity_tag(cache_scope: tuple, version: tuple, variant: Optional[str] = None) -> str:
+        """
+        Strong ETag of a database response: the listing, the data version it was built from and
+        a digest of the list options (page, sort, fields), so each variant revalidates on its own
+        """
+        scope, entity_id = cache_scope
+        etag = f"{scope}-{'' if entity_id is None else entity_id}-{version[0]}-{version[1]}"
+        if variant:
+            etag += f"-{hashlib.sha1(variant.encode('utf-8')).hexdigest()[:16]}"
+        return etag
+    
+    @staticmethod
+    def _tagged(response: Response, etag: str, freshness: Optional[Dict[str, Any]] = None) -> Response:
+        # no-cache: browsers keep the body but revalidate it with If-None-Match on every fetch
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        if freshness:
+            # Headers rather than body keys, so cached bodies and their ETags stay valid as data ages
+            response.headers['X-Data-Stale'] = 'true' if freshness['stale'] else 'false'
+            if freshness['age'] is not None:
+                response.headers['X-Data-Age'] = str(freshness['age'])
+        return response
+    
+    def list_options(self) -> Optional[Dict[str, Any]]:
+        """
+        page, per_page, sort and fields of the current list request, None if none were given
+        
+        page and per_page are None unless the request asked for a page. sort is a listing sort
+        key, '-' prefixed for descending; fields is a list of top-level keys to return.
+        Raises ValidationError for malformed values.
+        """
+        args = request.args
+        if not any(args.get(name) for name in self.LIST_PARAMETERS):
+            return None
+        paginated = bool(args.get('page') or args.get('per_page'))
+        try:
+            page = int(args.get('page') or 1)
+            per_page = int(args.get('per_page') or self.DEFAULT_PER_PAGE)
+        except ValueError:
+            raise ValidationError('page and per_page must be integers')
+        if page < 1 or not 1 <= per_page <= self.MAX_PER_PAGE:
+            raise ValidationError(f'page must be at least 1 and per_page between 1 and {self.MAX_PER_PAGE}')
+        fields = [field.strip() for field in (args.get('fields') or '').split(',') if field.strip()]
+        invalid = [field for field in fields if not FIELD_NAME.match(field)]
+        if invalid:
+            raise ValidationError(f"Invalid field names: {', '.join(invalid)}")
+        return {
+            'page': page if paginated else None,
+            'per_page': per_page if paginated else None,
+            'sort': args.get('sort') or None,
+            'fields': fields or None
+        }
+    
+    @staticmethod
+    def _options_key(options: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Canonical form of list options, added to the response cache key"""
+        if not options:
+            return None
+        return '&'.join(f"{name}={','.join(value) if isinstance(value, list) else value}"
+                        for name, value in sorted(options.items()) if value is not None)
+    
+    @staticmethod
+    def pagination(options: Dict[str, Any], total: int) -> Dict[str, Any]:
+        """Pagination metadata of a page of a listing with total rows"""
+        page, per_page = options['page'], options['per_page']
+        total_pages = max(math.ceil(total / per_page), 1)
+        return {
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'total_pages': total_pages,
+            'next_page': page + 1 if page < total_pages else None,
+            'prev_page': page - 1 if page > 1 else None
+        }
+    
+    def _check_cached(self, cache_scope: tuple, variant: Optional[str] = None) -> tuple:
+        """
+        (version, etag, freshness, response) for a listing; response is a 304 or cache hit, else None
+        
+        freshness is the age and staleness reported by the refresher, which queues a background
+        refresh of a stale listing; None without a refresher or threshold for the scope.
+        """
+        # Read the version before querying, so a concurrent write leaves the entry stale
+        status = self.database.listing_status(*cache_scope)
+        version = status['version']
+        etag = self.entity_tag(cache_scope, version, variant)
+        freshness = self.refresher.freshness(*cache_scope, status['refreshed_at']) if self.refresher else None
+        matched = self.compressor.requested_variant(etag) if self.compressor else (
+            etag if request.if_none_match.contains(etag) else None)
+        if matched:
+            return version, etag, freshness, self._tagged(Response(status=304), matched, freshness)
+        cache_key = cache_scope + (variant,) if variant else cache_scope
+        cached = self.response_cache.get(cache_key, version) if self.response_cache else None
+        if cached is None:
+            return version, etag, freshness, None
+        return version, etag, freshness, self._compressed(self._tagged(cached, etag, freshness), cache_key, version)
+    
+    def _compressed(self, response: Response, cache_key: tuple, version: tuple) -> Response:
+        """Encode a cached body for the client, reusing the compressed variant cached for this version"""
+        if not self.compressor:
+            return response
+        body = response.get_data()
+        encoding = self.compressor.negotiate(body)
+        if not encoding:
+            return response
+        encoded = self.response_cache.get_body(cache_key + (encoding,), version)
+        if encoded is None:
+            encoded = self.compressor.compress(body, encoding, best=True)
+            self.response_cache.put_body(cache_key + (encoding,), version, encoded)
+        return self.compressor.encoded(response, encoded, encoding)
+    
+    def _cache_streamed(self, body, cache_key: tuple, version: tuple):
+        """Pass a streamed body through, caching it once it has been produced completely"""
+        parts = []
+        for chunk in body:
+            parts.append(chunk)
+            yield chunk
+        self.response_cache.put_body(cache_key, version, b''.join(parts))
+    
+    def get_listing(self, listing: str, entity_id, list_key: str, basic_builder,
+                    api_method, transform_method, api_save_method=None, cache_scope: tuple = None,
+                    extra: Optional[Dict[str, Any]] = None, count_key: Optional[str] = None):
+        """
+        Serve a groups, projects, pipelines or search listing straight from the stored JSON payloads
+        
+        Behaves like get_with_fallback, but rows are streamed from the database and their
+        gitlab_data is spliced into the response without being decoded and re-encoded.
+        page/per_page, sort and fields (see list_options) run as SQL in GitLabDatabase.iter_listing;
+        a page adds pagination metadata. extra adds top-level keys and count_key reports the
+        total number of rows under that key. An empty listing falls back to the API through
+        get_with_fallback, or is returned as is when there is no api_method.
+        """
+        try:
+            options = self.list_options() or {}
+            variant = self._options_key(options)
+            if cache_scope:
+                version, etag, freshness, early_response = self._check_cached(cache_scope, variant)
+                if early_response is not None:
+                    return early_response
+            
+            extra = dict(extra or {})
+            limit, offset = None, 0
+            if options.get('page') or count_key:
+                total = self.database.count_listing(listing, entity_id)
+                if total == 0 and api_method:
+                    return self.get_with_fallback(lambda: [], api_method, transform_method, api_save_method,
+                                                  write_key=cache_scope)
+                if count_key:
+                    extra[count_key] = total
+                if options.get('page'):
+                    extra['pagination'] = self.pagination(options, total)
+                    limit, offset = options['per_page'], (options['page'] - 1) * options['per_page']
+            
+            rows = self.database.iter_listing(listing, entity_id, options.get('sort'), options.get('fields'),
+                                              limit, offset)
+            first = next(rows, None)
+            if first is None and api_method and 'pagination' not in extra:
+                return self.get_with_fallback(lambda: [], api_method, transform_method, api_save_method,
+                                              write_key=cache_scope)
+            
+            body = DataTransformer.stream_json_listing(
+                list_key, itertools.chain([first], rows) if first is not None else [], basic_builder,
+                fields=options.get('fields'), extra=extra
+            )
+            if cache_scope and self.response_cache:
+                body = self._cache_streamed(body, cache_scope + (variant,) if variant else cache_scope, version)
+            response = Response(body, status=200, mimetype='application/json')
+            return self._tagged(response, etag, freshness) if cache_scope else response
+        
+        except (ValidationError, ValueError) as e:
+            return ErrorHandler.create_error_response(str(e), 400, 'validation_error')
+        except Exception as e:
+            logger.error(f"Error in get_listing: {str(e)}")
+            return ErrorHandler.create_error_response(str(e))
     
     def get_with_fallback(self, db_method, api_method, transform_method, 
-                         api_save_method=None, *args, **kwargs):
+                         api_save_method=None, *args, cache_scope: Optional[tuple] = None,
+                         cache_variant: Optional[str] = None, write_key: Optional[tuple] = None, **kwargs):
         """
         Generic method to get data from database with API fallback
         
@@ -25,19 +234,48 @@ class ResponseHelper:
             db_method: Database method to call
             api_method: API method to call as fallback
             transform_method: Method to transform database data
-            api_save_method: Optional method to save API data to database
+            api_save_method: Optional method to save API data to database, called with the data
+                             and *args, **kwargs; runs on the write-through queue when one is set
+            cache_scope: Optional (scope, entity_id) data version the database response depends on;
+                         it tags the response with an ETag, answers a matching If-None-Match
+                         with 304 and caches the serialized response until the version changes.
+                         With a refresher, X-Data-Age/X-Data-Stale report how long ago the
+                         listing was confirmed against GitLab and stale ones are refreshed
+            cache_variant: Optional string telling apart responses of the same scope, e.g. pages
+            write_key: Optional listing the API data fills, to coalesce its writes and remember
+                       empty or failed answers in the negative cache; defaults to cache_scope
             *args, **kwargs: Arguments to pass to methods
         """
         try:
+            if cache_scope:
+                version, etag, freshness, early_response = self._check_cached(cache_scope, cache_variant)
+                if early_response is not None:
+                    return early_response
+            
             # Try database first
             db_data = db_method(*args, **kwargs)
             
             if db_data:
                 formatted_data = transform_method(db_data)
-                return ErrorHandler.create_success_response(
+                response = ErrorHandler.create_success_response(
                     formatted_data, 
                     source='database'
                 )
+                if cache_scope:
+                    self._tagged(response, etag, freshness)
+                    if self.response_cache:
+                        cache_key = cache_scope + (cache_variant,) if cache_variant else cache_scope
+                        self.response_cache.put(cache_key, version, response)
+                        response = self._compressed(response, cache_key, version)
+                return response
+            
+            # Known empty or failing in GitLab: answer as GitLab did without asking again
+            listing_key = write_key or cache_scope
+            if listing_key and self.negative_cache:
+                listing_version = version if listing_key == cache_scope else self.database.data_version(*listing_key)
+                known = self.negative_cache.get(listing_key, listing_version)
+                if known:
+                    return self._negative_response(known, transform_method, cached=True)
             
             # If no data in database, try API
             gitlab_api = self.gitlab_api_factory()
@@ -64,78 +302,194 @@ class ResponseHelper:
                     api_data = api_result['branches'] or []
                 
                 # Save to database if successful and save method provided
-                # Temporarily disabled to fix lambda argument errors
-                # if api_save_method and api_data:
-                #     try:
-                #         api_save_method(api_data)
-                #     except Exception as save_error:
-                #         logger.warning(f"Failed to save API data to database: {str(save_error)}")
+                if api_save_method and api_data:
+                    self._save_api_data(listing_key, api_save_method, api_data, *args, **kwargs)
+                if listing_key:
+                    # Just confirmed against GitLab, so the refresher does not fetch it again
+                    self.database.mark_refreshed(*listing_key)
+                if not api_data and listing_key and self.negative_cache:
+                    self.negative_cache.put(listing_key, listing_version, NegativeCache.EMPTY)
                 
                 return ErrorHandler.create_success_response(
                     transform_method(api_data),
                     source='api_live'
                 )
             else:
-                return ErrorHandler.create_success_response(
-                    {},
-                    source='api_error'
-                )
+                if listing_key and self.negative_cache:
+                    self.negative_cache.put(listing_key, listing_version, NegativeCache.ERROR)
+                if listing_key and self.refresher:
+                    # GitLab just failed for this listing: no background refresh while that is remembered
+                    self.refresher.record_failure(*listing_key)
+                return self._negative_response(NegativeCache.ERROR, transform_method)
             
+        except ValidationError as e:
+            return ErrorHandler.create_error_response(str(e), 400, 'validation_error')
         except Exception as e:
             logger.error(f"Error in get_with_fallback: {str(e)}")
             return ErrorHandler.create_error_response(str(e))
     
+    @staticmethod
+    def _negative_response(kind: str, transform_method, **kwargs):
+        """The response to an empty or failed GitLab answer; cached=True when served from memory"""
+        if kind == NegativeCache.EMPTY:
+            return ErrorHandler.create_success_response(transform_method([]), source='api_live', **kwargs)
+        return ErrorHandler.create_success_response({}, source='api_error', **kwargs)
+    
+    def _save_api_data(self, key: Optional[tuple], api_save_method, api_data, *args, **kwargs):
+        """Write API fallback data through to the database, in the background when a queue is set"""
+        if self.write_through:
+            self.write_through.put(key, api_save_method, api_data, *args, **kwargs)
+            return
+        try:
+            api_save_method(api_data, *args, **kwargs)
+        except Exception as save_error:
+            logger.warning(f"Failed to save API data to database: {str(save_error)}")
+    
     def handle_groups_request(self):
         """Handle groups API request with database fallback"""
-        return self.get_with_fallback(
-            self.database.get_groups,
+        return self.get_listing(
+            'groups', None, 'groups', DataTransformer._create_basic_group,
             lambda api: api.get_groups(),
             lambda data: {'groups': DataTransformer.format_groups_from_db(data)},
-            lambda data, *args, **kwargs: self.database.save_groups(data)
+            lambda data, *args, **kwargs: self.database.save_groups(data),
+            cache_scope=('groups', None)
         )
     
     def handle_subgroups_request(self, group_id: int):
         """Handle subgroups API request with database fallback"""
-        return self.get_with_fallback(
-            self.database.get_subgroups,
+        self.record_access('group', group_id)
+        return self.get_listing(
+            'groups', group_id, 'subgroups', DataTransformer._create_basic_group,
             lambda api, *args, **kwargs: api.get_subgroups(group_id),
             lambda data: {'subgroups': DataTransformer.format_groups_from_db(data or [])},
-            None,
-            group_id
+            lambda data, *args, **kwargs: self.database.save_groups(data),
+            cache_scope=('groups', group_id)
         )
     
     def handle_projects_request(self, group_id: int):
         """Handle projects API request with database fallback"""
-        return self.get_with_fallback(
-            self.database.get_projects,
+        self.record_access('group', group_id)
+        return self.get_listing(
+            'projects', group_id, 'projects', DataTransformer._create_basic_project,
             lambda api, *args, **kwargs: api.get_group_projects(group_id),
             lambda data: {'projects': DataTransformer.format_projects_from_db(data)},
             lambda data, *args, **kwargs: self.database.save_projects(data, group_id),
-            group_id
+            cache_scope=('projects', group_id or None)
+        )
+    
+    def group_view_ids(self) -> List[int]:
+        """Group ids of a composite view request (?ids=1,2,3); raises ValidationError if malformed"""
+        try:
+            group_ids = [int(value) for value in (request.args.get('ids') or '').split(',') if value.strip()]
+        except ValueError:
+            raise ValidationError('ids must be a comma-separated list of group ids')
+        if not 1 <= len(group_ids) <= self.MAX_GROUP_VIEWS:
+            raise ValidationError(f'ids must name between 1 and {self.MAX_GROUP_VIEWS} groups')
+        return list(dict.fromkeys(group_ids))
+    
+    def handle_group_views_request(self, group_id: Optional[int] = None):
+        """
+        Subgroups, direct projects and counts of one or more groups, read from the database at once
+        
+        Replaces a /subgroups and a /projects request per group. Ids not in the database are
+        listed under 'missing', for the client to load through the per-listing endpoints,
+        which fall back to the API.
+        """
+        try:
+            group_ids = [group_id] if group_id is not None else self.group_view_ids()
+        except ValidationError as e:
+            return ErrorHandler.create_error_response(str(e), 400, 'validation_error')
+        for view_group_id in group_ids:
+            self.record_access('group', view_group_id)
+        views = self.database.get_group_views(group_ids)
+        groups = []
+        for view_group_id in group_ids:
+            view = views.get(view_group_id)
+            if view is None:
+                continue
+            groups.append({
+                'group': DataTransformer.format_groups_from_db([view['group']])[0],
+                'subgroups': DataTransformer.format_groups_from_db(view['subgroups']),
+                'projects': DataTransformer.format_projects_from_db(view['projects']),
+                'counts': {
+                    'subgroups': len(view['subgroups']),
+                    'projects': len(view['projects']),
+                    'total_projects': view['total_projects']
+                }
+            })
+        return ErrorHandler.create_success_response(
+            {'groups': groups, 'missing': [view_group_id for view_group_id in group_ids if view_group_id not in views]},
+            source='database'
         )
     
     def handle_pipelines_request(self, project_id: int):
         """Handle pipelines API request with database fallback"""
-        return self.get_with_fallback(
-            self.database.get_pipelines,
+        self.record_access('project', project_id)
+        return self.get_listing(
+            'pipelines', project_id, 'pipelines', DataTransformer._create_basic_pipeline,
             lambda api, *args, **kwargs: api.get_project_pipelines(project_id),
             lambda data: {'pipelines': DataTransformer.format_pipelines_from_db(data)},
             lambda data, *args, **kwargs: self.database.save_pipelines(data, project_id),
-            project_id
+            cache_scope=('pipelines', project_id)
         )
     
     def handle_branches_request(self, project_id: int):
         """Handle branches API request with database fallback"""
+        self.record_access('project', project_id)
+        try:
+            options = self.list_options()
+        except ValidationError as e:
+            return ErrorHandler.create_error_response(str(e), 400, 'validation_error')
+        if not options:
+            return self.get_with_fallback(
+                self.database.get_branches,
+                lambda api, *args, **kwargs: api.get_project_branches(project_id),
+                lambda data: {'branches': DataTransformer.format_branches_from_db(data)},
+                lambda data, *args, **kwargs: self.database.save_branches(data, project_id),
+                project_id,
+                cache_scope=('branches', project_id)
+            )
         return self.get_with_fallback(
-            self.database.get_branches,
+            lambda: self._get_branches_page(project_id, options),
             lambda api, *args, **kwargs: api.get_project_branches(project_id),
-            lambda data: {'branches': DataTransformer.format_branches_from_db(data)},
+            lambda data: data if isinstance(data, dict) else {'branches': DataTransformer.format_branches_from_db(data)},
             lambda data, *args, **kwargs: self.database.save_branches(data, project_id),
-            project_id
+            cache_scope=('branches', project_id),
+            cache_variant=self._options_key(options)
+        )
+    
+    def _get_branches_page(self, project_id: int, options: Dict[str, Any]) -> Union[Dict[str, Any], List]:
+        """Branches for list options; each branch is decoded to merge in its head commit"""
+        total = self.database.count_listing('branches', project_id) if options['page'] else None
+        if total == 0:
+            return []
+        limit = options['per_page'] if options['page'] else None
+        offset = (options['page'] - 1) * options['per_page'] if options['page'] else 0
+        try:
+            branches = self.database.get_branches(project_id, options['sort'], limit, offset)
+        except ValueError as e:
+            raise ValidationError(str(e))
+        if not branches and total is None:
+            return []
+        data = {'branches': DataTransformer.select_fields(DataTransformer.format_branches_from_db(branches),
+                                                          options['fields'])}
+        if total is not None:
+            data['pagination'] = self.pagination(options, total)
+        return data
+    
+    def handle_dashboard_stats_request(self):
+        """Handle dashboard statistics request, always answered from the database"""
+        return self.get_with_fallback(
+            self.database.get_dashboard_stats,
+            None,
+            lambda data: data,
+            None,
+            cache_scope=('summary', None)
         )
     
     def handle_project_details_request(self, project_id: int):
         """Handle project details request with database fallback"""
+        self.record_access('project', project_id)
         try:
             # Get project from database
             project = self.database.get_project(project_id)
@@ -183,6 +537,12 @@ class ResponseHelper:
                     400
                 )
             
+            if any(request.args.get(name) for name in self.LIST_PARAMETERS):
+                return self.get_listing(
+                    'search', f'%{query}%', 'projects', DataTransformer._create_basic_project,
+                    None, None, extra={'query': query}, count_key='count'
+                )
+            
             # Search in database
             projects = self.database.search_projects(query)
             formatted_projects = DataTransformer.format_projects_from_db(projects)
@@ -0,0 +1,86 @@
+"""
+Sync Event Utility
+Fans out sync progress events to any number of Server-Sent Events subscribers
+"""
+import json
+import logging
+import queue
+import threading
+import time
+from typing import Dict, Any, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class SyncEventBroadcaster:
+    """
+    In-process publish/subscribe hub for sync progress
+
+    Publishing costs one non-blocking put per subscriber; slow subscribers lose their oldest
+    events instead of holding up the sync. The latest event of each type is kept so that a
+    client connecting mid-sync immediately sees the current stage and counts.
+    """
+
+    def __init__(self, max_queue_size: int = 256, heartbeat_interval: float = 15.0):
+        self.max_queue_size = max_queue_size
+        self.heartbeat_interval = heartbeat_interval
+        self._subscribers: List[queue.Queue] = []
+        self._latest: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._next_id = 1
+
+    def publish(self, event_type: str, data: Dict[str, Any]):
+        """Send an event to every subscriber"""
+        with self._lock:
+            event = {'id': self._next_id, 'event': event_type, 'data': {**data, 'timestamp': time.time()}}
+            self._next_id += 1
+            self._latest[event_type] = event
+            subscribers = list(self._subscribers)
+
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # Drop the oldest event for this slow client and keep the newest
+                try:
+                    subscriber.get_nowait()
+                    subscriber.put_nowait(event)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def subscribe(self) -> queue.Queue:
+        """Register a subscriber queue, pre-filled with the latest event of each type"""
+        subscriber = queue.Queue(maxsize=self.max_queue_size)
+        with self._lock:
+            for event in sorted(self._latest.values(), key=lambda e: e['id']):
+                subscriber.put_nowait(event)
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def stream(self, subscriber: Optional[queue.Queue] = None) -> Iterator[str]:
+        """Yield events for one client formatted as a text/event-stream"""
+        subscriber = subscriber or self.subscribe()
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    event = subscriber.get(timeout=self.heartbeat_interval)
+                except queue.Empty:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ': keepalive\n\n'
+                    continue
+                yield self.format_event(event)
+        finally:
+            self.unsubscribe(subscriber)
+
+    @staticmethod
+    def format_event(event: Dict[str, Any]) -> str:
+        return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
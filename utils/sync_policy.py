@@ -0,0 +1,138 @@
+"""
+Sync Policy Utility
+Decides how deeply each group is synced, based on ordered group path patterns
+"""
+import fnmatch
+import logging
+from typing import Dict, Any, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+class SyncPolicy:
+    """
+    Ordered group path rules mapping to a sync level
+
+    Levels, from least to most work:
+        skip      - the group, its subgroups and their projects are not synced
+        metadata  - groups and projects are synced, pipelines and branches are not
+        protected - pipelines and branches for the default and protected branches only
+        full      - everything
+
+    A rule matches a group when its pattern matches the group's full path (fnmatch style)
+    or one of its parent paths, so 'sandbox' also covers 'sandbox/team-a'. The first
+    matching rule wins; groups matching no rule get default_level.
+    """
+
+    SKIP = 'skip'
+    METADATA = 'metadata'
+    PROTECTED = 'protected'
+    FULL = 'full'
+    LEVELS = (SKIP, METADATA, PROTECTED, FULL)
+
+    def __init__(self, rules: Optional[List[Dict[str, Any]]] = None, default_level: str = FULL,
+                 include_archived: bool = False):
+        self.rules = [self._validate_rule(rule) for rule in (rules or [])]
+        self.default_level = self._validate_level(default_level)
+        self.include_archived = include_archived
+
+    @classmethod
+    def from_config(cls, rules: Union[str, List[Dict[str, Any]], None] = None,
+                    include_archived: bool = False, default_level: str = FULL) -> 'SyncPolicy':
+        """Build a policy from a rule list or the compact 'pattern=level[:max_projects],...' form"""
+        if isinstance(rules, str):
+            rules = cls.parse_rules(rules)
+        return cls(rules, default_level, include_archived)
+
+    @staticmethod
+    def parse_rules(spec: str) -> List[Dict[str, Any]]:
+        """Parse 'sandbox/*=skip,legacy=metadata,platform=protected:200' into rule dicts"""
+        rules = []
+        for entry in spec.split(','):
+            entry = entry.strip()
+            if not entry:
+                continue
+            if '=' not in entry:
+                raise ValueError(f"Invalid sync policy rule '{entry}', expected pattern=level[:max_projects]")
+            pattern, setting = entry.rsplit('=', 1)
+            level, _, max_projects = setting.partition(':')
+            rules.append({
+                'pattern': pattern.strip(),
+                'level': level.strip(),
+                'max_projects': int(max_projects) if max_projects.strip() else None
+            })
+        return rules
+
+    def rule_for(self, group_path: str) -> Optional[Dict[str, Any]]:
+        """First rule matching the group path or one of its ancestors"""
+        candidates = self._path_and_ancestors(group_path or '')
+        for rule in self.rules:
+            if any(fnmatch.fnmatchcase(path, rule['pattern']) for path in candidates):
+                return rule
+        return None
+
+    def level_for(self, group_path: str) -> str:
+        rule = self.rule_for(group_path)
+        return rule['level'] if rule else self.default_level
+
+    def max_projects_for(self, group_path: str) -> Optional[int]:
+        rule = self.rule_for(group_path)
+        return rule.get('max_projects') if rule else None
+
+    def project_budget_for(self, group_path: str) -> tuple:
+        """
+        (subtree path, max_projects) of the rule capping the projects of a group, (None, None) if uncapped
+
+        The subtree path is the outermost path the rule matched, so every group below it
+        counts against one budget rather than each subgroup getting its own.
+        """
+        rule = self.rule_for(group_path)
+        if not rule or rule.get('max_projects') is None:
+            return None, None
+        root = next(path for path in reversed(self._path_and_ancestors(group_path or ''))
+                    if fnmatch.fnmatchcase(path, rule['pattern']))
+        return root, rule['max_projects']
+
+    def syncs_group(self, group_path: str) -> bool:
+        return self.level_for(group_path) != self.SKIP
+
+    def project_level(self, path_with_namespace: str, archived: bool = False) -> str:
+        """Sync level of a project, from its namespace path and archived flag"""
+        if archived and not self.include_archived:
+            return self.SKIP
+        return self.level_for(self.namespace_path(path_with_namespace))
+
+    @classmethod
+    def syncs_details(cls, level: str) -> bool:
+        """Whether pipelines and branches are synced at this level"""
+        return level in (cls.PROTECTED, cls.FULL)
+
+    @staticmethod
+    def namespace_path(path_with_namespace: str) -> str:
+        return (path_with_namespace or '').rsplit('/', 1)[0]
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'rules': [dict(rule) for rule in self.rules],
+            'default_level': self.default_level,
+            'include_archived': self.include_archived
+        }
+
+    @staticmethod
+    def _path_and_ancestors(path: str) -> List[str]:
+        parts = path.split('/')
+        return ['/'.join(parts[:depth]) for depth in range(len(parts), 0, -1)]
+
+    def _validate_rule(self, rule: Dict[str, Any]) -> Dict[str, Any]:
+        if not rule.get('pattern'):
+            raise ValueError(f"Sync policy rule without a pattern: {rule}")
+        max_projects = rule.get('max_projects')
+        return {
+            'pattern': rule['pattern'],
+            'level': self._validate_level(rule.get('level', self.FULL)),
+            'max_projects': int(max_projects) if max_projects else None
+        }
+
+    def _validate_level(self, level: str) -> str:
+        if level not in self.LEVELS:
+            raise ValueError(f"Unknown sync level '{level}', expected one of {', '.join(self.LEVELS)}")
+        return level
@@ -0,0 +1,180 @@
+"""
+GitLab Webhook Utility
+Validates GitLab webhook deliveries and applies them to the database in batches
+"""
+import hmac
+import logging
+from typing import Dict, Any, List, Optional
+from utils.batch_queue import BatchQueue
+
+logger = logging.getLogger(__name__)
+
+NULL_SHA = '0000000000000000000000000000000000000000'
+
+class WebhookProcessor:
+    """Turns GitLab Pipeline, Push, Tag Push and Merge Request events into database changes"""
+
+    SUPPORTED_EVENTS = {
+        'Pipeline Hook': 'pipeline',
+        'Push Hook': 'push',
+        'Tag Push Hook': 'tag_push',
+        'Merge Request Hook': 'merge_request'
+    }
+
+    def __init__(self, database, secret_token: Optional[str], batch_size: int = 100,
+                 flush_interval: float = 1.0):
+        self.database = database
+        self.secret_token = secret_token or ''
+        self.queue = BatchQueue(self.process_batch, batch_size=batch_size,
+                                flush_interval=flush_interval, name='gitlab-webhooks')
+
+    def is_configured(self) -> bool:
+        """Webhooks are only accepted once a secret token is configured"""
+        return bool(self.secret_token)
+
+    def verify_token(self, token: Optional[str]) -> bool:
+        """Check the X-Gitlab-Token header against the configured secret"""
+        if not self.secret_token or not token:
+            return False
+        return hmac.compare_digest(token.encode(), self.secret_token.encode())
+
+    def enqueue(self, event_type: str, payload: Dict[str, Any]) -> bool:
+        """Queue an event for batched processing, returns False for unsupported events"""
+        object_kind = payload.get('object_kind') or self.SUPPORTED_EVENTS.get(event_type)
+        if object_kind not in self.SUPPORTED_EVENTS.values():
+            logger.info(f"Ignoring unsupported webhook event: {event_type or object_kind}")
+            return False
+        self.queue.put((object_kind, payload))
+        return True
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get webhook queue statistics"""
+        return {
+            'configured': self.is_configured(),
+            'pending': self.queue.pending(),
+            **self.queue.get_stats()
+        }
+
+    def process_batch(self, events: List[tuple]):
+        """Collapse a batch of events into one set of database changes"""
+        pipelines = {}
+        branches = {}
+        merged_branches = set()
+        touched_projects = set()
+        commits = []
+
+        for object_kind, payload in events:
+            try:
+                if object_kind == 'pipeline':
+                    project_id, pipeline = self._pipeline_from_event(payload)
+                    if project_id is None:
+                        logger.warning(f"Dropping pipeline webhook event {pipeline['id']} without a project id")
+                        continue
+                    pipelines[pipeline['id']] = (project_id, pipeline)
+                    touched_projects.add(project_id)
+                    if payload.get('commit'):
+                        commits.append(self._commit_from_event(payload['commit']))
+                elif object_kind == 'push':
+                    project_id, branch_name, branch = self._branch_from_push(payload)
+                    if branch_name:
+                        branches[(project_id, branch_name)] = branch
+                        merged_branches.discard((project_id, branch_name))
+                    commits.extend(self._commit_from_event(commit) for commit in payload.get('commits') or [])
+                    touched_projects.add(project_id)
+                elif object_kind == 'tag_push':
+                    # Tags have no table of their own; tag pipelines arrive as Pipeline Hook events
+                    touched_projects.add(self._project_id(payload))
+                elif object_kind == 'merge_request':
+                    attributes = payload.get('object_attributes', {})
+                    project_id = attributes.get('source_project_id') or self._project_id(payload)
+                    if attributes.get('state') == 'merged' and attributes.get('source_branch'):
+                        merged_branches.add((project_id, attributes['source_branch']))
+                    touched_projects.add(project_id)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"Skipping malformed {object_kind} webhook event: {str(e)}")
+
+        touched_projects.discard(None)
+        self.database.apply_webhook_changes(
+            pipelines=list(pipelines.values()),
+            branch_updates=[(project_id, name, branch) for (project_id, name), branch in branches.items()
+                            if branch is not None],
+            branch_deletes=[key for key, branch in branches.items() if branch is None],
+            merged_branches=list(merged_branches),
+            touched_projects=list(touched_projects),
+            commits=commits
+        )
+        logger.info(f"Applied {len(events)} webhook events touching {len(touched_projects)} projects")
+
+    @staticmethod
+    def _project_id(payload: Dict[str, Any]) -> Optional[int]:
+        return payload.get('project_id') or payload.get('project', {}).get('id')
+
+    @staticmethod
+    def _normalize_timestamp(value: Optional[str]) -> Optional[str]:
+        """Convert webhook timestamps ('2016-08-12 15:23:28 UTC') to the REST API format"""
+        if not value or not value.endswith(' UTC'):
+            return value
+        return value[:-4].replace(' ', 'T') + '.000Z'
+
+    @staticmethod
+    def _commit_from_event(commit: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a webhook commit object to the shape returned by the branches API"""
+        author = commit.get('author') or {}
+        timestamp = WebhookProcessor._normalize_timestamp(commit.get('timestamp'))
+        return {
+            'id': commit.get('id', ''),
+            'short_id': commit.get('id', '')[:8],
+            'title': commit.get('title') or commit.get('message', '').split('\n', 1)[0],
+            'message': commit.get('message', ''),
+            'author_name': author.get('name', ''),
+            'author_email': author.get('email', ''),
+            'authored_date': timestamp,
+            'committer_name': author.get('name', ''),
+            'committer_email': author.get('email', ''),
+            'committed_date': timestamp,
+            'web_url': commit.get('url', '')
+        }
+
+    def _pipeline_from_event(self, payload: Dict[str, Any]) -> tuple:
+        attributes = payload['object_attributes']
+        project = payload.get('project', {})
+        pipeline_id = attributes['id']
+        pipeline = {
+            'id': pipeline_id,
+            'iid': attributes.get('iid'),
+            'project_id': project.get('id'),
+            'sha': attributes.get('sha', ''),
+            'ref': attributes.get('ref', ''),
+            'status': attributes.get('status', ''),
+            'source': attributes.get('source', ''),
+            'tag': attributes.get('tag', False),
+            'created_at': self._normalize_timestamp(attributes.get('created_at')),
+            'updated_at': self._normalize_timestamp(attributes.get('finished_at') or attributes.get('created_at')),
+            'finished_at': self._normalize_timestamp(attributes.get('finished_at')),
+            'duration': attributes.get('duration'),
+            'web_url': f"{project['web_url']}/-/pipelines/{pipeline_id}" if project.get('web_url') else ''
+        }
+        return project.get('id'), pipeline
+
+    def _branch_from_push(self, payload: Dict[str, Any]) -> tuple:
+        """Returns (project_id, branch_name, branch) where branch is None for deleted branches"""
+        project_id = self._project_id(payload)
+        ref = payload.get('ref', '')
+        if not ref.startswith('refs/heads/'):
+            return project_id, None, None
+        branch_name = ref[len('refs/heads/'):]
+        after = payload.get('after') or payload.get('checkout_sha')
+        if not after or after == NULL_SHA:
+            return project_id, branch_name, None
+
+        commits = payload.get('commits') or []
+        head = next((c for c in commits if c.get('id') == after), commits[-1] if commits else None)
+        project = payload.get('project', {})
+        branch = {
+            'name': branch_name,
+            'default': project.get('default_branch') == branch_name,
+            'web_url': f"{project['web_url']}/-/tree/{branch_name}" if project.get('web_url') else '',
+            # A push without commits (e.g. a new branch at an existing commit) only moves the head
+            'commit': self._commit_from_event(head) if head else {'id': after}
+        }
+        return project_id, branch_name, branch
@@ -0,0 +1,57 @@
+"""
+Write-Through Utility
+Persists listings fetched live from GitLab to the database in background batches
+"""
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+from utils.batch_queue import BatchQueue
+
+logger = logging.getLogger(__name__)
+
+class WriteThroughQueue:
+    """
+    Saves API fallback results after the response has been sent
+
+    Each item is a save callable with the data it should store, keyed by the listing it fills
+    (a cache scope such as ('projects', 12)). Items for the same key within one batch are
+    coalesced to the newest, so a burst of views of an unsynced group writes it once. Items
+    are saved one by one, so a failing save does not drop the rest of its batch.
+    """
+
+    def __init__(self, batch_size: int = 50, flush_interval: float = 0.5):
+        self.queue = BatchQueue(self.process_batch, batch_size=batch_size,
+                                flush_interval=flush_interval, name='write-through')
+        self._lock = threading.Lock()
+        self.stats = {'saved': 0, 'coalesced': 0, 'failed': 0}
+
+    def put(self, key: Optional[tuple], save_method: Callable, data: Any, *args, **kwargs):
+        """Queue save_method(data, *args, **kwargs); key None is never coalesced"""
+        self.queue.put((key, save_method, data, args, kwargs))
+
+    def flush(self) -> int:
+        """Save everything queued so far on the calling thread"""
+        return self.queue.drain()
+
+    def process_batch(self, items: List[tuple]):
+        latest: Dict[Any, tuple] = {}
+        for index, item in enumerate(items):
+            key = item[0] if item[0] is not None else ('unkeyed', index)
+            latest[key] = item
+        with self._lock:
+            self.stats['coalesced'] += len(items) - len(latest)
+        for key, save_method, data, args, kwargs in latest.values():
+            try:
+                save_method(data, *args, **kwargs)
+            except Exception as e:
+                with self._lock:
+                    self.stats['failed'] += 1
+                logger.warning(f"Failed to save API data for {key} to database: {str(e)}")
+            else:
+                with self._lock:
+                    self.stats['saved'] += 1
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        return {'pending': self.queue.pending(), **stats, 'batches': self.queue.get_stats()['batches']}